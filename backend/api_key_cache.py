@@ -0,0 +1,73 @@
+import os
+from typing import Any, Dict, Optional
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from pathlib import Path
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+API_KEY_CACHE_SIZE = int(os.environ.get('API_KEY_CACHE_SIZE', '10000'))
+API_KEY_CACHE_TTL = float(os.environ.get('API_KEY_CACHE_TTL', '300'))
+API_KEY_NEGATIVE_TTL = float(os.environ.get('API_KEY_NEGATIVE_TTL', '60'))
+
+# Returned by ApiKeyCache.get when the key has no cached outcome
+MISSING = object()
+
+
+class ApiKeyCache:
+    """In-process TTL/LRU cache of API key -> user, with negative entries for unknown keys"""
+
+    def __init__(self, maxsize: int = API_KEY_CACHE_SIZE, ttl: float = API_KEY_CACHE_TTL,
+                 negative_ttl: float = API_KEY_NEGATIVE_TTL):
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._invalid = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, api_key: str) -> Any:
+        """Cached user (a copy), None for a known-invalid key, or MISSING"""
+        user = self._users.get(api_key)
+        if user is not None:
+            self.hits += 1
+            return dict(user)
+        if api_key in self._invalid:
+            self.negative_hits += 1
+            return None
+        self.misses += 1
+        return MISSING
+
+    def put(self, api_key: str, user: Optional[Dict[str, Any]]):
+        """Cache a lookup outcome; None marks the key as invalid"""
+        if user is None:
+            self._invalid[api_key] = True
+        else:
+            self._invalid.pop(api_key, None)
+            self._users[api_key] = dict(user)
+
+    def invalidate(self, api_key: str):
+        self._users.pop(api_key, None)
+        self._invalid.pop(api_key, None)
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached key that resolves to the given user"""
+        for api_key, user in list(self._users.items()):
+            if user.get('user_id') == user_id:
+                self._users.pop(api_key, None)
+
+    def clear(self):
+        self._users.clear()
+        self._invalid.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "size": len(self._users),
+            "negative_size": len(self._invalid)
+        }
@@ -0,0 +1,208 @@
+import os
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Union
+from dotenv import load_dotenv
+from pathlib import Path
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Import tiktoken for token counting
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    print("[WARNING] tiktoken not available, using approximate token counts")
+
+CHUNK_MAX_TOKENS = int(os.environ.get('CHUNK_MAX_TOKENS', '128'))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get('CHUNK_OVERLAP_TOKENS', '16'))
+CHUNK_ENCODING = os.environ.get('CHUNK_ENCODING', 'cl100k_base')
+
+# Whitespace after sentence punctuation (optionally closed by a quote or bracket),
+# or any whitespace run that contains a blank line (paragraph break)
+_BOUNDARY_RE = re.compile(r'\s*\n[ \t]*\n\s*|(?<=[.!?])\s+|(?<=[.!?]["\')\]])\s+')
+_WORD_RE = re.compile(r'\S+')
+_APPROX_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int
+    end: int
+
+
+class _Segment(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    paragraph_end: bool
+
+
+class TextChunker:
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 encoding_name: str = CHUNK_ENCODING):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _get_encoding(self):
+        """Load the tiktoken encoding once; None means approximate counting"""
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            if TIKTOKEN_AVAILABLE:
+                try:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception as e:
+                    print(f"[WARNING] Could not load tiktoken encoding {self.encoding_name}: {e}")
+        return self._encoding
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count tokens for a batch of texts"""
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+        return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+
+    def iter_chunks(self, source: Union[str, Iterable[str]], max_tokens: Optional[int] = None,
+                    overlap_tokens: Optional[int] = None) -> Iterator[Chunk]:
+        """Yield chunks ending on sentence or paragraph boundaries.
+
+        `source` may be a whole string or an iterable of text pieces (e.g. one per
+        PDF page); offsets always refer to the concatenation of all pieces.
+        """
+        max_tokens = max_tokens or self.max_tokens
+        overlap_tokens = self.overlap_tokens if overlap_tokens is None else overlap_tokens
+        overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+        if isinstance(source, str):
+            source = (source,)
+
+        buffer = ""
+        base = 0        # absolute offset of buffer[0]
+        scan_pos = 0    # absolute offset of the first unconsumed character
+        pending: List[_Segment] = []
+        pending_tokens = 0
+        fresh = 0       # segments in `pending` not yet emitted in any chunk
+        oversized = False   # scan_pos is inside a sentence already handed on word by word
+
+        def emit() -> Chunk:
+            start, end = pending[0].start, pending[-1].end
+            return Chunk(buffer[start - base:end - base], start, end)
+
+        def add(segments: List[_Segment]) -> Iterator[Chunk]:
+            nonlocal pending_tokens, fresh
+            for segment in segments:
+                if pending and pending_tokens + segment.tokens > max_tokens:
+                    if fresh:
+                        yield emit()
+                    # Keep a tail of already-emitted segments as overlap
+                    while pending and (pending_tokens > overlap_tokens
+                                       or pending_tokens + segment.tokens > max_tokens):
+                        pending_tokens -= pending.pop(0).tokens
+                    fresh = 0
+                pending.append(segment)
+                pending_tokens += segment.tokens
+                fresh += 1
+                if segment.paragraph_end and pending_tokens >= max_tokens // 2:
+                    yield emit()
+                    pending.clear()
+                    pending_tokens = 0
+                    fresh = 0
+
+        def split(spans: List[tuple]) -> List[_Segment]:
+            """Turn (start, end, paragraph_end, by_word) spans into counted segments, split by word if oversized"""
+            texts = [buffer[start - base:end - base] for start, end, _, _ in spans]
+            segments = []
+            for (start, end, paragraph_end, by_word), text, tokens in zip(spans, texts, self.count_tokens(texts)):
+                if tokens <= max_tokens and not by_word:
+                    segments.append(_Segment(start, end, tokens, paragraph_end))
+                    continue
+                words = [(start + m.start(), start + m.end()) for m in _WORD_RE.finditer(text)]
+                word_tokens = self.count_tokens([buffer[s - base:e - base] for s, e in words])
+                for i, ((s, e), count) in enumerate(zip(words, word_tokens)):
+                    segments.append(_Segment(s, e, count, paragraph_end and i == len(words) - 1))
+            return segments
+
+        def scan(final: bool) -> List[_Segment]:
+            nonlocal scan_pos, oversized
+            spans = []
+
+            def add_span(start: int, end: int, paragraph_end: bool):
+                nonlocal oversized
+                text = buffer[start - base:end - base]
+                start += len(text) - len(text.lstrip())
+                if end > start:
+                    # The rest of a sentence cut short below is split by word, as the whole sentence would be
+                    spans.append((start, end, paragraph_end, oversized))
+                    oversized = False
+
+            for match in _BOUNDARY_RE.finditer(buffer, scan_pos - base):
+                # A boundary touching the end of the buffer may still grow with the next piece
+                if match.end() == len(buffer) and not final:
+                    break
+                add_span(scan_pos, base + match.start(), match.group().count('\n') >= 2)
+                scan_pos = base + match.end()
+            if final and scan_pos < base + len(buffer):
+                add_span(scan_pos, base + len(buffer.rstrip()), True)
+                scan_pos = base + len(buffer)
+            elif not final and len(buffer) - (scan_pos - base) > max_tokens:
+                # No boundary in sight: once the open sentence is too long for one chunk anyway, hand on its
+                # complete words now, so the buffer and each rescan stay bounded. The last word may still grow
+                # or end a paragraph, so it waits.
+                words = list(_WORD_RE.finditer(buffer, scan_pos - base))[:-1]
+                if words and (oversized or self.count_tokens(
+                        [buffer[scan_pos - base:words[-1].end()]])[0] > max_tokens):
+                    spans.extend((base + m.start(), base + m.end(), False, True) for m in words)
+                    scan_pos = base + words[-1].end()
+                    oversized = True
+            return split(spans) if spans else []
+
+        for piece in source:
+            if not piece:
+                continue
+            buffer += piece
+            yield from add(scan(final=False))
+            # Drop text that can no longer appear in a chunk
+            keep_from = min(pending[0].start, scan_pos) if pending else scan_pos
+            if keep_from > base:
+                buffer = buffer[keep_from - base:]
+                base = keep_from
+
+        yield from add(scan(final=True))
+        if pending and fresh:
+            yield emit()
+
+    def chunk(self, text: str, max_tokens: Optional[int] = None,
+              overlap_tokens: Optional[int] = None) -> List[Chunk]:
+        """Chunk a complete text"""
+        return list(self.iter_chunks(text, max_tokens, overlap_tokens))
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 500) -> List[str]:
+    """Original whitespace chunker, kept as a benchmark baseline"""
+    words = text.split()
+    chunks = []
+    current_chunk = []
+    current_size = 0
+
+    for word in words:
+        current_chunk.append(word)
+        current_size += len(word) + 1
+
+        if current_size >= chunk_size:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = []
+            current_size = 0
+
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+
+    return chunks
+
+
+# Global chunker instance
+text_chunker = TextChunker()
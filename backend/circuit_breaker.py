@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+from metrics import registry
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+BREAKER_ENABLED = os.environ.get('BREAKER_ENABLED', 'true').lower() == 'true'
+# Outcomes of the last BREAKER_WINDOW calls decide; nothing trips before BREAKER_MIN_CALLS of them
+BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', '10'))
+# Trip when this share of windowed calls failed, or took longer than the provider's slow-call threshold
+BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', '0.5'))
+BREAKER_SLOW_RATE = float(os.environ.get('BREAKER_SLOW_RATE', '0.5'))
+BREAKER_EMBED_SLOW_MS = float(os.environ.get('BREAKER_EMBED_SLOW_MS', '2000'))
+BREAKER_LLM_SLOW_MS = float(os.environ.get('BREAKER_LLM_SLOW_MS', '15000'))
+# Seconds between background recovery probes while open
+BREAKER_PROBE_INTERVAL = float(os.environ.get('BREAKER_PROBE_INTERVAL', '15'))
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+
+BREAKER_TRIPS = registry.counter(
+    "docubrain_circuit_breaker_trips_total", "Times a provider circuit breaker opened", ("provider", "reason"))
+BREAKER_REJECTED = registry.counter(
+    "docubrain_circuit_breaker_rejected_total", "Provider calls refused because the circuit was open", ("provider",))
+
+
+class CircuitBreaker:
+    """Opens after too many failed or slow provider calls, then refuses calls at once.
+
+    While open, real requests never reach the provider; a background thread probes it every
+    probe_interval seconds and closes the circuit on the first success. clock and sleep are
+    injectable for tests.
+    """
+
+    def __init__(self, name: str, slow_ms: float, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, slow_rate: float = BREAKER_SLOW_RATE,
+                 probe_interval: float = BREAKER_PROBE_INTERVAL, enabled: bool = BREAKER_ENABLED,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.slow = slow_ms / 1000
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.probe_interval = probe_interval
+        self.enabled = enabled
+        self._clock = clock
+        self._sleep = sleep
+        # Health check run by the prober; set by whoever owns the provider client
+        self.probe: Optional[Callable[[], Any]] = None
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self._outcomes: deque = deque(maxlen=window)  # (failed, slow)
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+
+    def allow(self) -> bool:
+        return not self.enabled or self.state == CLOSED
+
+    def reject(self):
+        BREAKER_REJECTED.inc(self.name)
+
+    def retry_after(self) -> float:
+        """Seconds until the next recovery probe"""
+        if self.opened_at is None:
+            return 0.0
+        elapsed = self._clock() - self.opened_at
+        return self.probe_interval - elapsed % self.probe_interval
+
+    def record(self, seconds: float, failed: bool):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                return
+            self._outcomes.append((failed, seconds >= self.slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for failed_call, _ in self._outcomes if failed_call)
+            slow = sum(1 for _, slow_call in self._outcomes if slow_call)
+            if failures / calls >= self.error_rate:
+                self._open("error_rate", failures / calls)
+            elif slow / calls >= self.slow_rate:
+                self._open("latency", slow / calls)
+
+    def _open(self, reason: str, rate: float):
+        self.state = OPEN
+        self.opened_at = self._clock()
+        self._outcomes.clear()
+        BREAKER_TRIPS.inc(self.name, reason)
+        logger.warning("Circuit breaker opened; serving local fallbacks",
+                       extra={"provider": self.name, "reason": reason, "rate": round(rate, 3)})
+        if self._prober is None or not self._prober.is_alive():
+            self._prober = threading.Thread(target=self._probe_until_recovered, name=f"breaker-{self.name}",
+                                            daemon=True)
+            self._prober.start()
+
+    def _probe_until_recovered(self):
+        while True:
+            self._sleep(self.probe_interval)
+            if self.probe_once():
+                break
+
+    def probe_once(self) -> bool:
+        """Run the recovery probe; close the circuit and return True if the provider answered in time"""
+        # Without a probe there is nothing to test recovery with: close and let real traffic decide
+        if self.probe is not None:
+            start = self._clock()
+            try:
+                self.probe()
+            except Exception as e:
+                logger.info("Circuit breaker probe failed", extra={"provider": self.name, "error": str(e)})
+                return False
+            if self._clock() - start >= self.slow:
+                logger.info("Circuit breaker probe succeeded but was slow", extra={"provider": self.name})
+                return False
+        with self._lock:
+            self.state = CLOSED
+            self.opened_at = None
+            self._outcomes.clear()
+        logger.warning("Circuit breaker closed; provider recovered", extra={"provider": self.name})
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_failures": sum(1 for failed, _ in self._outcomes if failed),
+                "window_slow": sum(1 for _, slow in self._outcomes if slow),
+                "retry_after_seconds": round(self.retry_after(), 1) if self.state == OPEN else None
+            }
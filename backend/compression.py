@@ -0,0 +1,64 @@
+import os
+import zlib
+from typing import Optional, Tuple, Union
+from dotenv import load_dotenv
+from pathlib import Path
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# zstandard is optional; zlib is always available
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CODEC_NONE = "none"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+CONTENT_CODEC = os.environ.get('CONTENT_CODEC', CODEC_NONE).lower()
+ZLIB_LEVEL = int(os.environ.get('CONTENT_ZLIB_LEVEL', '6'))
+ZSTD_LEVEL = int(os.environ.get('CONTENT_ZSTD_LEVEL', '3'))
+
+# Texts shorter than this are not worth the codec overhead
+MIN_COMPRESS_BYTES = 256
+
+
+def resolve_codec(codec: Optional[str] = None) -> str:
+    """Return the codec to write with, downgrading zstd to zlib when it is not installed"""
+    codec = (codec or CONTENT_CODEC).lower()
+    if codec == CODEC_ZSTD and not ZSTD_AVAILABLE:
+        return CODEC_ZLIB
+    if codec not in (CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD):
+        print(f"[WARNING] Unknown content codec '{codec}', storing uncompressed")
+        return CODEC_NONE
+    return codec
+
+
+def compress_text(text: str, codec: Optional[str] = None) -> Tuple[Union[str, bytes], str]:
+    """Encode text with the given codec; returns (payload, codec tag actually used)"""
+    codec = resolve_codec(codec)
+    raw = text.encode('utf-8')
+    if codec == CODEC_NONE or len(raw) < MIN_COMPRESS_BYTES:
+        return text, CODEC_NONE
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), CODEC_ZSTD
+    return zlib.compress(raw, ZLIB_LEVEL), CODEC_ZLIB
+
+
+def decompress_text(payload: Union[str, bytes, None], codec: Optional[str]) -> str:
+    """Decode a payload written by compress_text; untagged payloads are plain text"""
+    if payload is None:
+        return ""
+    if not codec or codec == CODEC_NONE:
+        return payload
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if codec == CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Document is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f"Unknown content codec: {codec}")
@@ -0,0 +1,138 @@
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+from chunking import text_chunker
+from metrics import registry, trace_detail
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Token budget for the retrieved context sent to the LLM (counted with the chunker's tokenizer)
+CONTEXT_MAX_TOKENS = int(os.environ.get('CONTEXT_MAX_TOKENS', '1024'))
+# Most chunks considered for the context, in relevance order
+CONTEXT_MAX_CHUNKS = int(os.environ.get('CONTEXT_MAX_CHUNKS', '5'))
+# Chunks whose word sets overlap at least this much (Jaccard) with a better chunk are dropped
+CONTEXT_DEDUP_SIMILARITY = float(os.environ.get('CONTEXT_DEDUP_SIMILARITY', '0.9'))
+
+# Longest chunk suffix/prefix compared when merging neighbours that have no stored spans
+_MAX_TEXT_OVERLAP = 1000
+_WORD_RE = re.compile(r'\w+')
+
+CONTEXT_TOKENS = registry.histogram(
+    "docubrain_context_tokens", "Tokens of retrieved context sent to the LLM per query",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+
+
+class Passage(NamedTuple):
+    text: str
+    chunks: List[Dict[str, Any]]
+    relevance_score: float
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _join_overlapping(left: str, right: str) -> str:
+    """Concatenate neighbouring chunk texts, dropping text the chunker repeated as overlap"""
+    for size in range(min(len(left), len(right), _MAX_TEXT_OVERLAP), 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left} {right}"
+
+
+class ContextBuilder:
+    """Packs the most relevant chunks into a token budget, merging neighbours and dropping near-duplicates"""
+
+    def __init__(self, max_tokens: int = CONTEXT_MAX_TOKENS, max_chunks: int = CONTEXT_MAX_CHUNKS,
+                 dedup_similarity: float = CONTEXT_DEDUP_SIMILARITY):
+        self.max_tokens = max_tokens
+        self.max_chunks = max_chunks
+        self.dedup_similarity = dedup_similarity
+
+    def select(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Best chunks in relevance order that are not near-duplicates and fit the token budget.
+
+        The top chunk is always kept so the context is never empty.
+        """
+        ranked = sorted(chunks, key=lambda c: c['relevance_score'], reverse=True)
+        kept, kept_words = [], []
+        for chunk in ranked:
+            if len(kept) >= self.max_chunks:
+                break
+            words = _words(chunk['content'])
+            if any(_jaccard(words, other) >= self.dedup_similarity for other in kept_words):
+                continue
+            kept.append(chunk)
+            kept_words.append(words)
+
+        selected, used = [], 0
+        for chunk, tokens in zip(kept, text_chunker.count_tokens([c['content'] for c in kept])):
+            if selected and used + tokens > self.max_tokens:
+                continue
+            selected.append(chunk)
+            used += tokens
+        return selected
+
+    def merge(self, chunks: List[Dict[str, Any]], contents: Optional[Dict[Any, str]] = None) -> List[Passage]:
+        """Merge chunks that are adjacent in the same document into single passages, best passage first.
+
+        Chunks carrying a `span` are re-sliced from their document's content in `contents`, so the
+        overlap the chunker repeats between neighbours is sent once.
+        """
+        contents = contents or {}
+        by_document: Dict[Any, List[Dict[str, Any]]] = {}
+        for chunk in chunks:
+            key = chunk.get('document_id') or chunk.get('filename')
+            by_document.setdefault(key, []).append(chunk)
+
+        passages = []
+        for key, doc_chunks in by_document.items():
+            doc_chunks.sort(key=lambda c: c['chunk_index'])
+            groups = [[doc_chunks[0]]]
+            for chunk in doc_chunks[1:]:
+                if chunk['chunk_index'] - groups[-1][-1]['chunk_index'] <= 1:
+                    groups[-1].append(chunk)
+                else:
+                    groups.append([chunk])
+            content = contents.get(key)
+            for group in groups:
+                passages.append(Passage(self._group_text(group, content), group,
+                                        max(c['relevance_score'] for c in group)))
+
+        passages.sort(key=lambda p: p.relevance_score, reverse=True)
+        return passages
+
+    @staticmethod
+    def _group_text(group: List[Dict[str, Any]], content: Optional[str]) -> str:
+        if len(group) == 1:
+            return group[0]['content']
+        if content is not None and all(c.get('span') for c in group):
+            return content[group[0]['span'][0]:max(c['span'][1] for c in group)]
+        text = group[0]['content']
+        for chunk in group[1:]:
+            text = _join_overlapping(text, chunk['content'])
+        return text
+
+    def build(self, chunks: List[Dict[str, Any]], contents: Optional[Dict[Any, str]] = None):
+        """Context text for the LLM and the chunks it was built from"""
+        selected = self.select(chunks)
+        passages = self.merge(selected, contents)
+        context = "\n\n".join(passage.text for passage in passages)
+        tokens = text_chunker.count_tokens([context])[0] if context else 0
+        CONTEXT_TOKENS.observe(tokens)
+        trace_detail("context_tokens", tokens)
+        trace_detail("context_passages", len(passages))
+        return context, [chunk for passage in passages for chunk in passage.chunks]
+
+
+context_builder = ContextBuilder()
@@ -1,9 +1,14 @@
+import asyncio
 import motor.motor_asyncio
 import os
+import re
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from datetime import datetime
 from dotenv import load_dotenv
+from compression import compress_text, decompress_text, resolve_codec, CODEC_NONE
+from storage import (StorageBackend, DOCUMENT_LIST_FIELDS, load_document, iso_utc, encode_cursor,
+                     decode_cursor)
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -12,11 +17,17 @@ load_dotenv(ROOT_DIR / '.env')
 MONGO_URL = os.environ.get('MONGO_URL')
 DATABASE_NAME = os.environ.get('DATABASE_NAME', 'askmydocs')
 
-class Database:
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+
+
+class Database(StorageBackend):
+    """MongoDB storage backend"""
+
     def __init__(self):
+        super().__init__()
         self.client = None
         self.db = None
-        
+
     async def init_db(self):
         """Initialize MongoDB connection"""
         try:
@@ -25,6 +36,12 @@ class Database:
             # Test the connection
             await self.client.admin.command('ping')
             print(f"[OK] Successfully connected to MongoDB database: {DATABASE_NAME}")
+            # Supports keyset pagination of a user's documents
+            await self.db.documents.create_index([("user_id", 1), ("upload_time", -1), ("id", -1)])
+            # Supports ownership-scoped lookups and deletes by document id
+            await self.db.documents.create_index([("id", 1), ("user_id", 1)])
+            # Supports API key resolution on cache misses
+            await self.db.users.create_index("api_key")
         except Exception as e:
             print(f"[ERROR] Failed to connect to MongoDB: {e}")
             raise e
@@ -37,6 +54,9 @@ class Database:
                 user_data['created_at'] = user_data['created_at'].isoformat()
             
             result = await self.db.users.insert_one(user_data)
+            if user_data.get('api_key'):
+                # The new key may have been cached as invalid
+                self.api_key_cache.invalidate(user_data['api_key'])
             return result.inserted_id is not None
         except Exception as e:
             print(f"Error creating user: {e}")
@@ -54,17 +74,36 @@ class Database:
             print(f"Error getting user by username: {e}")
             return None
     
-    async def get_user_by_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
-        """Get user by API key"""
+    async def _fetch_user_by_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
+        user = await self.db.users.find_one({"api_key": api_key})
+        if user:
+            # Remove MongoDB _id field for consistency
+            user.pop('_id', None)
+        return user
+
+    async def update_user_api_key(self, user_id: str, api_key: str) -> bool:
+        """Replace a user's API key and drop cached lookups for the old and new keys"""
         try:
-            user = await self.db.users.find_one({"api_key": api_key})
-            if user:
-                # Remove MongoDB _id field for consistency
-                user.pop('_id', None)
-            return user
+            result = await self.db.users.update_one({"user_id": user_id}, {"$set": {"api_key": api_key}})
         except Exception as e:
-            print(f"Error getting user by API key: {e}")
-            return None
+            print(f"Error updating API key: {e}")
+            return False
+        finally:
+            self.api_key_cache.invalidate_user(user_id)
+            self.api_key_cache.invalidate(api_key)
+        return result.matched_count > 0
+
+    async def delete_user(self, user_id: str) -> bool:
+        """Delete a user and their documents"""
+        try:
+            await self.db.documents.delete_many({"user_id": user_id})
+            result = await self.db.users.delete_one({"user_id": user_id})
+        except Exception as e:
+            print(f"Error deleting user: {e}")
+            return False
+        finally:
+            self.api_key_cache.invalidate_user(user_id)
+        return result.deleted_count > 0
     
     async def create_document(self, doc_data: Dict[str, Any]) -> bool:
         """Create a new document"""
@@ -72,6 +111,10 @@ class Database:
             # Convert datetime to ISO string for MongoDB
             if isinstance(doc_data.get('upload_time'), datetime):
                 doc_data['upload_time'] = doc_data['upload_time'].isoformat()
+
+            # Compress content according to CONTENT_CODEC and tag the record with the codec used
+            if isinstance(doc_data.get('content'), str) and 'content_codec' not in doc_data:
+                doc_data['content'], doc_data['content_codec'] = compress_text(doc_data['content'])
             
             result = await self.db.documents.insert_one(doc_data)
             return result.inserted_id is not None
@@ -84,7 +127,7 @@ class Database:
         try:
             cursor = self.db.documents.find(
                 {"user_id": user_id},
-                {"id": 1, "filename": 1, "upload_time": 1, "chunk_count": 1, "status": 1, "_id": 0}
+                DOCUMENT_LIST_FIELDS
             ).sort("upload_time", -1)
             
             documents = await cursor.to_list(length=None)
@@ -92,17 +135,54 @@ class Database:
         except Exception as e:
             print(f"Error getting user documents: {e}")
             return []
+
+    async def get_user_documents_page(self, user_id: str, limit: int, cursor: Optional[str] = None,
+                                      filename_prefix: Optional[str] = None, status: Optional[str] = None,
+                                      uploaded_after: Optional[datetime] = None,
+                                      uploaded_before: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get one page of a user's documents, newest first, using keyset pagination on (upload_time, id).
+
+        Returns {"documents": [...], "next_cursor": str or None}. Raises ValueError for a bad cursor.
+        """
+        conditions: List[Dict[str, Any]] = [{"user_id": user_id}]
+        if filename_prefix:
+            conditions.append({"filename": {"$regex": "^" + re.escape(filename_prefix)}})
+        if status:
+            conditions.append({"status": status})
+        if uploaded_after:
+            conditions.append({"upload_time": {"$gte": iso_utc(uploaded_after)}})
+        if uploaded_before:
+            conditions.append({"upload_time": {"$lt": iso_utc(uploaded_before)}})
+        if cursor:
+            upload_time, document_id = decode_cursor(cursor)
+            conditions.append({"$or": [
+                {"upload_time": {"$lt": upload_time}},
+                {"upload_time": upload_time, "id": {"$lt": document_id}}
+            ]})
+
+        try:
+            documents = await self.db.documents.find(
+                {"$and": conditions},
+                DOCUMENT_LIST_FIELDS
+            ).sort([("upload_time", -1), ("id", -1)]).limit(limit + 1).to_list(length=limit + 1)
+        except Exception as e:
+            print(f"Error getting user documents page: {e}")
+            return {"documents": [], "next_cursor": None}
+
+        next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return {"documents": documents[:limit], "next_cursor": next_cursor}
     
     async def get_user_documents_with_content(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all documents for a user with full content for querying"""
         try:
             cursor = self.db.documents.find(
                 {"user_id": user_id},
-                {"id": 1, "filename": 1, "content": 1, "chunks": 1, "embeddings": 1, "_id": 0}
+                {"id": 1, "filename": 1, "content": 1, "content_codec": 1, "chunks": 1, "chunk_spans": 1,
+                 "embeddings": 1, "_id": 0}
             )
 
             documents = await cursor.to_list(length=None)
-            return documents
+            return [load_document(document) for document in documents]
         except Exception as e:
             print(f"Error getting user documents with content: {e}")
             return []
@@ -112,13 +192,124 @@ class Database:
         try:
             document = await self.db.documents.find_one({"id": document_id})
             if document:
-                # Remove MongoDB _id field for consistency
-                document.pop('_id', None)
+                load_document(document)
             return document
         except Exception as e:
             print(f"Error getting document by ID: {e}")
             return None
 
+    async def get_document_info(self, document_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get document metadata (owner, filename, sizes, page spans) without content, chunks or embeddings.
+
+        With `user_id`, only a document owned by that user is returned.
+        """
+        query = {"id": document_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        try:
+            return await self.db.documents.find_one(
+                query,
+                {"id": 1, "user_id": 1, "filename": 1, "upload_time": 1, "chunk_count": 1, "status": 1,
+                 "content_length": 1, "page_spans": 1, "_id": 0}
+            )
+        except Exception as e:
+            print(f"Error getting document info: {e}")
+            return None
+
+    async def get_document_content_range(self, document_id: str, start: int = 0, end: Optional[int] = None,
+                                         user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a character range of a document's content.
+
+        Uncompressed content is sliced inside MongoDB so only the requested range is
+        transferred; compressed content has to be fetched whole and sliced here.
+        With `user_id`, only a document owned by that user is read.
+        """
+        match = {"id": document_id}
+        if user_id is not None:
+            match["user_id"] = user_id
+        try:
+            start = max(0, start)
+            text_length = {"$strLenCP": "$content"}
+            if end is None:
+                count = {"$max": [0, {"$subtract": [text_length, start]}]}
+            else:
+                count = max(0, end - start)
+            plain = {"$eq": [{"$ifNull": ["$content_codec", CODEC_NONE]}, CODEC_NONE]}
+
+            cursor = self.db.documents.aggregate([
+                {"$match": match},
+                {"$limit": 1},
+                {"$project": {
+                    "_id": 0,
+                    "content_codec": 1,
+                    "content": {"$cond": [plain, {"$substrCP": ["$content", start, count]}, "$content"]},
+                    "total_length": {"$cond": [plain, text_length, None]}
+                }}
+            ])
+            results = await cursor.to_list(length=1)
+            if not results:
+                return None
+
+            result = results[0]
+            content = result.get('content') or ""
+            total_length = result.get('total_length')
+            if total_length is None:
+                # Compressed record: decompress and slice in the app
+                text = decompress_text(content, result.get('content_codec'))
+                total_length = len(text)
+                content = text[start:end]
+
+            return {
+                "content": content,
+                "start": min(start, total_length),
+                "end": min(start, total_length) + len(content),
+                "total_length": total_length
+            }
+        except Exception as e:
+            print(f"Error getting document content range: {e}")
+            return None
+
+    async def iter_document_content(self, document_id: str, window: int = 65536,
+                                    user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield a document's content in windows of `window` characters"""
+        query = {"id": document_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        info = await self.db.documents.find_one(query, {"content_codec": 1, "_id": 0})
+        if info is None:
+            return
+
+        if info.get('content_codec', CODEC_NONE) != CODEC_NONE:
+            # Compressed content is decompressed once and paged locally
+            part = await self.get_document_content_range(document_id, user_id=user_id)
+            text = part["content"] if part else ""
+            for offset in range(0, len(text), window):
+                yield text[offset:offset + window]
+            return
+
+        start = 0
+        while True:
+            part = await self.get_document_content_range(document_id, start, start + window, user_id)
+            if not part or not part["content"]:
+                return
+            yield part["content"]
+            start = part["end"]
+            if start >= part["total_length"]:
+                return
+
+    async def delete_user_document(self, document_id: str, user_id: str) -> Optional[bool]:
+        """Delete a document owned by the user in one round trip.
+
+        Returns True if deleted, False if the user has no such document, None on error.
+        """
+        try:
+            result = await self.db.documents.delete_one({"id": document_id, "user_id": user_id})
+        except Exception as e:
+            print(f"Error deleting document: {e}")
+            return None
+
+        return result.deleted_count > 0
+
     async def delete_document(self, document_id: str) -> bool:
         """Delete a document by its ID"""
         try:
@@ -128,5 +319,50 @@ class Database:
             print(f"Error deleting document: {e}")
             return False
 
+    async def recompress_documents(self, codec: Optional[str] = None, batch_size: int = 50) -> int:
+        """Re-encode stored document content with the given codec; returns the number of records rewritten"""
+        codec = resolve_codec(codec)
+        updated = 0
+        try:
+            cursor = self.db.documents.find(
+                {"content": {"$exists": True}, "content_codec": {"$ne": codec}},
+                {"_id": 1, "content": 1, "content_codec": 1}
+            ).batch_size(batch_size)
+
+            async for document in cursor:
+                current = document.get('content_codec', CODEC_NONE)
+                text = decompress_text(document['content'], current)
+                payload, used = compress_text(text, codec)
+                if used == current:
+                    continue
+                await self.db.documents.update_one(
+                    {"_id": document["_id"]},
+                    {"$set": {"content": payload, "content_codec": used}}
+                )
+                updated += 1
+                if updated % batch_size == 0:
+                    # Yield to request handlers between batches
+                    await asyncio.sleep(0)
+
+            print(f"[OK] Recompressed {updated} documents with codec {codec}")
+        except Exception as e:
+            print(f"Error recompressing documents: {e}")
+        return updated
+
+    async def close(self):
+        if self.client:
+            self.client.close()
+
+
+def create_database(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND (mongo, sqlite or memory)"""
+    if backend == 'sqlite':
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase()
+    if backend == 'memory':
+        from memory_database import MemoryDatabase
+        return MemoryDatabase()
+    return Database()
+
 # Global database instance
-db = Database()
\ No newline at end of file
+db = create_database()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, TypeVar
+from dotenv import load_dotenv
+from pathlib import Path
+from metrics import registry, trace_detail
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+T = TypeVar("T")
+
+
+def _parse_budgets(name: str, default: str = '') -> Dict[str, float]:
+    """"key=ms,key=ms" settings; malformed entries are skipped with a warning"""
+    budgets = {}
+    for entry in os.environ.get(name, default).split(','):
+        if not entry.strip():
+            continue
+        key, _, value = entry.rpartition('=')
+        try:
+            if not key.strip():
+                raise ValueError(entry)
+            budgets[key.strip()] = float(value)
+        except ValueError:
+            print(f"[WARNING] Ignoring malformed {name} entry: {entry.strip()!r}")
+    return budgets
+
+
+# Time budget for a whole query, from request start to answer (0 = no deadline, the default)
+QUERY_DEADLINE_MS = float(os.environ.get('QUERY_DEADLINE_MS', '0'))
+# Overrides by route ("/api/search=2000,/api/query/batch=120000") and by user id ("<user_id>=1500"); a user's
+# budget applies to all their queries, API or external, and outlives API key rotation
+ROUTE_DEADLINES_MS = _parse_budgets('ROUTE_DEADLINES_MS')
+USER_DEADLINES_MS = _parse_budgets('USER_DEADLINES_MS')
+# Least time left to still call the embedding provider; with less, retrieval is keyword-only
+DEADLINE_MIN_EMBED_MS = float(os.environ.get('DEADLINE_MIN_EMBED_MS', '250'))
+# Least time left to still call the LLM; with less, the answer is extractive
+DEADLINE_MIN_LLM_MS = float(os.environ.get('DEADLINE_MIN_LLM_MS', '2000'))
+# With less than this share of the budget left when retrieval starts, top_k is halved
+DEADLINE_TIGHT_FRACTION = float(os.environ.get('DEADLINE_TIGHT_FRACTION', '0.5'))
+
+DEADLINE_DEGRADATIONS = registry.counter(
+    "docubrain_deadline_degradations_total", "Query stages cut short or replaced to meet the request deadline",
+    ("stage", "action"))
+
+
+class Deadline:
+    """Time budget of one request, counted from when it started"""
+
+    def __init__(self, budget_ms: float):
+        self.started = time.monotonic()
+        self.budget = budget_ms / 1000
+
+    def remaining(self) -> float:
+        return self.budget - (time.monotonic() - self.started)
+
+    def fraction_left(self) -> float:
+        return self.remaining() / self.budget
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def deadline_for_route(route: str) -> Optional[Deadline]:
+    budget_ms = ROUTE_DEADLINES_MS.get(route, QUERY_DEADLINE_MS)
+    if budget_ms <= 0:
+        return None
+    trace_detail("deadline_ms", budget_ms)
+    return Deadline(budget_ms)
+
+
+def apply_user_deadline(user_id: str):
+    """Replace the current request's budget with the one configured for its user, if any"""
+    budget_ms = USER_DEADLINES_MS.get(user_id)
+    if budget_ms is None:
+        return
+    trace_detail("deadline_ms", budget_ms)
+    deadline = current_deadline.get()
+    if budget_ms <= 0:
+        current_deadline.set(None)
+    elif deadline is None:
+        current_deadline.set(Deadline(budget_ms))
+    else:
+        deadline.budget = budget_ms / 1000
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request; None without a deadline"""
+    deadline = current_deadline.get()
+    return None if deadline is None else max(deadline.remaining(), 0.0)
+
+
+def has_time_for(min_ms: float) -> bool:
+    left = remaining()
+    return left is None or left * 1000 >= min_ms
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def degrade(stage: str, action: str):
+    """Record that a stage was cut short or replaced to meet the deadline"""
+    DEADLINE_DEGRADATIONS.inc(stage, action)
+    trace_detail(f"deadline_{stage}", action)
+
+
+def deadline_top_k(top_k: int) -> int:
+    """top_k, halved when less than DEADLINE_TIGHT_FRACTION of the budget is left"""
+    deadline = current_deadline.get()
+    if deadline is None or top_k <= 1 or deadline.fraction_left() >= DEADLINE_TIGHT_FRACTION:
+        return top_k
+    degrade("retrieval", "smaller_top_k")
+    return max(1, top_k // 2)
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await within the time left; raises asyncio.TimeoutError once the deadline passes"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, left)
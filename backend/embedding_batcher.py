@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple
+from dotenv import load_dotenv
+from pathlib import Path
+from gemini_embeddings import EMBED_BATCH_SIZE, GeminiEmbeddings, embeddings_engine
+from metrics import registry, stage_timer
+from provider_gateway import ProviderBusy
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+EMBED_BATCHING_ENABLED = os.environ.get('EMBED_BATCHING_ENABLED', 'true').lower() == 'true'
+# While a provider call is in flight, how long a new batch waits for more texts; 0 only batches what is already queued
+EMBED_BATCH_MAX_WAIT_MS = float(os.environ.get('EMBED_BATCH_MAX_WAIT_MS', '5'))
+# Texts per provider call, capped by what the API accepts
+EMBED_BATCH_MAX_SIZE = min(int(os.environ.get('EMBED_BATCH_MAX_SIZE', str(EMBED_BATCH_SIZE))), EMBED_BATCH_SIZE)
+# Provider calls in flight at once, per task type
+EMBED_BATCH_WORKERS = int(os.environ.get('EMBED_BATCH_WORKERS', '4'))
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = registry.histogram(
+    "docubrain_embedding_batch_size", "Texts per batched embedding provider call", ("task_type",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 100))
+
+
+class _Request(NamedTuple):
+    text: str
+    future: Future
+
+
+class _Lane:
+    """Queue, collector thread and worker pool of one task type"""
+
+    def __init__(self, task_type: str, workers: int):
+        self.task_type = task_type
+        self.queue: "queue.Queue[_Request]" = queue.Queue()
+        # One per worker: a batch is only formed when a worker is free to send it
+        self.slots = threading.Semaphore(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"embed-{task_type}")
+        self.in_flight = 0
+
+
+class EmbeddingBatcher:
+    """Collects embedding requests from concurrent callers into batched provider calls.
+
+    Each task type (query, document) has its own lane: a queue, a collector thread and a
+    small worker pool, since the provider takes one task type per call. Query texts thus
+    never wait behind a large upload's document batches; the provider gateway then admits
+    their calls ahead of background work. A collector takes the first queued text once one
+    of its lane's workers is free and hands it, with whatever else is queued (up to
+    max_batch), to that worker. Texts beyond what the workers can send stay in the lane
+    queue, where later arrivals join their batches. While a call is in flight the collector
+    first waits up to max_wait for more texts, so a lone request is never delayed but
+    concurrent ones share calls.
+    """
+
+    def __init__(self, engine: GeminiEmbeddings, max_batch: int = EMBED_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS, workers: int = EMBED_BATCH_WORKERS):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+
+    def _lane(self, task_type: str) -> _Lane:
+        lane = self._lanes.get(task_type)
+        if lane is not None:
+            return lane
+        with self._lock:
+            if task_type not in self._lanes:
+                lane = _Lane(task_type, self.workers)
+                threading.Thread(target=self._collect, args=(lane,), name=f"embed-{task_type}-collector",
+                                 daemon=True).start()
+                self._lanes[task_type] = lane
+            return self._lanes[task_type]
+
+    def submit(self, text: str, task_type: str) -> Future:
+        future = Future()
+        self._lane(task_type).queue.put(_Request(text, future))
+        return future
+
+    def _collect(self, lane: _Lane):
+        while True:
+            first = lane.queue.get()
+            lane.slots.acquire()
+            batch = [first]
+            # Idle provider: send right away; busy provider: gather the texts arriving meanwhile
+            deadline = time.monotonic() + (self.max_wait if lane.in_flight else 0)
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(lane.queue.get(timeout=timeout) if timeout > 0 else lane.queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                lane.in_flight += 1
+            try:
+                lane.executor.submit(self._run, lane, batch)
+            except RuntimeError:
+                # The interpreter is exiting and its worker pools take no more work
+                return
+
+    def _run(self, lane: _Lane, batch: List[_Request]):
+        try:
+            # Callers that gave up meanwhile (request deadline passed) are not sent to the provider
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+            BATCH_SIZE.observe(len(batch), lane.task_type)
+            with self._lock:
+                self.batches += 1
+                self.texts += len(batch)
+            self._call(lane.task_type, batch)
+        finally:
+            with self._lock:
+                lane.in_flight -= 1
+            lane.slots.release()
+
+    def _call(self, task_type: str, batch: List[_Request]):
+        try:
+            embeddings = self.engine._embed_batch([request.text for request in batch], task_type)
+            if len(embeddings) != len(batch):
+                raise RuntimeError(f"Provider returned {len(embeddings)} embeddings for {len(batch)} texts")
+        except Exception as e:
+            if len(batch) == 1 or isinstance(e, ProviderBusy):
+                # Saturation or quota errors apply to every text alike; report them to each caller
+                for request in batch:
+                    request.future.set_exception(e)
+                return
+            # Retry one by one so a single bad text does not fail everyone's request
+            logger.warning("Batched embedding call failed, retrying texts individually",
+                           extra={"texts": len(batch), "task_type": task_type, "error": str(e)})
+            for request in batch:
+                try:
+                    request.future.set_result(self.engine._embed(request.text, task_type))
+                except Exception as item_error:
+                    request.future.set_exception(item_error)
+            return
+        for request, embedding in zip(batch, embeddings):
+            request.future.set_result(embedding)
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Query embedding via the batcher; same fallbacks as get_query_embedding"""
+        if not EMBED_BATCHING_ENABLED or not query or not self.engine.provider_available():
+            return self.engine.get_query_embedding(query)
+        try:
+            with stage_timer("embedding"):
+                return await asyncio.wrap_future(self.submit(query, "retrieval_query"))
+        except ProviderBusy:
+            raise
+        except Exception as e:
+            logger.error("Query embedding failed, using fallback embedding", extra={"error": str(e)})
+            return self.engine._fallback_embeddings([query])[0]
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Document embeddings via the batcher; same fallbacks as get_embeddings"""
+        if not EMBED_BATCHING_ENABLED or not texts or not self.engine.provider_available():
+            return self.engine.get_embeddings(texts)
+        futures = [asyncio.wrap_future(self.submit(text, "retrieval_document")) for text in texts]
+        with stage_timer("embedding"):
+            results = await asyncio.gather(*futures, return_exceptions=True)
+        busy = next((result for result in results if isinstance(result, ProviderBusy)), None)
+        if busy is not None:
+            # Storing zero vectors would silently ruin the document's retrieval
+            raise busy
+        failed = sum(isinstance(result, BaseException) for result in results)
+        if failed:
+            logger.warning("Some embeddings failed and were replaced with zero vectors",
+                           extra={"failed": failed, "texts": len(texts)})
+        return [[0.0] * self.engine.embedding_dimension if isinstance(result, BaseException) else result
+                for result in results]
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = list(self._lanes.values())
+        return {
+            "queued": sum(lane.queue.qsize() for lane in lanes),
+            "in_flight": sum(lane.in_flight for lane in lanes),
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "lanes": {lane.task_type: {"queued": lane.queue.qsize(), "in_flight": lane.in_flight} for lane in lanes}
+        }
+
+
+embedding_batcher = EmbeddingBatcher(embeddings_engine)
@@ -0,0 +1,142 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from pathlib import Path
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from metrics import registry, stage_timer, trace_detail
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Most sentences, and characters, in an extractive answer
+EXTRACTIVE_MAX_SENTENCES = int(os.environ.get('EXTRACTIVE_MAX_SENTENCES', '3'))
+EXTRACTIVE_MAX_CHARS = int(os.environ.get('EXTRACTIVE_MAX_CHARS', '800'))
+
+# BM25 term-frequency saturation and length normalisation
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+# A sentence ends at . ! or ? followed by whitespace, or at a blank line
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+_TERM_RE = re.compile(r'\w+')
+# Fragments shorter than this (headings, list markers) are not answers on their own
+_MIN_SENTENCE_CHARS = 20
+
+EXTRACTIVE_ANSWERS = registry.counter(
+    "docubrain_extractive_answers_total", "Answers built from document sentences instead of the LLM", ("reason",))
+
+
+class Sentence(NamedTuple):
+    text: str
+    chunk: Dict[str, Any]
+    start: int  # offsets within the chunk's content
+    end: int
+
+
+def _terms(text: str) -> List[str]:
+    return [term for term in _TERM_RE.findall(text.lower()) if term not in ENGLISH_STOP_WORDS]
+
+
+def split_sentences(chunk: Dict[str, Any], min_chars: int = _MIN_SENTENCE_CHARS) -> List[Sentence]:
+    content = chunk['content']
+    sentences = []
+    position = 0
+    for match in [*_SENTENCE_END_RE.finditer(content), None]:
+        end = match.start() if match else len(content)
+        text = content[position:end]
+        stripped = text.strip()
+        if len(stripped) >= min_chars:
+            start = position + len(text) - len(text.lstrip())
+            sentences.append(Sentence(stripped, chunk, start, start + len(stripped)))
+        position = match.end() if match else end
+    return sentences
+
+
+class ExtractiveAnswerer:
+    """Answers from the retrieved chunks' own sentences, ranked by BM25 against the question.
+
+    Needs no provider call, so it serves cheap tiers and stands in when the LLM is unavailable.
+    """
+
+    def __init__(self, max_sentences: int = EXTRACTIVE_MAX_SENTENCES, max_chars: int = EXTRACTIVE_MAX_CHARS):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+
+    @staticmethod
+    def _sentences(chunks: List[Dict[str, Any]], min_chars: int) -> List[Sentence]:
+        sentences, seen = [], set()
+        for chunk in chunks:
+            for sentence in split_sentences(chunk, min_chars):
+                # Chunk overlap and repeated boilerplate yield the same sentence again; quote it once
+                key = " ".join(sentence.text.lower().split())
+                if key not in seen:
+                    seen.add(key)
+                    sentences.append(sentence)
+        return sentences
+
+    def rank(self, question: str, chunks: List[Dict[str, Any]]) -> List[Tuple[Sentence, float]]:
+        """Sentences of the chunks with their BM25 scores, best first; duplicates from chunk overlap dropped"""
+        sentences = self._sentences(chunks, _MIN_SENTENCE_CHARS) or self._sentences(chunks, 1)
+        if not sentences:
+            return []
+
+        # The candidate sentences are the corpus the term weights come from
+        sentence_terms = [Counter(_terms(sentence.text)) for sentence in sentences]
+        document_frequency = Counter(term for terms in sentence_terms for term in terms)
+        average_length = sum(sum(terms.values()) for terms in sentence_terms) / len(sentences) or 1.0
+        query_terms = set(_terms(question))
+
+        scored = []
+        for order, (sentence, terms) in enumerate(zip(sentences, sentence_terms)):
+            length = sum(terms.values())
+            score = 0.0
+            for term in query_terms & terms.keys():
+                idf = math.log(1 + (len(sentences) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                frequency = terms[term]
+                score += idf * frequency * (_BM25_K1 + 1) / (
+                    frequency + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / average_length))
+            scored.append((order, sentence, score))
+        # Ties keep retrieval order, so with no term overlap the best chunk's opening sentences win
+        scored.sort(key=lambda item: (-item[2], item[0]))
+        return [(sentence, score) for _, sentence, score in scored]
+
+    def answer(self, question: str, chunks: List[Dict[str, Any]],
+               reason: str = "requested") -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """Answer text and the sentences it quotes with their source spans; (None, []) when nothing fits"""
+        with stage_timer("extractive_answer"):
+            picked, used = [], 0
+            for sentence, score in self.rank(question, chunks):
+                if len(picked) >= self.max_sentences or (picked and score <= 0):
+                    # Sentences sharing no term with the question only pad the answer
+                    break
+                if picked and used + len(sentence.text) > self.max_chars:
+                    continue
+                picked.append((sentence, score))
+                used += len(sentence.text)
+
+        if not picked:
+            return None, []
+        EXTRACTIVE_ANSWERS.inc(reason)
+        trace_detail("answer_mode", "extractive")
+        trace_detail("extractive_reason", reason)
+
+        sentences = []
+        for sentence, score in picked:
+            span = sentence.chunk.get('span')
+            sentences.append({
+                "text": sentence.text,
+                "document_id": sentence.chunk.get('document_id'),
+                "filename": sentence.chunk.get('filename'),
+                "chunk_index": sentence.chunk.get('chunk_index'),
+                # Character offsets in the document's text, where the chunk's span is stored
+                "start": span[0] + sentence.start if span else None,
+                "end": span[0] + sentence.end if span else None,
+                "score": round(score, 4)
+            })
+        return " ".join(sentence.text for sentence, _ in picked), sentences
+
+
+extractive_answerer = ExtractiveAnswerer()
@@ -0,0 +1,97 @@
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import List, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+from gemini_embeddings import GeminiEmbeddings
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+FAKE_EMBEDDING_LATENCY_MS = float(os.environ.get('FAKE_EMBEDDING_LATENCY_MS', '0'))
+FAKE_LLM_LATENCY_MS = float(os.environ.get('FAKE_LLM_LATENCY_MS', '0'))
+FAKE_ERROR_RATE = float(os.environ.get('FAKE_ERROR_RATE', '0'))
+FAKE_SEED = int(os.environ.get('FAKE_SEED', '0'))
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+class FaultInjector:
+    """Blocking latency and seeded random failures, applied per provider call"""
+
+    def __init__(self, latency_ms: float, error_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def __call__(self, what: str):
+        with self._lock:
+            self.calls += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency_ms:
+            # Blocking, like the synchronous genai client it stands in for
+            time.sleep(self.latency_ms / 1000)
+        if fail:
+            raise RuntimeError(f"Injected {what} error")
+
+
+class FakeEmbeddings(GeminiEmbeddings):
+    """Deterministic stand-in for Gemini embeddings: hashed bag-of-words vectors, L2-normalised"""
+
+    def __init__(self, latency_ms: float = FAKE_EMBEDDING_LATENCY_MS, error_rate: float = FAKE_ERROR_RATE,
+                 seed: int = FAKE_SEED, dimension: int = 768):
+        super().__init__()
+        self.model_name = "fake/hashed-bow"
+        self.embedding_dimension = dimension
+        self.faults = FaultInjector(latency_ms, error_rate, seed)
+
+    def provider_available(self) -> bool:
+        return True
+
+    def _provider_embed(self, text: str, task_type: str) -> List[float]:
+        self.faults("embedding")
+        return self._vector(text)
+
+    def _provider_embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        # One injected delay/failure per call, like one batched API round trip
+        self.faults("embedding")
+        return [self._vector(text) for text in texts]
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.embedding_dimension
+        for token in _TOKEN_RE.findall(text.lower()):
+            digest = zlib.crc32(token.encode('utf-8'))
+            vector[digest % self.embedding_dimension] += 1.0 if digest & 0x80000000 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeLLM:
+    """Deterministic stand-in for genai.GenerativeModel: answers with the first context sentence"""
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, error_rate: float = FAKE_ERROR_RATE,
+                 seed: int = FAKE_SEED):
+        self.faults = FaultInjector(latency_ms, error_rate, seed + 1)
+
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None) -> FakeResponse:
+        """request_options is accepted for parity with the Gemini client and ignored"""
+        self.faults("generation")
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0].strip()
+        first_sentence = re.split(r'(?<=[.!?])\s', context, maxsplit=1)[0]
+        return FakeResponse(f"[fake] {first_sentence[:300]}")
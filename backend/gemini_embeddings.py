@@ -1,15 +1,22 @@
+import logging
 import numpy as np
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from sklearn.metrics.pairwise import cosine_similarity
 import google.generativeai as genai
 from dotenv import load_dotenv
 from pathlib import Path
+from metrics import stage_timer
+from log_config import sample
+from provider_gateway import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, ProviderBusy, embedding_gateway
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# gemini (default) or fake, for hermetic benchmarks
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'gemini').lower()
+
 # Configure Gemini API
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 if GEMINI_API_KEY:
@@ -18,52 +25,97 @@ if GEMINI_API_KEY:
 else:
     print("[ERROR] GEMINI_API_KEY not found in environment variables")
 
+# Most texts the embedding API accepts in one batch request
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', '100'))
+
+logger = logging.getLogger(__name__)
+
+def _priority(task_type: str) -> int:
+    """Query embeddings serve interactive requests; document embeddings are ingestion"""
+    return PRIORITY_INTERACTIVE if task_type == "retrieval_query" else PRIORITY_BACKGROUND
+
 class GeminiEmbeddings:
     def __init__(self):
         self.model_name = "models/text-embedding-004"
         self.embedding_dimension = 768  # Gemini text-embedding-004 outputs 768-dimensional embeddings
+        self.relevance_threshold = 0.1  # Minimum cosine similarity for a chunk to count as relevant
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """In-process state, for the admin structure report"""
+        return {"model": self.model_name, "dimension": self.embedding_dimension,
+                "relevance_threshold": self.relevance_threshold}
+
+    def provider_available(self) -> bool:
+        """Whether the embedding provider can be called"""
+        return bool(GEMINI_API_KEY)
+
+    def _embed(self, text: str, task_type: str) -> List[float]:
+        """Single provider call through the gateway; task_type is retrieval_document or retrieval_query"""
+        return embedding_gateway.call(_priority(task_type), self._provider_embed, text, task_type)
+
+    def _embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """One provider call for up to EMBED_BATCH_SIZE texts, through the gateway"""
+        return embedding_gateway.call(_priority(task_type), self._provider_embed_batch, texts, task_type,
+                                      cost=len(texts))
+
+    def _provider_embed(self, text: str, task_type: str) -> List[float]:
+        result = genai.embed_content(
+            model=self.model_name,
+            content=text,
+            task_type=task_type
+        )
+        return result['embedding']
+
+    def _provider_embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        result = genai.embed_content(
+            model=self.model_name,
+            content=texts,
+            task_type=task_type
+        )
+        return result['embedding']
 
     def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings using Gemini Text Embeddings API"""
         try:
             if not texts:
-                print("[ERROR] No texts provided for embedding generation")
+                logger.warning("No texts provided for embedding generation")
                 return []
 
-            if not GEMINI_API_KEY:
-                print("[ERROR] Gemini API key not configured, using fallback")
+            if not self.provider_available():
+                logger.warning("Embedding provider not configured, using fallback embeddings")
                 return self._fallback_embeddings(texts)
 
-            print(f"[PROCESSING] Generating Gemini embeddings for {len(texts)} texts...")
-
             # Generate embeddings for all texts
             embeddings = []
+            failed = 0
             for i, text in enumerate(texts):
                 try:
                     # Gemini API call for embedding
-                    result = genai.embed_content(
-                        model=self.model_name,
-                        content=text,
-                        task_type="retrieval_document"  # For document embeddings
-                    )
-
-                    embedding = result['embedding']
+                    with stage_timer("embedding"):
+                        embedding = self._embed(text, "retrieval_document")  # For document embeddings
                     embeddings.append(embedding)
 
-                    if (i + 1) % 10 == 0:
-                        print(f"  [OK] Generated {i + 1}/{len(texts)} embeddings")
-
+                except ProviderBusy:
+                    raise
                 except Exception as e:
-                    print(f"[ERROR] Error generating embedding for text {i}: {e}")
+                    failed += 1
+                    if sample():
+                        logger.debug("Embedding failed for text", extra={"text_index": i, "error": str(e)})
                     # Use zero vector as fallback for this text
                     embeddings.append([0.0] * self.embedding_dimension)
 
-            print(f"[OK] Successfully generated {len(embeddings)} Gemini embeddings with dimension {self.embedding_dimension}")
+            if failed:
+                logger.warning("Some embeddings failed and were replaced with zero vectors",
+                               extra={"failed": failed, "texts": len(texts)})
+            logger.info("Generated document embeddings",
+                        extra={"texts": len(texts), "dimension": self.embedding_dimension, "model": self.model_name})
 
             return embeddings
 
+        except ProviderBusy:
+            raise
         except Exception as e:
-            print(f"[ERROR] Gemini embedding error: {e}")
+            logger.error("Embedding generation failed, using fallback embeddings", extra={"error": str(e)})
             # Fallback to simple embeddings
             return self._fallback_embeddings(texts)
 
@@ -71,78 +123,177 @@ class GeminiEmbeddings:
         """Get embedding for a single query"""
         try:
             if not query:
-                print("[ERROR] Empty query provided")
+                logger.warning("Empty query provided")
                 return [0.0] * self.embedding_dimension
 
-            if not GEMINI_API_KEY:
-                print("[ERROR] Gemini API key not configured, using fallback")
+            if not self.provider_available():
+                logger.warning("Embedding provider not configured, using fallback embeddings")
                 return self._fallback_embeddings([query])[0]
 
-            print(f"[PROCESSING] Generating Gemini query embedding...")
-
             # Gemini API call for query embedding
-            result = genai.embed_content(
-                model=self.model_name,
-                content=query,
-                task_type="retrieval_query"  # For query embeddings
-            )
-
-            embedding = result['embedding']
-
-            print(f"[OK] Generated query embedding with dimension {len(embedding)}")
+            with stage_timer("embedding"):
+                embedding = self._embed(query, "retrieval_query")  # For query embeddings
 
             return embedding
 
+        except ProviderBusy:
+            raise
         except Exception as e:
-            print(f"[ERROR] Error generating query embedding: {e}")
+            logger.error("Query embedding failed, using fallback embedding", extra={"error": str(e)})
             return self._fallback_embeddings([query])[0]
 
+    def get_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings for several queries, in batched provider calls"""
+        if not self.provider_available():
+            logger.warning("Embedding provider not configured, using fallback embeddings")
+            return [self._fallback_embeddings([query])[0] for query in queries]
+
+        embeddings = []
+        for start in range(0, len(queries), EMBED_BATCH_SIZE):
+            batch = queries[start:start + EMBED_BATCH_SIZE]
+            try:
+                with stage_timer("embedding"):
+                    embeddings.extend(self._embed_batch(batch, "retrieval_query"))
+            except ProviderBusy:
+                raise
+            except Exception as e:
+                logger.error("Batch query embedding failed, embedding one by one",
+                             extra={"queries": len(batch), "error": str(e)})
+                embeddings.extend(self.get_query_embedding(query) for query in batch)
+        return embeddings
+
+    def find_relevant_chunks_batch(self, queries: List[str],
+                                   documents: List[Tuple[Sequence[str], List[List[float]]]],
+                                   top_k: int = 5) -> List[List[Tuple[int, dict]]]:
+        """Relevant chunks for several queries over several documents, scored with one matrix product.
+
+        `documents` holds (chunks, embeddings) per document. Returns, for each query, pairs of
+        (document index, chunk result); a document with no chunk over the relevance threshold
+        falls back to keyword search, as in find_relevant_chunks.
+        """
+        query_matrix = np.asarray(self.get_query_embeddings(queries), dtype=np.float64)
+
+        with stage_timer("scoring"):
+            dimension = query_matrix.shape[1]
+            blocks, segments, unscored = [], [], []
+            offset = 0
+            for doc_index, (chunks, embeddings) in enumerate(documents):
+                try:
+                    block = np.asarray(embeddings, dtype=np.float64)
+                except ValueError:
+                    block = None
+                if block is None or len(chunks) == 0 or block.shape != (len(chunks), dimension):
+                    unscored.append(doc_index)
+                    continue
+                blocks.append(block)
+                segments.append((doc_index, offset, offset + len(block)))
+                offset += len(block)
+
+            scores = None
+            if blocks:
+                chunk_matrix = np.vstack(blocks)
+                chunk_norms = np.linalg.norm(chunk_matrix, axis=1)
+                chunk_matrix /= np.where(chunk_norms == 0, 1, chunk_norms)[:, None]
+                query_norms = np.linalg.norm(query_matrix, axis=1)
+                # queries x chunks cosine similarities; zero vectors score 0
+                scores = (query_matrix / np.where(query_norms == 0, 1, query_norms)[:, None]) @ chunk_matrix.T
+            else:
+                query_norms = np.zeros(len(queries))
+
+        if unscored:
+            logger.warning("Documents without usable embeddings use keyword search",
+                           extra={"documents": len(unscored), "query_dimension": dimension})
+
+        results = []
+        for query_index, query in enumerate(queries):
+            pairs = []
+            if query_norms[query_index] == 0:
+                # No usable query embedding: keyword search everywhere
+                for doc_index, (chunks, _) in enumerate(documents):
+                    pairs.extend((doc_index, r) for r in self._simple_keyword_search(query, chunks, top_k))
+                results.append(pairs)
+                continue
+
+            for doc_index, start, end in segments:
+                row = scores[query_index, start:end]
+                # Stable, so ties rank by chunk order exactly as in find_relevant_chunks
+                best = np.argsort(-row, kind="stable")[:top_k]
+                chunks = documents[doc_index][0]
+                doc_results = [{
+                    'chunk_index': int(idx),
+                    'content': chunks[int(idx)],
+                    'relevance_score': float(row[idx])
+                } for idx in best if row[idx] > self.relevance_threshold]
+                if not doc_results:
+                    doc_results = self._simple_keyword_search(query, chunks, top_k)
+                pairs.extend((doc_index, r) for r in doc_results)
+
+            for doc_index in unscored:
+                pairs.extend((doc_index, r) for r in self._simple_keyword_search(query, documents[doc_index][0], top_k))
+            results.append(pairs)
+
+        return results
+
     def find_relevant_chunks(self, query: str, document_chunks: List[str],
-                           document_embeddings: List[List[float]], top_k: int = 5) -> List[dict]:
-        """Find most relevant chunks using cosine similarity"""
+                           document_embeddings: List[List[float]], top_k: int = 5,
+                           query_embedding: Optional[List[float]] = None) -> List[dict]:
+        """Find most relevant chunks using cosine similarity; pass query_embedding to reuse one across documents"""
         try:
             if not document_chunks or not document_embeddings:
-                print("[ERROR] No document chunks or embeddings provided")
+                logger.warning("No document chunks or embeddings provided")
                 return []
 
             if len(document_chunks) != len(document_embeddings):
-                print(f"[ERROR] Mismatch: {len(document_chunks)} chunks but {len(document_embeddings)} embeddings")
+                logger.error("Chunk and embedding counts differ",
+                             extra={"chunks": len(document_chunks), "embeddings": len(document_embeddings)})
                 return []
 
             # Get query embedding
-            query_embedding = self.get_query_embedding(query)
+            if query_embedding is None:
+                query_embedding = self.get_query_embedding(query)
 
             if not query_embedding or all(x == 0 for x in query_embedding):
-                print("[ERROR] Failed to generate query embedding, using keyword search")
+                logger.warning("No usable query embedding, using keyword search")
                 return self._simple_keyword_search(query, document_chunks, top_k)
 
-            # Calculate cosine similarities
-            similarities = []
-            query_embedding_np = np.array(query_embedding).reshape(1, -1)
-
-            for i, doc_emb in enumerate(document_embeddings):
-                try:
-                    # Ensure same dimensions
-                    if len(doc_emb) != len(query_embedding):
-                        print(f"[WARNING] Dimension mismatch: query={len(query_embedding)}, doc={len(doc_emb)}")
+            with stage_timer("scoring"):
+                # Calculate cosine similarities
+                similarities = []
+                mismatched = 0
+                failed = 0
+                query_embedding_np = np.array(query_embedding).reshape(1, -1)
+
+                for i, doc_emb in enumerate(document_embeddings):
+                    try:
+                        # Ensure same dimensions
+                        if len(doc_emb) != len(query_embedding):
+                            mismatched += 1
+                            continue
+
+                        doc_emb_np = np.array(doc_emb).reshape(1, -1)
+
+                        # Handle zero vectors
+                        if np.all(query_embedding_np == 0) or np.all(doc_emb_np == 0):
+                            similarity = 0.0
+                        else:
+                            similarity = cosine_similarity(query_embedding_np, doc_emb_np)[0][0]
+
+                        similarities.append((i, similarity))
+
+                    except Exception as e:
+                        failed += 1
+                        if sample():
+                            logger.debug("Similarity failed for chunk", extra={"chunk_index": i, "error": str(e)})
                         continue
 
-                    doc_emb_np = np.array(doc_emb).reshape(1, -1)
-
-                    # Handle zero vectors
-                    if np.all(query_embedding_np == 0) or np.all(doc_emb_np == 0):
-                        similarity = 0.0
-                    else:
-                        similarity = cosine_similarity(query_embedding_np, doc_emb_np)[0][0]
-
-                    similarities.append((i, similarity))
-
-                except Exception as e:
-                    print(f"[ERROR] Error computing similarity for chunk {i}: {e}")
-                    continue
+            if mismatched or failed:
+                logger.warning("Chunks skipped during scoring", extra={
+                    "dimension_mismatch": mismatched, "failed": failed, "chunks": len(document_embeddings),
+                    "query_dimension": len(query_embedding)
+                })
 
             if not similarities:
-                print("[ERROR] No valid similarities computed, using keyword search")
+                logger.warning("No valid similarities computed, using keyword search")
                 return self._simple_keyword_search(query, document_chunks, top_k)
 
             # Sort by similarity and take top k
@@ -150,44 +301,50 @@ class GeminiEmbeddings:
 
             results = []
             for idx, sim_score in similarities[:top_k]:
-                if sim_score > 0.1:  # Relevance threshold
+                if sim_score > self.relevance_threshold:
                     results.append({
                         'chunk_index': int(idx),
                         'content': document_chunks[idx],
                         'relevance_score': float(sim_score)
                     })
 
-            print(f"[OK] Found {len(results)} relevant chunks with scores: {[r['relevance_score'] for r in results]}")
+            if sample():
+                logger.debug("Relevant chunks for document", extra={
+                    "chunks": len(document_chunks), "relevant": len(results),
+                    "scores": [round(r['relevance_score'], 4) for r in results]
+                })
 
             # If no results from embedding search, try keyword search
             if not results:
-                print("[ERROR] No relevant chunks found with embeddings, trying keyword search")
                 return self._simple_keyword_search(query, document_chunks, top_k)
 
             return results
 
+        except ProviderBusy:
+            raise
         except Exception as e:
-            print(f"[ERROR] Error in relevance search: {e}")
+            logger.error("Relevance search failed, using keyword search", extra={"error": str(e)})
             # Fallback to simple keyword matching
             return self._simple_keyword_search(query, document_chunks, top_k)
 
     def _simple_keyword_search(self, query: str, chunks: List[str], top_k: int = 5) -> List[dict]:
         """Fallback: Simple keyword-based search"""
         try:
-            query_words = set(query.lower().split())
+            with stage_timer("keyword_fallback"):
+                query_words = set(query.lower().split())
 
-            chunk_scores = []
-            for i, chunk in enumerate(chunks):
-                chunk_words = set(chunk.lower().split())
-                # Calculate score based on word overlap
-                overlap = query_words.intersection(chunk_words)
-                score = len(overlap) / len(query_words) if query_words else 0
+                chunk_scores = []
+                for i, chunk in enumerate(chunks):
+                    chunk_words = set(chunk.lower().split())
+                    # Calculate score based on word overlap
+                    overlap = query_words.intersection(chunk_words)
+                    score = len(overlap) / len(query_words) if query_words else 0
 
-                # Bonus for exact phrase matches
-                if query.lower() in chunk.lower():
-                    score += 0.5
+                    # Bonus for exact phrase matches
+                    if query.lower() in chunk.lower():
+                        score += 0.5
 
-                chunk_scores.append((i, score))
+                    chunk_scores.append((i, score))
 
             # Sort by score and take top k
             chunk_scores.sort(key=lambda x: x[1], reverse=True)
@@ -201,17 +358,18 @@ class GeminiEmbeddings:
                         'relevance_score': score
                     })
 
-            print(f"[OK] Keyword search found {len(results)} relevant chunks")
+            if sample():
+                logger.debug("Keyword search results", extra={"chunks": len(chunks), "relevant": len(results)})
 
             return results
 
         except Exception as e:
-            print(f"[ERROR] Error in keyword search: {e}")
+            logger.error("Keyword search failed", extra={"error": str(e)})
             return []
 
     def _fallback_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Fallback: Simple word-based embeddings with fixed dimensions"""
-        print("[WARNING] Using fallback embeddings (simple word vectors)")
+        logger.warning("Using fallback embeddings (simple word vectors)")
 
         # Create a fixed vocabulary from all texts
         all_words = set()
@@ -234,5 +392,16 @@ class GeminiEmbeddings:
 
         return embeddings
 
+def create_embeddings_engine(provider: str = EMBEDDING_PROVIDER) -> GeminiEmbeddings:
+    """Build the embedding engine selected by EMBEDDING_PROVIDER (gemini or fake)"""
+    if provider == 'fake':
+        from fake_providers import FakeEmbeddings
+        return FakeEmbeddings()
+    return GeminiEmbeddings()
+
 # Global embeddings instance
-embeddings_engine = GeminiEmbeddings()
+embeddings_engine = create_embeddings_engine()
+
+if embeddings_engine.provider_available():
+    # Recovery check for the circuit breaker; bypasses the breaker itself
+    embedding_gateway.breaker.probe = lambda: embeddings_engine._provider_embed("health check", "retrieval_query")
@@ -1,10 +1,11 @@
 import numpy as np
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, Tuple
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 import hashlib
+import sys
 
 class LightweightEmbeddings:
     def __init__(self):
@@ -13,6 +14,19 @@ class LightweightEmbeddings:
         self.is_fitted = False
         self.document_embeddings_cache = {}
         self.all_processed_texts = []  # Store all texts for consistent vectorizer fitting
+        self.relevance_threshold = 0.05  # Lower threshold for better recall
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        """Sizes of the state this engine accumulates, for the admin structure report"""
+        vocabulary = getattr(self.tfidf_vectorizer, 'vocabulary_', None) if self.is_fitted else None
+        return {
+            "processed_texts": len(self.all_processed_texts),
+            "processed_text_bytes": sys.getsizeof(self.all_processed_texts) + sum(
+                sys.getsizeof(text) for text in self.all_processed_texts),
+            "vectorizer_vocabulary": len(vocabulary) if vocabulary is not None else 0,
+            "global_vocabulary": len(self.global_vocabulary),
+            "embedding_cache_entries": len(self.document_embeddings_cache)
+        }
     
     def _get_or_create_vectorizer(self, texts: List[str] = None) -> TfidfVectorizer:
         """Create or get a TF-IDF vectorizer fitted on all processed texts"""
@@ -157,7 +171,7 @@ class LightweightEmbeddings:
             
             results = []
             for idx, sim_score in similarities[:top_k]:
-                if sim_score > 0.05:  # Lower threshold for better recall
+                if sim_score > self.relevance_threshold:
                     results.append({
                         'chunk_index': int(idx),
                         'content': document_chunks[idx],
@@ -178,6 +192,49 @@ class LightweightEmbeddings:
             # Fallback to simple keyword matching
             return self._simple_keyword_search(query, document_chunks, top_k)
     
+    def rank_chunks(self, queries: List[str], documents: List[Sequence[str]],
+                    top_k: int = 5) -> List[List[Tuple[int, dict]]]:
+        """TF-IDF ranking of chunks against queries, with nothing stored between calls.
+
+        Local stand-in for embedding search when the embedding provider is down. The
+        vectorizer is fitted on these documents' chunks only, so the engine's accumulated
+        state is neither used nor grown. Returns, per query, (document index, chunk result)
+        pairs, like GeminiEmbeddings.find_relevant_chunks_batch.
+        """
+        texts, owners = [], []
+        for doc_index, chunks in enumerate(documents):
+            for chunk_index, chunk in enumerate(chunks):
+                texts.append(chunk)
+                owners.append((doc_index, chunk_index))
+        if not texts or not queries:
+            return [[] for _ in queries]
+
+        vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), lowercase=True, sublinear_tf=True)
+        try:
+            chunk_matrix = vectorizer.fit_transform(texts)
+        except ValueError:
+            # Only stop words: nothing to rank on
+            return [[] for _ in queries]
+        # Rows are L2-normalised, so the product is cosine similarity
+        scores = (vectorizer.transform(queries) @ chunk_matrix.T).toarray()
+
+        results = []
+        for row in scores:
+            best_per_document: Dict[int, List[Tuple[int, dict]]] = {}
+            for position in np.argsort(-row, kind="stable"):
+                if row[position] <= self.relevance_threshold:
+                    break
+                doc_index, chunk_index = owners[position]
+                best = best_per_document.setdefault(doc_index, [])
+                if len(best) < top_k:
+                    best.append((doc_index, {
+                        'chunk_index': chunk_index,
+                        'content': texts[position],
+                        'relevance_score': float(row[position])
+                    }))
+            results.append([pair for pairs in best_per_document.values() for pair in pairs])
+        return results
+
     def _simple_keyword_search(self, query: str, chunks: List[str], top_k: int = 3) -> List[dict]:
         """Fallback: Simple keyword-based search"""
         try:
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+from metrics import registry
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+LOOP_MONITOR_ENABLED = os.environ.get('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+# How often the monitor wakes up; lag is how late each wake-up is
+LOOP_LAG_INTERVAL_MS = float(os.environ.get('LOOP_LAG_INTERVAL_MS', '250'))
+# A wake-up later than this counts as the loop having been blocked
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '100'))
+# Debug mode: a watchdog thread captures the loop thread's stack while it is blocked
+LOOP_BLOCK_DEBUG = os.environ.get('LOOP_BLOCK_DEBUG', 'false').lower() == 'true'
+LOOP_BLOCK_MAX_REPORTS = int(os.environ.get('LOOP_BLOCK_MAX_REPORTS', '50'))
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = registry.histogram("docubrain_event_loop_lag_seconds",
+                              "How late the event loop ran a timer scheduled every LOOP_LAG_INTERVAL_MS",
+                              buckets=LAG_BUCKETS)
+LOOP_BLOCKS = registry.counter("docubrain_event_loop_blocks_total",
+                               "Event loop stalls longer than LOOP_BLOCK_THRESHOLD_MS")
+
+
+class LoopMonitor:
+    """Measures event-loop lag continuously and, in debug mode, captures the stack of blocking code"""
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 debug: bool = LOOP_BLOCK_DEBUG, max_reports: int = LOOP_BLOCK_MAX_REPORTS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.debug = debug
+        self.reports: deque = deque(maxlen=max_reports)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.blocks = 0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # time.monotonic() when the loop last ran the monitor; read by the watchdog thread
+        self._beat: Optional[float] = None
+
+    def start(self):
+        """Start monitoring the running loop; call from inside it"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-block-watchdog", daemon=True)
+            self._watchdog.start()
+        print(f"[OK] Event loop monitor started (interval {self.interval * 1000:.0f}ms, "
+              f"block threshold {self.threshold * 1000:.0f}ms, stack capture {'on' if self.debug else 'off'})")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _measure(self):
+        while True:
+            self._beat = time.monotonic()
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            LOOP_LAG.observe(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocks += 1
+                LOOP_BLOCKS.inc()
+                if not self.debug:
+                    logger.warning("Event loop blocked", extra={"lag_ms": round(lag * 1000, 1)})
+
+    def _watch(self):
+        """Watchdog thread: when the loop misses its heartbeat by more than the threshold, grab its stack once"""
+        reported_beat = None
+        poll = max(self.threshold / 4, 0.005)
+        while not self._stop.wait(poll):
+            beat = self._beat
+            if beat is None or beat == reported_beat:
+                continue
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for <= self.threshold:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            del frame
+            report = {
+                "at": time.time(),
+                "blocked_ms_when_captured": round(blocked_for * 1000, 1),
+                "stack": [line.rstrip() for line in stack]
+            }
+            self.reports.append(report)
+            logger.warning("Event loop blocked; stack of the loop thread captured",
+                           extra={"blocked_ms": report["blocked_ms_when_captured"], "stack": "".join(stack)})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "debug": self.debug,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "blocks": self.blocks
+        }
+
+    def recent_blocks(self) -> List[Dict[str, Any]]:
+        return list(self.reports)
+
+
+loop_monitor = LoopMonitor()
+
+registry.gauge("docubrain_event_loop_lag_max_seconds", "Largest event loop lag seen since startup",
+               lambda: loop_monitor.max_lag)
@@ -0,0 +1,210 @@
+import asyncio
+import os
+from typing import List, Dict, Any, Optional, AsyncIterator
+from datetime import datetime
+from compression import compress_text, decompress_text, resolve_codec, CODEC_NONE
+from storage import StorageBackend, load_document, iso_utc, encode_cursor, decode_cursor
+
+# Simulated per-operation round trip, for benchmarks that want storage latency in the picture
+MEMORY_DB_LATENCY_MS = float(os.environ.get('MEMORY_DB_LATENCY_MS', '0'))
+
+LIST_FIELDS = ("id", "filename", "upload_time", "chunk_count", "status")
+INFO_FIELDS = ("id", "user_id", "filename", "upload_time", "chunk_count", "status", "content_length", "page_spans")
+QUERY_FIELDS = ("id", "filename", "content", "content_codec", "chunks", "chunk_spans", "embeddings")
+
+
+def _pick(document: Dict[str, Any], fields) -> Dict[str, Any]:
+    return {field: document[field] for field in fields if field in document}
+
+
+class MemoryDatabase(StorageBackend):
+    """In-process storage backend for hermetic tests and benchmarks; nothing is persisted"""
+
+    def __init__(self, latency_ms: float = MEMORY_DB_LATENCY_MS):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+    async def _round_trip(self):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    async def init_db(self):
+        print("[OK] Using in-memory storage backend")
+
+    def memory_stats(self) -> Dict[str, int]:
+        stats = super().memory_stats()
+        stats.update(memory_users=len(self.users), memory_documents=len(self.documents))
+        return stats
+
+    def reset(self):
+        self.users.clear()
+        self.documents.clear()
+        self.api_key_cache.clear()
+
+    # Users
+
+    async def create_user(self, user_data: Dict[str, Any]) -> bool:
+        """Create a new user"""
+        await self._round_trip()
+        if isinstance(user_data.get('created_at'), datetime):
+            user_data['created_at'] = user_data['created_at'].isoformat()
+        if any(user['username'] == user_data['username'] for user in self.users.values()):
+            return False
+        self.users[user_data['user_id']] = dict(user_data)
+        self.api_key_cache.invalidate(user_data.get('api_key'))
+        return True
+
+    async def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get user by username"""
+        await self._round_trip()
+        for user in self.users.values():
+            if user['username'] == username:
+                return dict(user)
+        return None
+
+    async def _fetch_user_by_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
+        await self._round_trip()
+        for user in self.users.values():
+            if user.get('api_key') == api_key:
+                return dict(user)
+        return None
+
+    async def update_user_api_key(self, user_id: str, api_key: str) -> bool:
+        """Replace a user's API key and drop cached lookups for the old and new keys"""
+        await self._round_trip()
+        self.api_key_cache.invalidate_user(user_id)
+        self.api_key_cache.invalidate(api_key)
+        if user_id not in self.users:
+            return False
+        self.users[user_id]['api_key'] = api_key
+        return True
+
+    async def delete_user(self, user_id: str) -> bool:
+        """Delete a user and their documents"""
+        await self._round_trip()
+        self.api_key_cache.invalidate_user(user_id)
+        for document_id in [d['id'] for d in self.documents.values() if d['user_id'] == user_id]:
+            del self.documents[document_id]
+        return self.users.pop(user_id, None) is not None
+
+    # Documents
+
+    async def create_document(self, doc_data: Dict[str, Any]) -> bool:
+        """Create a new document"""
+        await self._round_trip()
+        if isinstance(doc_data.get('upload_time'), datetime):
+            doc_data['upload_time'] = doc_data['upload_time'].isoformat()
+        if isinstance(doc_data.get('content'), str) and 'content_codec' not in doc_data:
+            doc_data['content'], doc_data['content_codec'] = compress_text(doc_data['content'])
+        if doc_data['id'] in self.documents:
+            return False
+        self.documents[doc_data['id']] = dict(doc_data)
+        return True
+
+    def _user_documents(self, user_id: str) -> List[Dict[str, Any]]:
+        return [document for document in self.documents.values() if document['user_id'] == user_id]
+
+    async def get_user_documents(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a user"""
+        await self._round_trip()
+        documents = sorted(self._user_documents(user_id), key=lambda d: d['upload_time'], reverse=True)
+        return [_pick(document, LIST_FIELDS) for document in documents]
+
+    async def get_user_documents_page(self, user_id: str, limit: int, cursor: Optional[str] = None,
+                                      filename_prefix: Optional[str] = None, status: Optional[str] = None,
+                                      uploaded_after: Optional[datetime] = None,
+                                      uploaded_before: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get one page of a user's documents, newest first, using keyset pagination on (upload_time, id)"""
+        position = tuple(decode_cursor(cursor)) if cursor else None
+        after = iso_utc(uploaded_after) if uploaded_after else None
+        before = iso_utc(uploaded_before) if uploaded_before else None
+        await self._round_trip()
+
+        documents = []
+        for document in self._user_documents(user_id):
+            if filename_prefix and not document['filename'].startswith(filename_prefix):
+                continue
+            if status and document.get('status') != status:
+                continue
+            if after and document['upload_time'] < after:
+                continue
+            if before and document['upload_time'] >= before:
+                continue
+            if position and (document['upload_time'], document['id']) >= position:
+                continue
+            documents.append(document)
+
+        documents.sort(key=lambda d: (d['upload_time'], d['id']), reverse=True)
+        documents = [_pick(document, LIST_FIELDS) for document in documents[:limit + 1]]
+        next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return {"documents": documents[:limit], "next_cursor": next_cursor}
+
+    async def get_user_documents_with_content(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a user with full content for querying"""
+        await self._round_trip()
+        return [load_document(_pick(document, QUERY_FIELDS)) for document in self._user_documents(user_id)]
+
+    async def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document by its ID"""
+        await self._round_trip()
+        document = self.documents.get(document_id)
+        return load_document(dict(document)) if document else None
+
+    def _owned(self, document_id: str, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        document = self.documents.get(document_id)
+        if document is None or (user_id is not None and document['user_id'] != user_id):
+            return None
+        return document
+
+    async def get_document_info(self, document_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get document metadata without content, chunks or embeddings, optionally scoped to an owner"""
+        await self._round_trip()
+        document = self._owned(document_id, user_id)
+        return _pick(document, INFO_FIELDS) if document else None
+
+    async def get_document_content_range(self, document_id: str, start: int = 0, end: Optional[int] = None,
+                                         user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a character range of a document's content"""
+        await self._round_trip()
+        document = self._owned(document_id, user_id)
+        if document is None:
+            return None
+        text = decompress_text(document.get('content'), document.get('content_codec'))
+        start = min(max(0, start), len(text))
+        content = text[start:end]
+        return {"content": content, "start": start, "end": start + len(content), "total_length": len(text)}
+
+    async def iter_document_content(self, document_id: str, window: int = 65536,
+                                    user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield a document's content in windows of `window` characters"""
+        part = await self.get_document_content_range(document_id, user_id=user_id)
+        text = part["content"] if part else ""
+        for offset in range(0, len(text), window):
+            yield text[offset:offset + window]
+
+    async def delete_user_document(self, document_id: str, user_id: str) -> Optional[bool]:
+        """Delete a document owned by the user"""
+        await self._round_trip()
+        if self._owned(document_id, user_id) is None:
+            return False
+        del self.documents[document_id]
+        return True
+
+    async def delete_document(self, document_id: str) -> bool:
+        """Delete a document by its ID"""
+        await self._round_trip()
+        return self.documents.pop(document_id, None) is not None
+
+    async def recompress_documents(self, codec: Optional[str] = None, batch_size: int = 50) -> int:
+        """Re-encode stored document content with the given codec; returns the number of records rewritten"""
+        codec = resolve_codec(codec)
+        updated = 0
+        for document in self.documents.values():
+            current = document.get('content_codec', CODEC_NONE)
+            payload, used = compress_text(decompress_text(document.get('content'), current), codec)
+            if used != current:
+                document['content'], document['content_codec'] = payload, used
+                updated += 1
+        return updated
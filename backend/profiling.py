@@ -0,0 +1,236 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Admin endpoints are disabled (404) unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+PROFILE_MAX_REQUESTS = int(os.environ.get('PROFILE_MAX_REQUESTS', '1000'))
+TRACEMALLOC_FRAMES = int(os.environ.get('TRACEMALLOC_FRAMES', '10'))
+
+PSTATS_SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls", "time", "filename", "name")
+# Admin traffic itself is never profiled
+ADMIN_PATH_PREFIX = "/api/admin/"
+
+
+class RequestProfiler:
+    """cProfile over a window covering the next N HTTP requests.
+
+    The profiler runs on the event loop thread from the first armed request until the Nth
+    one finishes, so other work interleaved on the loop in that window is included; code
+    running in worker threads is not. When not armed the only cost is one integer check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.remaining = 0
+        self.path_prefix: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._active = 0
+        self._profiled = 0
+        self._started_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+    def arm(self, requests: int, path_prefix: Optional[str] = None):
+        with self._lock:
+            if self._profile is not None or self.remaining > 0:
+                raise RuntimeError("A profiling window is already armed or running")
+            self.remaining = min(requests, PROFILE_MAX_REQUESTS)
+            self.path_prefix = path_prefix
+            self._profiled = 0
+            self.result = None
+
+    def cancel(self):
+        with self._lock:
+            self.remaining = 0
+            if self._profile is not None and self._active == 0:
+                self._finish()
+
+    def wants(self, path: str) -> bool:
+        if self.remaining <= 0 or path.startswith(ADMIN_PATH_PREFIX):
+            return False
+        return self.path_prefix is None or path.startswith(self.path_prefix)
+
+    def begin(self) -> bool:
+        """Start (or join) the profiling window for one request; False if the window filled up meanwhile"""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            self._active += 1
+            if self._profile is None:
+                self._profile = cProfile.Profile()
+                self._started_at = time.perf_counter()
+                self._profile.enable()
+            return True
+
+    def end(self):
+        with self._lock:
+            self._active -= 1
+            self._profiled += 1
+            if self._active == 0 and self.remaining <= 0:
+                self._finish()
+
+    def _finish(self):
+        self._profile.disable()
+        self.result = {
+            "stats": marshal.dumps(self._profile_stats(self._profile)),
+            "requests": self._profiled,
+            "seconds": time.perf_counter() - self._started_at
+        }
+        self._profile = None
+
+    @staticmethod
+    def _profile_stats(profile: cProfile.Profile) -> Dict:
+        profile.create_stats()
+        return profile.stats
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "armed": self.remaining > 0 or self._profile is not None,
+            "remaining": self.remaining,
+            "in_flight": self._active,
+            "path_prefix": self.path_prefix,
+            "ready": self.result is not None,
+            "requests": self.result["requests"] if self.result else self._profiled,
+            "seconds": self.result["seconds"] if self.result else None
+        }
+
+    def report(self, sort: str = "cumulative", limit: int = 50) -> Optional[str]:
+        """Top functions of the last finished window in pstats text form"""
+        if self.result is None:
+            return None
+        stats = pstats.Stats(_StatsSource(marshal.loads(self.result["stats"])), stream=io.StringIO())
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return stats.stream.getvalue()
+
+    def raw(self) -> Optional[bytes]:
+        """Last finished window as a .pstats file (marshalled stats), for snakeviz or pstats.Stats"""
+        return self.result["stats"] if self.result else None
+
+
+class _StatsSource:
+    """Adapter letting pstats.Stats load already-collected stats"""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfilingMiddleware:
+    """ASGI middleware feeding requests into the profiler while it is armed"""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        if not self.profiler.begin():
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.end()
+
+
+class MemoryProfiler:
+    """tracemalloc baseline/diff on demand; tracing is off (and free) until a baseline is taken"""
+
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES):
+        self.frames = frames
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_at: Optional[float] = None
+        self._started_tracing = False
+
+    def take_baseline(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.baseline = self._snapshot()
+        self.baseline_at = time.time()
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "traced_bytes": current, "peak_bytes": peak}
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def diff(self, limit: int = 25, group_by: str = "lineno") -> Optional[Dict[str, Any]]:
+        """Top allocation changes since the baseline"""
+        if self.baseline is None or not tracemalloc.is_tracing():
+            return None
+        snapshot = self._snapshot()
+        changes = snapshot.compare_to(self.baseline, group_by)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "since_seconds": time.time() - self.baseline_at,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "total_diff_bytes": sum(change.size_diff for change in changes),
+            "top": [{
+                "location": str(change.traceback[0]) if change.traceback else "?",
+                "traceback": [str(frame) for frame in change.traceback] if group_by == "traceback" else None,
+                "size_diff_bytes": change.size_diff,
+                "size_bytes": change.size,
+                "count_diff": change.count_diff,
+                "count": change.count
+            } for change in changes[:limit]]
+        }
+
+    def stop(self):
+        """Drop the baseline and stop tracing if it was started here"""
+        self.baseline = None
+        self.baseline_at = None
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+
+    def status(self) -> Dict[str, Any]:
+        return {"tracing": tracemalloc.is_tracing(), "has_baseline": self.baseline is not None}
+
+
+# name -> callable returning a dict of sizes/counts for one in-process structure
+structure_reporters: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_structure(name: str, reporter: Callable[[], Dict[str, Any]]):
+    structure_reporters[name] = reporter
+
+
+def structure_sizes() -> Dict[str, Any]:
+    """Sizes of registered in-process structures, plus embedding engines of any loaded module"""
+    report = {}
+    for name, reporter in list(structure_reporters.items()):
+        try:
+            report[name] = reporter()
+        except Exception as e:
+            report[name] = {"error": str(e)}
+    # The TF-IDF engine keeps every text it has seen; report it whenever its module is in use
+    lightweight = sys.modules.get('lightweight_embeddings')
+    if lightweight is not None and 'lightweight_embeddings' not in report:
+        report['lightweight_embeddings'] = lightweight.embeddings_engine.memory_stats()
+    return report
+
+
+request_profiler = RequestProfiler()
+memory_profiler = MemoryProfiler()
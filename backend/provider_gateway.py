@@ -0,0 +1,263 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+from metrics import registry
+from circuit_breaker import BREAKER_EMBED_SLOW_MS, BREAKER_LLM_SLOW_MS, OPEN, CircuitBreaker
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Token buckets sized to the provider quota: embedding in texts/s, generation in calls/s (0 = unlimited)
+GATEWAY_EMBED_RATE = float(os.environ.get('GATEWAY_EMBED_RATE', '100'))
+GATEWAY_EMBED_BURST = float(os.environ.get('GATEWAY_EMBED_BURST', '200'))
+GATEWAY_EMBED_CONCURRENCY = int(os.environ.get('GATEWAY_EMBED_CONCURRENCY', '8'))
+GATEWAY_LLM_RATE = float(os.environ.get('GATEWAY_LLM_RATE', '10'))
+GATEWAY_LLM_BURST = float(os.environ.get('GATEWAY_LLM_BURST', '20'))
+GATEWAY_LLM_CONCURRENCY = int(os.environ.get('GATEWAY_LLM_CONCURRENCY', '8'))
+# Callers allowed to wait per provider, and how long each may wait, before getting a 503
+GATEWAY_MAX_WAITING = int(os.environ.get('GATEWAY_MAX_WAITING', '64'))
+GATEWAY_WAIT_TIMEOUT = float(os.environ.get('GATEWAY_WAIT_TIMEOUT', '10'))
+# Share of tokens and call slots background work (document ingestion) may not use
+GATEWAY_INTERACTIVE_RESERVE = float(os.environ.get('GATEWAY_INTERACTIVE_RESERVE', '0.2'))
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    _RATE_LIMIT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+except ImportError:
+    _RATE_LIMIT_ERRORS = ()
+
+GATEWAY_REJECTIONS = registry.counter(
+    "docubrain_provider_rejections_total", "Provider calls refused by the gateway or rate limited by the provider",
+    ("provider", "reason"))
+GATEWAY_WAIT = registry.histogram(
+    "docubrain_provider_wait_seconds", "Time provider calls waited for a gateway slot", ("provider", "priority"))
+
+
+class ProviderBusy(Exception):
+    """A provider call could not be made: the gateway is saturated (503) or the provider rate limited us (429)"""
+
+    def __init__(self, provider: str, status_code: int, detail: str, retry_after: float = 1.0):
+        super().__init__(detail)
+        self.provider = provider
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class CircuitOpen(ProviderBusy):
+    """The provider's circuit breaker is open; callers should serve a local fallback"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(provider, 503, f"{provider} provider is unavailable, try again shortly", retry_after)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    if _RATE_LIMIT_ERRORS and isinstance(error, _RATE_LIMIT_ERRORS):
+        return True
+    return getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; rate 0 means unlimited. Not thread-safe on its own."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self._clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, cost: float, keep: float = 0.0) -> bool:
+        """Take `cost` tokens if at least `keep` would remain"""
+        if not self.rate:
+            return True
+        self._refill()
+        if self.tokens - cost < keep:
+            return False
+        self.tokens -= cost
+        return True
+
+    def wait_time(self, cost: float, keep: float = 0.0) -> float:
+        """Seconds until `cost` tokens (plus `keep`) are available"""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return max(0.0, (cost + keep - self.tokens) / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("priority", "cost")
+
+    def __init__(self, priority: int, cost: float):
+        self.priority = priority
+        self.cost = cost
+
+
+class ProviderGateway:
+    """Bounds calls to one provider: a token bucket for quota, a concurrency cap, and a bounded
+    priority queue of waiting callers.
+
+    Interactive work is admitted before background work, and background work may not use the
+    last GATEWAY_INTERACTIVE_RESERVE share of tokens or call slots. Callers that find the queue
+    full, or wait longer than the timeout, get ProviderBusy (503); provider rate-limit errors
+    are re-raised as ProviderBusy (429).
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int,
+                 max_waiting: int = GATEWAY_MAX_WAITING, wait_timeout: float = GATEWAY_WAIT_TIMEOUT,
+                 interactive_reserve: float = GATEWAY_INTERACTIVE_RESERVE, breaker: Optional[CircuitBreaker] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.breaker = breaker
+        self._clock = clock
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.reserved_tokens = self.bucket.burst * interactive_reserve
+        self.reserved_slots = min(max_concurrency - 1, round(max_concurrency * interactive_reserve))
+        self.in_flight = 0
+        self._waiting: List = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        # Async callers block in these threads, not in the default executor other work relies on
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency + max_waiting,
+                                            thread_name_prefix=f"gateway-{name}")
+
+    def _try_admit(self, waiter: _Waiter) -> Optional[float]:
+        """Admit the waiter (None), or return how long to wait before trying again"""
+        background = waiter.priority > PRIORITY_INTERACTIVE
+        if self.in_flight >= self.max_concurrency - (self.reserved_slots if background else 0):
+            # Until a call finishes and release() wakes us
+            return self.wait_timeout
+        keep = self.reserved_tokens if background else 0.0
+        if self.bucket.try_take(waiter.cost, keep):
+            self.in_flight += 1
+            return None
+        return max(self.bucket.wait_time(waiter.cost, keep), 0.001)
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, cost: float = 1.0, timeout: Optional[float] = None):
+        """Block until the call may proceed; pair with release(). timeout shortens the gateway's wait limit."""
+        cost = min(cost, self.bucket.burst)
+        waiter = _Waiter(priority, cost)
+        start = self._clock()
+        deadline = start + (self.wait_timeout if timeout is None else min(timeout, self.wait_timeout))
+        with self._condition:
+            if len(self._waiting) >= self.max_waiting:
+                GATEWAY_REJECTIONS.inc(self.name, "queue_full")
+                raise ProviderBusy(self.name, 503, f"{self.name} provider is saturated, try again shortly",
+                                   self.bucket.wait_time(cost) or 1.0)
+            entry = (priority, next(self._sequence), waiter)
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    # Only the first waiter may be admitted; the rest wait to be woken
+                    wait = self._try_admit(waiter) if self._waiting[0] is entry else self.wait_timeout
+                    if wait is None:
+                        heapq.heappop(self._waiting)
+                        break
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._waiting.remove(entry)
+                        heapq.heapify(self._waiting)
+                        GATEWAY_REJECTIONS.inc(self.name, "wait_timeout")
+                        raise ProviderBusy(self.name, 503, f"Timed out waiting for the {self.name} provider",
+                                           self.bucket.wait_time(cost) or 1.0)
+                    self._condition.wait(min(remaining, wait))
+            finally:
+                # Whoever is now first may be admissible
+                self._condition.notify_all()
+        GATEWAY_WAIT.observe(self._clock() - start, self.name,
+                             "interactive" if priority == PRIORITY_INTERACTIVE else "background")
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def check_circuit(self):
+        """Raise CircuitOpen if the provider is known to be down"""
+        if self.breaker is not None and not self.breaker.allow():
+            self.breaker.reject()
+            raise CircuitOpen(self.name, self.breaker.retry_after())
+
+    def call(self, priority: int, fn: Callable, *args, cost: float = 1.0, timeout: Optional[float] = None) -> Any:
+        """Run a blocking provider call through the gateway"""
+        self.check_circuit()
+        self.acquire(priority, cost, timeout)
+        start = self._clock()
+        failed = False
+        try:
+            return fn(*args)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                # Quota, not an outage: the bucket deals with it, the breaker does not count it
+                GATEWAY_REJECTIONS.inc(self.name, "provider_429")
+                raise ProviderBusy(self.name, 429, f"{self.name} provider quota exhausted, try again later") from e
+            failed = True
+            raise
+        finally:
+            self.release()
+            if self.breaker is not None:
+                self.breaker.record(self._clock() - start, failed)
+
+    async def run(self, priority: int, fn: Callable, *args, cost: float = 1.0, timeout: Optional[float] = None) -> Any:
+        """call() from the event loop, waiting in the gateway's own threads.
+
+        With a timeout, raises asyncio.TimeoutError once it has passed; a call already started keeps its
+        thread until the provider returns, so the client should be given the same timeout.
+        """
+        self.check_circuit()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor,
+                                      lambda: self.call(priority, fn, *args, cost=cost, timeout=timeout))
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiting),
+            "tokens": round(self.bucket.tokens, 2),
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "max_concurrency": self.max_concurrency,
+            "circuit": self.breaker.stats() if self.breaker is not None else None
+        }
+
+
+embedding_gateway = ProviderGateway("embedding", GATEWAY_EMBED_RATE, GATEWAY_EMBED_BURST, GATEWAY_EMBED_CONCURRENCY,
+                                    breaker=CircuitBreaker("embedding", BREAKER_EMBED_SLOW_MS))
+llm_gateway = ProviderGateway("llm", GATEWAY_LLM_RATE, GATEWAY_LLM_BURST, GATEWAY_LLM_CONCURRENCY,
+                              breaker=CircuitBreaker("llm", BREAKER_LLM_SLOW_MS))
+
+
+def _gateway_stats(field: str) -> Dict[str, Optional[float]]:
+    return {gateway.name: gateway.stats()[field] for gateway in (embedding_gateway, llm_gateway)}
+
+
+registry.gauge("docubrain_provider_in_flight", "Provider calls in progress", lambda: _gateway_stats("in_flight"),
+               ("provider",))
+registry.gauge("docubrain_circuit_breaker_open", "1 while the provider's circuit breaker is open",
+               lambda: {gateway.name: int(gateway.breaker.state == OPEN)
+                        for gateway in (embedding_gateway, llm_gateway)}, ("provider",))
+registry.gauge("docubrain_provider_waiting", "Provider calls waiting for a gateway slot",
+               lambda: _gateway_stats("waiting"), ("provider",))
@@ -1,15 +1,21 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Response, Header
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
+import asyncio
+import functools
+import hmac
+import json
 import logging
+import math
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, List, Literal, Optional, Tuple
 import PyPDF2
 import io
 
@@ -26,22 +32,82 @@ except ImportError as e:
 # Import our modules
 from database import db
 from gemini_embeddings import embeddings_engine
+from embedding_batcher import embedding_batcher
+from lightweight_embeddings import embeddings_engine as local_engine
+from chunking import Chunk, text_chunker
+from context_builder import context_builder
+from extractive_answer import extractive_answerer
+from metrics import (METRICS_ENABLED, CONTENT_TYPE, MetricsMiddleware, RequestTrace, current_trace, registry,
+                     stage_timer, trace_detail)
+from slow_query_log import slow_query_log
+from log_config import REQUEST_ID_HEADER, RequestIdMiddleware, configure_logging
+from profiling import (ADMIN_TOKEN, PSTATS_SORT_KEYS, ProfilingMiddleware, memory_profiler, register_structure,
+                       request_profiler, structure_sizes)
+from loop_monitor import LOOP_MONITOR_ENABLED, loop_monitor
+from provider_gateway import PRIORITY_INTERACTIVE, CircuitOpen, ProviderBusy, embedding_gateway, llm_gateway
+from deadlines import (DEADLINE_MIN_EMBED_MS, DEADLINE_MIN_LLM_MS, apply_user_deadline, current_deadline,
+                       deadline_for_route, deadline_top_k, degrade, expired, has_time_for, remaining, within_deadline)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Structured logging through a queue-backed handler
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Configure Google Gemini API
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# gemini (default) or fake, for hermetic benchmarks
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'gemini').lower()
+# Answer mode for queries that do not pick one: generative (LLM) or extractive (document sentences, no LLM call)
+ANSWER_MODE = os.environ.get('ANSWER_MODE', 'generative').lower()
+fake_llm = None
+if LLM_PROVIDER == 'fake':
+    from fake_providers import FakeLLM
+    fake_llm = FakeLLM()
+    print("[WARNING] Using fake LLM provider")
+
+# Document viewing: characters per page for documents without PDF pages, and per streamed window
+DOCUMENT_PAGE_CHARS = int(os.environ.get('DOCUMENT_PAGE_CHARS', '4000'))
+DOCUMENT_STREAM_WINDOW = int(os.environ.get('DOCUMENT_STREAM_WINDOW', '65536'))
+
+# Document listing page size (default when a cursor is sent without a limit, and cap). Without limit or cursor
+# the whole list is returned, as before pagination
+DOCUMENTS_PAGE_SIZE = int(os.environ.get('DOCUMENTS_PAGE_SIZE', '100'))
+DOCUMENTS_MAX_PAGE_SIZE = int(os.environ.get('DOCUMENTS_MAX_PAGE_SIZE', '500'))
+
+# Batch queries: most questions per request, and LLM generations in flight per request
+QUERY_BATCH_MAX_QUESTIONS = int(os.environ.get('QUERY_BATCH_MAX_QUESTIONS', '500'))
+QUERY_BATCH_CONCURRENCY = int(os.environ.get('QUERY_BATCH_CONCURRENCY', '8'))
+
+# Most passages a search request may ask for
+SEARCH_MAX_TOP_K = int(os.environ.get('SEARCH_MAX_TOP_K', '50'))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await db.init_db()
+    recompress_task = None
+    if os.environ.get('CONTENT_RECOMPRESS_ON_STARTUP', 'false').lower() == 'true':
+        # Re-encode existing documents with CONTENT_CODEC in the background
+        recompress_task = asyncio.create_task(db.recompress_documents())
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await loop_monitor.stop()
+    if recompress_task and not recompress_task.done():
+        recompress_task.cancel()
+    await db.close()
 
 # Create the main app with lifespan
 app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(ProviderBusy)
+async def provider_busy_handler(request, exc: ProviderBusy):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail},
+                        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))})
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -54,12 +120,37 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+AnswerMode = Literal["generative", "extractive"]
+
 class QueryRequest(BaseModel):
     question: str
+    # Defaults to ANSWER_MODE; generative queries fall back to extractive when the LLM cannot answer
+    answer_mode: Optional[AnswerMode] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[dict]
+    answer_mode: AnswerMode = "generative"
+    # Extractive answers: the quoted sentences with their character offsets in the source document
+    sentences: Optional[List[dict]] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=QUERY_BATCH_MAX_QUESTIONS)
+    stream: bool = False
+    answer_mode: Optional[AnswerMode] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[QueryResponse]
+
+class SearchRequest(BaseModel):
+    question: str
+    top_k: int = Field(5, ge=1, le=SEARCH_MAX_TOP_K)
+    include_content: bool = True
+    # Character offsets of each chunk within its document's text, where stored
+    include_offsets: bool = False
+
+class SearchResponse(BaseModel):
+    results: List[dict]
 
 # Utility functions - SIMPLIFIED
 def create_token(user_id: str) -> str:
@@ -75,47 +166,53 @@ def verify_token(token: str) -> str:
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     return verify_token(credentials.credentials)
 
-def extract_text_from_pdf(file_content: bytes) -> str:
+def extract_pages_from_pdf(file_content: bytes) -> List[str]:
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        with stage_timer("pdf_extraction"):
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+            return [page.extract_text() + "\n" for page in pdf_reader.pages]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing PDF: {str(e)}")
 
-def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for word in words:
-        current_chunk.append(word)
-        current_size += len(word) + 1
-        
-        if current_size >= chunk_size:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = []
-            current_size = 0
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    return chunks
-
-async def generate_answer_with_gemini(question: str, context: str) -> str:
-    """Generate answer using Google Gemini API"""
+def extract_text_from_pdf(file_content: bytes) -> str:
+    return "".join(extract_pages_from_pdf(file_content))
+
+def page_spans_for(pages: List[str]) -> List[List[int]]:
+    """(start, end) character offsets of each page in the joined text"""
+    spans = []
+    offset = 0
+    for page in pages:
+        spans.append([offset, offset + len(page)])
+        offset += len(page)
+    return spans
+
+def chunk_text(text: str) -> List[Chunk]:
+    """Split text into token-bounded chunks on sentence/paragraph boundaries"""
+    with stage_timer("chunking"):
+        return list(text_chunker.iter_chunks(text))
+
+def get_llm_model():
+    """The configured generation client; None when google-generativeai is not installed"""
+    if LLM_PROVIDER == 'fake':
+        return fake_llm
+    if not GEMINI_AVAILABLE:
+        return None
+
+    # Configure Gemini API
+    genai.configure(api_key=GEMINI_API_KEY)
+
+    # Initialize the model
+    return genai.GenerativeModel('gemini-pro')
+
+async def generate_answer_with_gemini(question: str, context: str) -> Tuple[Optional[str], Optional[str]]:
+    """Generate answer using Google Gemini API.
+
+    Returns (answer, None), or (None, reason) when the LLM cannot answer and the caller should answer extractively.
+    """
     try:
-        if not GEMINI_AVAILABLE:
-            return f"Based on the provided context, here's what I found: {context[:200]}... Please install google-generativeai for full AI responses."
-        
-        # Configure Gemini API
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Initialize the model
-        model = genai.GenerativeModel('gemini-pro')
+        model = get_llm_model()
+        if model is None:
+            return None, "llm_not_installed"
         
         # Create the prompt
         prompt = f"""Based on the context below, answer the question concisely. Use only the provided information.
@@ -128,14 +225,35 @@ Question: {question}
 Answer:"""
         
         # Generate response
-        response = model.generate_content(prompt)
+        # The client is synchronous; it runs in the gateway's worker threads so the event loop keeps serving.
+        # Both the gateway wait and the HTTP call are bounded by the time left before the request deadline.
+        timeout = remaining()
+        generate = (model.generate_content if timeout is None else
+                    functools.partial(model.generate_content, request_options={"timeout": timeout}))
+        with stage_timer("llm_generation"):
+            response = await llm_gateway.run(PRIORITY_INTERACTIVE, generate, prompt, timeout=timeout)
         
-        return response.text
+        return response.text, None
         
+    except asyncio.TimeoutError:
+        degrade("generation", "extractive")
+        return None, "deadline"
+    except CircuitOpen:
+        # The LLM is known to be down: answer locally right away instead of waiting on it
+        return None, "circuit_open"
+    except ProviderBusy as e:
+        # Saturated or over quota: the retrieved sentences beat a 503/429
+        return None, "provider_busy" if e.status_code == 503 else "provider_quota"
     except Exception as e:
-        print(f"Error generating response with Gemini: {e}")
-        # Fallback to context-based response
-        return f"Based on the provided documents: {context[:300]}... (Error: {str(e)})"
+        logger.error("Answer generation failed, answering extractively", extra={"error": str(e)})
+        return None, "llm_error"
+
+def _probe_llm():
+    model = get_llm_model()
+    if model is not None:
+        model.generate_content("Reply with OK.")
+
+llm_gateway.breaker.probe = _probe_llm
 
 # Authentication endpoints
 @api_router.post("/auth/register")
@@ -192,6 +310,25 @@ async def login(user_data: UserLogin):
         "api_key": user["api_key"]
     }
 
+@api_router.post("/auth/rotate-key")
+async def rotate_api_key(user_id: str = Depends(get_current_user)):
+    """Issue a new API key.
+
+    The old key stops working at once on this worker; other workers may still accept it until their
+    cached lookup expires (API_KEY_CACHE_TTL).
+    """
+    api_key = f"sk-docubrain-{uuid.uuid4().hex[:20]}"
+
+    success = await db.update_user_api_key(user_id, api_key)
+    if not success:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return {
+        "success": True,
+        "message": "API key rotated successfully",
+        "api_key": api_key
+    }
+
 # Document endpoints
 @api_router.post("/documents/upload")
 async def upload_document(
@@ -203,14 +340,15 @@ async def upload_document(
     
     # Read file content
     content = await file.read()
-    text = extract_text_from_pdf(content)
+    pages = extract_pages_from_pdf(content)
+    text = "".join(pages)
     
     if not text.strip():
         raise HTTPException(status_code=400, detail="Could not extract text from PDF")
     
     # Process document with Gemini embeddings
     chunks = chunk_text(text)
-    embeddings = embeddings_engine.get_embeddings(chunks)
+    embeddings = await embedding_batcher.embed_documents([chunk.text for chunk in chunks])
     
     # Save to database
     doc_id = str(uuid.uuid4())
@@ -219,7 +357,9 @@ async def upload_document(
         "user_id": user_id,
         "filename": file.filename,
         "content": text,
-        "chunks": chunks,
+        "content_length": len(text),
+        "page_spans": page_spans_for(pages),
+        "chunk_spans": [[chunk.start, chunk.end] for chunk in chunks],
         "embeddings": embeddings,
         "upload_time": datetime.now(timezone.utc),
         "chunk_count": len(chunks),
@@ -243,7 +383,7 @@ async def add_text_document(
     
     # Process text with Gemini embeddings
     chunks = chunk_text(content)
-    embeddings = embeddings_engine.get_embeddings(chunks)
+    embeddings = await embedding_batcher.embed_documents([chunk.text for chunk in chunks])
     
     # Save to database
     doc_id = str(uuid.uuid4())
@@ -252,7 +392,8 @@ async def add_text_document(
         "user_id": user_id,
         "filename": f"{title}.txt",
         "content": content,
-        "chunks": chunks,
+        "content_length": len(content),
+        "chunk_spans": [[chunk.start, chunk.end] for chunk in chunks],
         "embeddings": embeddings,
         "upload_time": datetime.now(timezone.utc),
         "chunk_count": len(chunks),
@@ -266,49 +407,127 @@ async def add_text_document(
     return {"message": "Text document processed successfully", "document_id": doc_id}
 
 @api_router.get("/documents")
-async def get_documents(user_id: str = Depends(get_current_user)):
-    documents = await db.get_user_documents(user_id)
-    return documents
+async def get_documents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    filename_prefix: Optional[str] = None,
+    status: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    user_id: str = Depends(get_current_user)
+):
+    """List documents newest first.
+
+    Paging is opt-in: with `limit` or `cursor` one page is returned and the cursor for the next
+    page is in X-Next-Cursor; with neither, every matching document is returned.
+    """
+    filters = dict(filename_prefix=filename_prefix, status=status,
+                   uploaded_after=uploaded_after, uploaded_before=uploaded_before)
+    if limit is None and cursor is None:
+        # Still read page by page, so no single query loads an unbounded result
+        documents = []
+        while True:
+            page = await db.get_user_documents_page(user_id, DOCUMENTS_MAX_PAGE_SIZE, cursor=cursor, **filters)
+            documents.extend(page["documents"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return documents
+
+    try:
+        page = await db.get_user_documents_page(
+            user_id,
+            min(limit or DOCUMENTS_PAGE_SIZE, DOCUMENTS_MAX_PAGE_SIZE),
+            cursor=cursor,
+            **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["documents"]
 
 @api_router.get("/documents/{document_id}")
-async def view_document(document_id: str, user_id: str = Depends(get_current_user)):
-    """Get full document content for viewing (read-only)"""
-    document = await db.get_document_by_id(document_id)
+async def view_document(
+    document_id: str,
+    page: Optional[int] = Query(None, ge=1),
+    start: Optional[int] = Query(None, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    user_id: str = Depends(get_current_user)
+):
+    """Get document content for viewing (read-only), optionally one page or a character range"""
+    # Lookup is scoped to the user, so other users' documents are simply not found
+    document = await db.get_document_info(document_id, user_id)
 
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Verify document belongs to user
-    if document["user_id"] != user_id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # Return document without embeddings (they're large)
-    return {
+    response = {
         "id": document["id"],
         "filename": document["filename"],
-        "content": document["content"],
         "upload_time": document["upload_time"],
         "chunk_count": document["chunk_count"],
         "status": document["status"]
     }
 
-@api_router.delete("/documents/{document_id}")
-async def delete_document(document_id: str, user_id: str = Depends(get_current_user)):
-    """Delete a document (requires user confirmation on frontend)"""
-    document = await db.get_document_by_id(document_id)
+    page_spans = document.get("page_spans")
+    if page is not None:
+        if page_spans:
+            page_count = len(page_spans)
+            if page > page_count:
+                raise HTTPException(status_code=404, detail="Page not found")
+            start, end = page_spans[page - 1]
+            response["page_count"] = page_count
+        else:
+            # Documents without PDF pages are paged in fixed character windows
+            start, end = (page - 1) * DOCUMENT_PAGE_CHARS, page * DOCUMENT_PAGE_CHARS
+        response["page"] = page
+
+    # Without page or range parameters the full content is returned
+    if end is not None and end < (start or 0):
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    part = await db.get_document_content_range(document_id, start or 0, end, user_id)
+    if part is None:
+        raise HTTPException(status_code=500, detail="Failed to read document content")
+
+    if page is not None and not page_spans:
+        response["page_count"] = max(1, -(-part["total_length"] // DOCUMENT_PAGE_CHARS))
+        if page > response["page_count"]:
+            raise HTTPException(status_code=404, detail="Page not found")
+
+    response.update({
+        "content": part["content"],
+        "start": part["start"],
+        "end": part["end"],
+        "total_length": part["total_length"]
+    })
+    return response
+
+@api_router.get("/documents/{document_id}/content")
+async def stream_document_content(document_id: str, user_id: str = Depends(get_current_user)):
+    """Stream a document's full content as plain text"""
+    document = await db.get_document_info(document_id, user_id)
 
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Verify document belongs to user
-    if document["user_id"] != user_id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    return StreamingResponse(
+        db.iter_document_content(document_id, DOCUMENT_STREAM_WINDOW, user_id),
+        media_type="text/plain; charset=utf-8"
+    )
 
-    # Delete document from database
-    success = await db.delete_document(document_id)
+@api_router.delete("/documents/{document_id}")
+async def delete_document(document_id: str, user_id: str = Depends(get_current_user)):
+    """Delete a document (requires user confirmation on frontend)"""
+    # Ownership check and delete happen in a single scoped delete_one
+    deleted = await db.delete_user_document(document_id, user_id)
 
-    if not success:
+    if deleted is None:
         raise HTTPException(status_code=500, detail="Failed to delete document")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
 
     return {
         "success": True,
@@ -316,81 +535,209 @@ async def delete_document(document_id: str, user_id: str = Depends(get_current_u
         "document_id": document_id
     }
 
+@asynccontextmanager
+async def traced_query(route: str, response: Optional[Response], question: str):
+    """Collect per-stage timings for a query: Server-Timing header on success, slow-query log always"""
+    trace = RequestTrace()
+    token = current_trace.set(trace)
+    deadline_token = current_deadline.set(deadline_for_route(route))
+    status = 200
+    try:
+        yield trace
+    except (HTTPException, ProviderBusy) as e:
+        status = e.status_code
+        raise
+    except Exception:
+        status = 500
+        raise
+    finally:
+        current_deadline.reset(deadline_token)
+        current_trace.reset(token)
+        if response is not None:
+            response.headers["Server-Timing"] = trace.server_timing()
+        await slow_query_log.record(route, trace, status, trace.details.get("user_id"), question)
+
 # Query endpoint
 @api_router.post("/query", response_model=QueryResponse)
-async def query_documents(query: QueryRequest, user_id: str = Depends(get_current_user)):
+async def query_documents(query: QueryRequest, user_id: str = Depends(get_current_user), response: Response = None):
+    async with traced_query("/api/query", response, query.question):
+        return await answer_query(query, user_id)
+
+def annotate_chunk(chunk: dict, doc: dict) -> dict:
+    """Tag a chunk result with its document, and its span in the document content when stored"""
+    chunk['filename'] = doc['filename']
+    chunk['document_id'] = doc['id']
+    spans = getattr(doc.get("chunks"), "span", None)
+    if spans is not None:
+        chunk['span'] = spans(chunk['chunk_index'])
+    return chunk
+
+async def load_query_documents(user_id: str) -> List[dict]:
+    """The user's documents with content, chunks and embeddings; 400 when there are none"""
+    trace_detail("user_id", user_id)
+    apply_user_deadline(user_id)
+
     # Get user documents with content
-    documents = await db.get_user_documents_with_content(user_id)
+    with stage_timer("db_fetch"):
+        try:
+            documents = await within_deadline(db.get_user_documents_with_content(user_id))
+        except asyncio.TimeoutError:
+            # Nothing to degrade to without the documents
+            raise HTTPException(status_code=504, detail="Query deadline exceeded while loading documents")
     
     if not documents:
         raise HTTPException(status_code=400, detail="No documents found. Please upload some documents first.")
     
-    # Prepare all document chunks for consistent vectorizer fitting
-    all_chunks = []
-    document_chunk_map = []  # Track which chunks belong to which document
-    
+    # Chunk text is sliced lazily from each document's content, so only count here
+    total_chunks = sum(len(doc.get("chunks", [])) for doc in documents)
+    trace_detail("documents", len(documents))
+    trace_detail("chunks", total_chunks)
+    logger.info("Processing query", extra={"documents": len(documents), "chunks": total_chunks})
+    return documents
+
+async def keyword_fallback(question: str, user_id: str, documents: List[dict], top_k: int) -> List[dict]:
+    """Keyword matches for a question no chunk embedding matched"""
+    logger.info("No relevant chunks from embedding search, trying keyword search")
+
+    # Use the storage backend's full-text index when it has one
+    with stage_timer("keyword_fallback"):
+        indexed_results = await db.keyword_search(user_id, question, top_k)
+    trace_detail("keyword_fallback", "index" if indexed_results is not None else "scan")
+    if indexed_results is not None:
+        # Index hits carry no offsets; take them from the loaded documents' stored chunk spans
+        by_id = {doc['id']: doc for doc in documents}
+        return [annotate_chunk(result, by_id[result['document_id']]) if result['document_id'] in by_id else result
+                for result in indexed_results]
+
+    # Use enhanced keyword search across all documents
+    results = []
     for doc in documents:
-        doc_chunks = doc.get("chunks", [])
-        for i, chunk in enumerate(doc_chunks):
-            all_chunks.append(chunk)
-            document_chunk_map.append({
-                'doc_filename': doc['filename'],
-                'doc_chunks': doc_chunks,
-                'doc_embeddings': doc.get('embeddings', []),
-                'chunk_index': i
-            })
-    
-    print(f"[SEARCH] Processing query for {len(documents)} documents with {len(all_chunks)} total chunks")
+        keyword_results = embeddings_engine._simple_keyword_search(question, doc.get("chunks", []), min(top_k, 3))
+        results.extend(annotate_chunk(result, doc) for result in keyword_results)
+    return results
+
+async def rank_locally(questions: List[str], documents: List[dict], top_k: int) -> List[List[dict]]:
+    """TF-IDF retrieval with the lightweight engine, for when the embedding provider's circuit is open"""
+    trace_detail("retrieval", "local")
+    with stage_timer("local_retrieval"):
+        matches = await asyncio.to_thread(
+            local_engine.rank_chunks, questions, [doc.get("chunks", []) for doc in documents], top_k)
+    return [[annotate_chunk(chunk, documents[doc_index]) for doc_index, chunk in pairs] for pairs in matches]
+
+async def retrieve_chunks(question: str, user_id: str, top_k: int = 5) -> Tuple[List[dict], List[dict]]:
+    """The user's documents, and their chunks relevant to the question, best first"""
+    documents = await load_query_documents(user_id)
+    top_k = deadline_top_k(top_k)
 
     # Find relevant chunks across all documents using Gemini embeddings
     all_relevant_chunks = []
-    
-    for doc in documents:
+    query_embedding = None
+    if not has_time_for(DEADLINE_MIN_EMBED_MS):
+        # Too little time left for a provider call: the keyword fallback below does the retrieval
+        degrade("embedding", "keyword_only")
+    else:
+        try:
+            # Embedded once for all documents; concurrent requests share batched provider calls
+            query_embedding = await within_deadline(embedding_batcher.embed_query(question))
+        except asyncio.TimeoutError:
+            degrade("embedding", "keyword_only")
+        except CircuitOpen:
+            # The embedding provider is down: rank locally right away instead of waiting on it
+            all_relevant_chunks = (await rank_locally([question], documents, top_k))[0]
+    
+    for doc in documents if query_embedding is not None else []:
+        if expired():
+            # Score no more documents; answer from what was found so far
+            degrade("scoring", "partial")
+            break
         try:
             relevant_chunks = embeddings_engine.find_relevant_chunks(
-                query.question, 
+                question, 
                 doc["chunks"], 
-                doc["embeddings"]
+                doc["embeddings"],
+                top_k,
+                query_embedding
             )
             
-            for chunk in relevant_chunks:
-                chunk['filename'] = doc['filename']
-                all_relevant_chunks.append(chunk)
+            all_relevant_chunks.extend(annotate_chunk(chunk, doc) for chunk in relevant_chunks)
         except Exception as e:
-            print(f"Error processing document {doc.get('filename', 'unknown')}: {e}")
+            logger.error("Error processing document", extra={
+                "document_id": doc.get('id'), "document_filename": doc.get('filename'), "error": str(e)})
             # Continue with other documents
             continue
     
     if not all_relevant_chunks:
         # Try a more aggressive search approach
-        print("[SEARCH] No relevant chunks found with standard search, trying enhanced keyword search")
-        
-        # Use enhanced keyword search across all documents
-        for doc in documents:
-            chunks = doc.get("chunks", [])
-            keyword_results = embeddings_engine._simple_keyword_search(query.question, chunks, 3)
-            
-            for result in keyword_results:
-                result['filename'] = doc['filename']
-                all_relevant_chunks.append(result)
-        
-        if not all_relevant_chunks:
-            return QueryResponse(
-                answer="I couldn't find relevant information in your documents to answer this question.",
-                sources=[]
-            )
-    
-    # Sort by relevance and take top 5
+        all_relevant_chunks = await keyword_fallback(question, user_id, documents, top_k)
+
     all_relevant_chunks.sort(key=lambda x: x['relevance_score'], reverse=True)
-    top_chunks = all_relevant_chunks[:5]
-    
-    print(f"[OK] Found {len(top_chunks)} relevant chunks for query")
-    
-    # Create context for LLM
-    context = "\n\n".join([chunk['content'] for chunk in top_chunks])
-    
-    # Generate answer using Google Gemini API
-    answer = await generate_answer_with_gemini(query.question, context)
+    trace_detail("relevant_chunks", len(all_relevant_chunks))
+    return documents, all_relevant_chunks
+
+async def retrieve_chunks_batch(questions: List[str], user_id: str,
+                                top_k: int = 5) -> Tuple[List[dict], List[List[dict]]]:
+    """retrieve_chunks for many questions: one document fetch, one batched embedding call, one scoring product"""
+    documents = await load_query_documents(user_id)
+    top_k = deadline_top_k(top_k)
+
+    # Without embedding results every question goes to the keyword fallback below
+    ranked = [[] for _ in questions]
+    if not has_time_for(DEADLINE_MIN_EMBED_MS):
+        degrade("embedding", "keyword_only")
+    else:
+        try:
+            # Embedding and scoring hundreds of questions is long blocking work; keep it off the event loop
+            matches = await within_deadline(asyncio.to_thread(
+                embeddings_engine.find_relevant_chunks_batch,
+                questions,
+                [(doc.get("chunks", []), doc.get("embeddings") or []) for doc in documents],
+                top_k
+            ))
+            ranked = [[annotate_chunk(chunk, documents[doc_index]) for doc_index, chunk in pairs] for pairs in matches]
+        except asyncio.TimeoutError:
+            # The worker thread finishes in the background; its results are discarded
+            degrade("embedding", "keyword_only")
+        except CircuitOpen:
+            ranked = await rank_locally(questions, documents, top_k)
+
+    chunk_lists = []
+    for question, chunks in zip(questions, ranked):
+        if not chunks:
+            chunks = await keyword_fallback(question, user_id, documents, top_k)
+        chunks.sort(key=lambda x: x['relevance_score'], reverse=True)
+        chunk_lists.append(chunks)
+    trace_detail("relevant_chunks", sum(len(chunks) for chunks in chunk_lists))
+    return documents, chunk_lists
+
+async def build_answer(question: str, documents: List[dict], all_relevant_chunks: List[dict],
+                       answer_mode: Optional[str] = None) -> QueryResponse:
+    """Generate the answer to a question from its retrieved chunks"""
+    if not all_relevant_chunks:
+        return QueryResponse(
+            answer="I couldn't find relevant information in your documents to answer this question.",
+            sources=[]
+        )
+
+    # Pack the best chunks into the token budget, merging neighbours and dropping near-duplicates
+    contents = {doc['id']: doc.get('content') for doc in documents}
+    context, top_chunks = context_builder.build(all_relevant_chunks, contents)
+    top_chunks.sort(key=lambda x: x['relevance_score'], reverse=True)
+
+    logger.info("Relevant chunks selected", extra={"candidates": len(all_relevant_chunks), "selected": len(top_chunks)})
+    
+    answer_mode = answer_mode or ANSWER_MODE
+    answer, sentences, fallback_reason = None, None, "requested"
+    if answer_mode == "generative" and not has_time_for(DEADLINE_MIN_LLM_MS):
+        degrade("generation", "extractive")
+        fallback_reason = "deadline"
+    elif answer_mode == "generative":
+        # Generate answer using Google Gemini API
+        answer, fallback_reason = await generate_answer_with_gemini(question, context)
+    if answer is None:
+        answer_mode = "extractive"
+        answer, sentences = extractive_answerer.answer(question, top_chunks, fallback_reason)
+        if answer is None:
+            answer = "I couldn't find relevant information in your documents to answer this question."
     
     # Prepare sources
     sources = [
@@ -402,22 +749,207 @@ async def query_documents(query: QueryRequest, user_id: str = Depends(get_curren
         for chunk in top_chunks
     ]
     
-    return QueryResponse(answer=answer, sources=sources)
+    return QueryResponse(answer=answer, sources=sources, answer_mode=answer_mode, sentences=sentences)
+
+async def answer_query(query: QueryRequest, user_id: str) -> QueryResponse:
+    documents, all_relevant_chunks = await retrieve_chunks(query.question, user_id)
+    return await build_answer(query.question, documents, all_relevant_chunks, query.answer_mode)
+
+async def answer_batch(questions: List[str], documents: List[dict], chunk_lists: List[List[dict]],
+                       return_busy: bool = False,
+                       answer_mode: Optional[str] = None) -> AsyncIterator[Tuple[int, QueryResponse]]:
+    """Generate answers with at most QUERY_BATCH_CONCURRENCY in flight, yielding (index, answer) as each completes.
+
+    With return_busy, a question the provider could not take yields its ProviderBusy instead of raising.
+    """
+    semaphore = asyncio.Semaphore(QUERY_BATCH_CONCURRENCY)
+
+    async def answer(index: int) -> Tuple[int, QueryResponse]:
+        async with semaphore:
+            try:
+                return index, await build_answer(questions[index], documents, chunk_lists[index], answer_mode)
+            except ProviderBusy as e:
+                if not return_busy:
+                    raise
+                return index, e
+
+    tasks = [asyncio.create_task(answer(index)) for index in range(len(questions))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client may have gone away mid-stream
+        for task in tasks:
+            task.cancel()
+
+# Batch query: many questions against one load of the user's corpus
+@api_router.post("/query/batch")
+async def query_documents_batch(batch: BatchQueryRequest, user_id: str = Depends(get_current_user),
+                                response: Response = None):
+    """Answers in question order, or with stream=true as NDJSON lines {"index", "answer", "sources"} as they complete.
+
+    When streaming, Server-Timing and the slow-query log cover retrieval only; answers follow the headers.
+    """
+    async with traced_query("/api/query/batch", response, "\n".join(batch.questions)) as trace:
+        documents, chunk_lists = await retrieve_chunks_batch(batch.questions, user_id)
+        trace_detail("questions", len(batch.questions))
+        if not batch.stream:
+            results: List[Optional[QueryResponse]] = [None] * len(batch.questions)
+            async for index, result in answer_batch(batch.questions, documents, chunk_lists,
+                                                    answer_mode=batch.answer_mode):
+                results[index] = result
+            return BatchQueryResponse(results=results)
+        deadline = current_deadline.get()
+
+    async def stream_answers():
+        # Answers are generated after the traced block has ended; they keep the request's deadline
+        current_deadline.set(deadline)
+        async for index, result in answer_batch(batch.questions, documents, chunk_lists, return_busy=True,
+                                                answer_mode=batch.answer_mode):
+            if isinstance(result, ProviderBusy):
+                # Headers are long gone; report the 503/429 on the question's own line
+                yield json.dumps({"index": index, "error": result.detail, "status_code": result.status_code}) + "\n"
+            else:
+                yield json.dumps({"index": index, **result.model_dump()}) + "\n"
+
+    return StreamingResponse(stream_answers(), media_type="application/x-ndjson",
+                             headers={"Server-Timing": trace.server_timing()})
+
+def search_results(chunks: List[dict], top_k: int, include_content: bool, include_offsets: bool) -> List[dict]:
+    results = []
+    for chunk in chunks[:top_k]:
+        result = {
+            "document_id": chunk.get("document_id"),
+            "filename": chunk["filename"],
+            "chunk_index": chunk["chunk_index"],
+            "relevance_score": chunk["relevance_score"]
+        }
+        if include_content:
+            result["content"] = chunk["content"]
+        if include_offsets:
+            span = chunk.get("span")
+            result["start"], result["end"] = span if span else (None, None)
+        results.append(result)
+    return results
+
+# Retrieval-only search: ranked passages without LLM generation
+@api_router.post("/search", response_model=SearchResponse)
+async def search_documents(search: SearchRequest, user_id: str = Depends(get_current_user), response: Response = None):
+    async with traced_query("/api/search", response, search.question):
+        _, chunks = await retrieve_chunks(search.question, user_id, search.top_k)
+        return SearchResponse(results=search_results(chunks, search.top_k, search.include_content,
+                                                     search.include_offsets))
 
 # External API endpoint
 @api_router.post("/external/query")
 async def external_query(
+    response: Response,
     api_key: str = Form(...),
-    question: str = Form(...)
+    question: str = Form(...),
+    answer_mode: Optional[AnswerMode] = Form(None)
 ):
-    # Find user by API key
-    user = await db.get_user_by_api_key(api_key)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid API key")
-    
-    # Use the regular query logic
-    query_request = QueryRequest(question=question)
-    return await query_documents(query_request, user["user_id"])
+    async with traced_query("/api/external/query", response, question):
+        # Find user by API key
+        user = await db.get_user_by_api_key(api_key)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+
+        # Use the regular query logic
+        query_request = QueryRequest(question=question, answer_mode=answer_mode)
+        return await answer_query(query_request, user["user_id"])
+
+@api_router.post("/external/search", response_model=SearchResponse)
+async def external_search(
+    response: Response,
+    api_key: str = Form(...),
+    question: str = Form(...),
+    top_k: int = Form(5, ge=1, le=SEARCH_MAX_TOP_K),
+    include_content: bool = Form(True),
+    include_offsets: bool = Form(False)
+):
+    async with traced_query("/api/external/search", response, question):
+        user = await db.get_user_by_api_key(api_key)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+
+        _, chunks = await retrieve_chunks(question, user["user_id"], top_k)
+        return SearchResponse(results=search_results(chunks, top_k, include_content, include_offsets))
+
+# Admin endpoints: disabled unless ADMIN_TOKEN is set, and then only reachable with it
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+register_structure("storage", db.memory_stats)
+register_structure("api_key_cache", db.api_key_cache.stats)
+register_structure("embeddings_engine", embeddings_engine.memory_stats)
+register_structure("embedding_batcher", embedding_batcher.stats)
+register_structure("embedding_gateway", embedding_gateway.stats)
+register_structure("llm_gateway", llm_gateway.stats)
+
+@api_router.post("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def start_cpu_profile(requests: int = Query(10, ge=1), path_prefix: Optional[str] = Query(None)):
+    """Profile the next `requests` HTTP requests (optionally only paths under `path_prefix`) with cProfile"""
+    try:
+        request_profiler.arm(requests, path_prefix)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return request_profiler.status()
+
+@api_router.get("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def get_cpu_profile(
+    sort: str = Query("cumulative"),
+    limit: int = Query(50, ge=1, le=1000),
+    format: str = Query("text", pattern="^(text|pstats)$")
+):
+    """Status of the profiling window, with the pstats report once it has finished"""
+    if sort not in PSTATS_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(PSTATS_SORT_KEYS)}")
+    if format == "pstats":
+        raw = request_profiler.raw()
+        if raw is None:
+            raise HTTPException(status_code=404, detail="No finished profile yet")
+        return Response(content=raw, media_type="application/octet-stream",
+                        headers={"Content-Disposition": 'attachment; filename="docubrain.pstats"'})
+    return {**request_profiler.status(), "report": request_profiler.report(sort, limit)}
+
+@api_router.delete("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def cancel_cpu_profile():
+    request_profiler.cancel()
+    return request_profiler.status()
+
+@api_router.post("/admin/memory/baseline", dependencies=[Depends(require_admin)])
+async def take_memory_baseline():
+    """Start tracemalloc (if needed) and take the snapshot later diffs compare against"""
+    return await asyncio.to_thread(memory_profiler.take_baseline)
+
+@api_router.get("/admin/memory/diff", dependencies=[Depends(require_admin)])
+async def get_memory_diff(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    diff = await asyncio.to_thread(memory_profiler.diff, limit, group_by)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="No memory baseline; POST /api/admin/memory/baseline first")
+    return diff
+
+@api_router.delete("/admin/memory/baseline", dependencies=[Depends(require_admin)])
+async def stop_memory_tracing():
+    """Drop the baseline and stop tracemalloc, returning to zero overhead"""
+    memory_profiler.stop()
+    return memory_profiler.status()
+
+@api_router.get("/admin/memory/structures", dependencies=[Depends(require_admin)])
+async def get_structure_sizes():
+    """Entry counts and sizes of in-process caches, indexes and embedding engine state"""
+    return {"tracemalloc": memory_profiler.status(), "structures": structure_sizes()}
+
+@api_router.get("/admin/loop", dependencies=[Depends(require_admin)])
+async def get_loop_stats():
+    """Event loop lag, and the stacks captured for recent stalls when LOOP_BLOCK_DEBUG is on"""
+    return {**loop_monitor.stats(), "recent_blocks": loop_monitor.recent_blocks()}
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -433,6 +965,7 @@ async def root():
             "login": "POST /api/auth/login", 
             "upload": "POST /api/documents/upload",
             "query": "POST /api/query",
+            "search": "POST /api/search",
             "docs": "/docs"
         }
     }
@@ -443,11 +976,32 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", REQUEST_ID_HEADER],
 )
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+app.add_middleware(RequestIdMiddleware)
+
+if ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    def _api_key_cache_lookups():
+        stats = db.api_key_cache.stats()
+        return {"hit": stats["hits"], "negative_hit": stats["negative_hits"], "miss": stats["misses"]}
+
+    registry.gauge("docubrain_api_key_cache_hit_ratio", "Share of API key lookups answered from the cache",
+                   lambda: db.api_key_cache.stats()["hit_ratio"])
+    registry.gauge("docubrain_api_key_cache_lookups_total", "API key cache lookups by outcome",
+                   _api_key_cache_lookups, ("outcome",), metric_type="counter")
+    registry.gauge("docubrain_in_memory_entries", "Entries held in in-process caches and indexes",
+                   db.memory_stats, ("structure",))
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+from metrics import RequestTrace
+from log_config import request_id
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Queries slower than this are logged; 0 disables the log
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '2000'))
+# Slow queries go to the application log (stderr) unless this names a JSON-lines file for them
+SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH', '')
+# The file is capped: once it passes this size it is rotated to <path>.1, replacing the previous one
+SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+# Question text is personal data and stays out of the log unless explicitly enabled
+SLOW_QUERY_LOG_QUESTIONS = os.environ.get('SLOW_QUERY_LOG_QUESTIONS', 'false').lower() == 'true'
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    """Log of queries over a latency threshold, with their stage breakdown: WARNING records on the
+    application log, or a size-capped JSON-lines file when a path is configured"""
+
+    def __init__(self, path: str = SLOW_QUERY_LOG_PATH, threshold_ms: float = SLOW_QUERY_MS,
+                 max_bytes: int = SLOW_QUERY_LOG_MAX_BYTES, include_questions: bool = SLOW_QUERY_LOG_QUESTIONS):
+        self.path = Path(path) if path else None
+        self.threshold_ms = threshold_ms
+        self.max_bytes = max_bytes
+        self.include_questions = include_questions
+        self._lock = threading.Lock()
+
+    def entry(self, route: str, trace: RequestTrace, status: int, user_id: Optional[str] = None,
+              question: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Log record for the request, or None when it was fast enough"""
+        total_ms = trace.elapsed() * 1000
+        if not self.threshold_ms or total_ms < self.threshold_ms:
+            return None
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "route": route,
+            "request_id": request_id.get(),
+            "status": status,
+            "user_id": user_id,
+            "total_ms": round(total_ms, 3),
+            "stages_ms": trace.stage_ms(),
+            **trace.details
+        }
+        if self.include_questions and question is not None:
+            record["question"] = question
+        return record
+
+    def _append(self, line: str):
+        with self._lock:
+            try:
+                if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"[WARNING] Could not write slow query log {self.path}: {e}")
+
+    async def record(self, route: str, trace: RequestTrace, status: int, user_id: Optional[str] = None,
+                     question: Optional[str] = None):
+        """Append the request to the log if it exceeded the threshold; file I/O runs off the event loop"""
+        record = self.entry(route, trace, status, user_id, question)
+        if record is None:
+            return
+        if self.path is None:
+            # The log formatter stamps its own time and request ID
+            fields = {key: value for key, value in record.items() if key not in ("timestamp", "request_id")}
+            logger.warning("Slow query", extra=fields)
+        else:
+            await asyncio.to_thread(self._append, json.dumps(record, default=str) + "\n")
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,568 @@
+import asyncio
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+from array import array
+from pathlib import Path
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable
+from datetime import datetime
+from dotenv import load_dotenv
+from compression import compress_text, decompress_text, resolve_codec, CODEC_NONE
+from storage import StorageBackend, load_document, iso_utc, encode_cursor, decode_cursor
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Defaults to an untracked file next to the code; the bundled docubrain.db is left untouched
+SQLITE_PATH = os.environ.get('SQLITE_PATH', str(ROOT_DIR / 'docubrain_local.db'))
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '4'))
+
+# Base tables match the schema of the bundled docubrain.db; newer fields are added as columns
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        api_key TEXT UNIQUE NOT NULL,
+        created_at TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS documents (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        content TEXT NOT NULL,
+        chunks TEXT NOT NULL,
+        embeddings TEXT NOT NULL,
+        upload_time TEXT NOT NULL,
+        chunk_count INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )""",
+]
+DOCUMENT_COLUMNS = {
+    "content_codec": "TEXT",
+    "content_length": "INTEGER",
+    "page_spans": "TEXT",
+    "chunk_spans": "TEXT",
+    "embedding_dim": "INTEGER",
+}
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_documents_user_time ON documents (user_id, upload_time DESC, id DESC)",
+]
+# user_id is indexed so a search only matches the user's own chunks instead of filtering everyone's afterwards
+FTS_SCHEMA = ("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+              "text, document_id UNINDEXED, user_id, chunk_index UNINDEXED)")
+
+# Statements are module constants so each pooled connection's statement cache reuses them
+SQL_INSERT_USER = "INSERT INTO users (user_id, username, password, api_key, created_at) VALUES (?, ?, ?, ?, ?)"
+SQL_USER_BY_USERNAME = "SELECT user_id, username, password, api_key, created_at FROM users WHERE username = ?"
+SQL_USER_BY_API_KEY = "SELECT user_id, username, password, api_key, created_at FROM users WHERE api_key = ?"
+SQL_UPDATE_API_KEY = "UPDATE users SET api_key = ? WHERE user_id = ?"
+SQL_DELETE_USER = "DELETE FROM users WHERE user_id = ?"
+SQL_DELETE_USER_DOCUMENTS = "DELETE FROM documents WHERE user_id = ?"
+SQL_DELETE_USER_FTS = "DELETE FROM chunks_fts WHERE user_id = ?"
+SQL_INSERT_DOCUMENT = """INSERT INTO documents (id, user_id, filename, content, content_codec, content_length,
+    page_spans, chunks, chunk_spans, embeddings, embedding_dim, upload_time, chunk_count, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+SQL_INSERT_FTS = "INSERT INTO chunks_fts (text, document_id, user_id, chunk_index) VALUES (?, ?, ?, ?)"
+SQL_TABLE_DEFINITION = "SELECT sql FROM sqlite_master WHERE name = ?"
+SQL_FTS_BACKFILL_SOURCE = "SELECT id, user_id, content, content_codec, chunks, chunk_spans FROM documents"
+SQL_LIST_DOCUMENTS = """SELECT id, filename, upload_time, chunk_count, status FROM documents
+    WHERE user_id = ? ORDER BY upload_time DESC"""
+SQL_DOCUMENTS_WITH_CONTENT = """SELECT id, filename, content, content_codec, chunks, chunk_spans, embeddings,
+    embedding_dim FROM documents WHERE user_id = ?"""
+SQL_DOCUMENT_BY_ID = "SELECT * FROM documents WHERE id = ?"
+SQL_DOCUMENT_INFO = """SELECT id, user_id, filename, upload_time, chunk_count, status, content_length, page_spans
+    FROM documents WHERE id = ?"""
+SQL_CONTENT_CODEC = "SELECT content_codec FROM documents WHERE id = ?"
+SQL_CONTENT_RANGE = """SELECT content_codec,
+    CASE WHEN COALESCE(content_codec, 'none') = 'none' THEN substr(content, ?, ?) ELSE content END AS content,
+    CASE WHEN COALESCE(content_codec, 'none') = 'none' THEN length(content) END AS total_length
+    FROM documents WHERE id = ?"""
+SQL_DELETE_DOCUMENT = "DELETE FROM documents WHERE id = ?"
+SQL_DELETE_DOCUMENT_FTS = "DELETE FROM chunks_fts WHERE document_id = ?"
+SQL_RECOMPRESS_CANDIDATES = ("SELECT id, content, content_codec FROM documents "
+                             "WHERE COALESCE(content_codec, 'none') != ?")
+SQL_UPDATE_CONTENT = "UPDATE documents SET content = ?, content_codec = ? WHERE id = ?"
+SQL_KEYWORD_SEARCH = """SELECT f.document_id, f.chunk_index, f.text, d.filename,
+    bm25(chunks_fts, 1.0, 0.0, 0.0, 0.0) AS rank
+    FROM chunks_fts f JOIN documents d ON d.id = f.document_id
+    WHERE chunks_fts MATCH ? AND f.user_id = ? ORDER BY rank LIMIT ?"""
+
+_FTS_TERM_RE = re.compile(r'\w+')
+
+
+def pack_embeddings(embeddings: List[List[float]]) -> Any:
+    """Pack equal-length embeddings into one float32 BLOB; ragged input falls back to JSON"""
+    if not embeddings:
+        return b"", 0
+    dim = len(embeddings[0])
+    if any(len(embedding) != dim for embedding in embeddings):
+        return json.dumps(embeddings), None
+    packed = array('f')
+    for embedding in embeddings:
+        packed.extend(embedding)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes(), dim
+
+
+def unpack_embeddings(value: Any, dim: Optional[int]) -> List[List[float]]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        # Legacy rows store embeddings as JSON text
+        return json.loads(value) if value else []
+    if not dim:
+        return []
+    packed = array('f')
+    packed.frombytes(value)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return [packed[i:i + dim].tolist() for i in range(0, len(packed), dim)]
+
+
+def _json_or_none(value: Optional[str]) -> Any:
+    return json.loads(value) if value else None
+
+
+class SQLiteDatabase(StorageBackend):
+    """SQLite storage backend for single-node deployments (WAL mode, pooled connections, FTS5 keyword search)"""
+
+    def __init__(self, path: str = SQLITE_PATH, pool_size: int = SQLITE_POOL_SIZE):
+        super().__init__()
+        self.path = path
+        self.pool_size = pool_size
+        self.fts_enabled = False
+        self._pool: Optional[queue.Queue] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _call(self, fn: Callable[..., Any], *args) -> Any:
+        conn = self._pool.get()
+        try:
+            # Each call is one transaction: committed on success, rolled back on error
+            with conn:
+                return fn(conn, *args)
+        finally:
+            self._pool.put(conn)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(conn, *args) on a pooled connection in a worker thread"""
+        return await asyncio.to_thread(self._call, fn, *args)
+
+    async def init_db(self):
+        """Open the connection pool and create tables, indexes and the FTS index"""
+        try:
+            self._pool = queue.Queue()
+            for _ in range(self.pool_size):
+                self._pool.put(self._connect())
+            await self._run(self._create_schema)
+            print(f"[OK] Successfully opened SQLite database: {self.path} (FTS5: {self.fts_enabled})")
+        except Exception as e:
+            print(f"[ERROR] Failed to open SQLite database: {e}")
+            raise e
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        for statement in SCHEMA:
+            conn.execute(statement)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+        for column, declaration in DOCUMENT_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE documents ADD COLUMN {column} {declaration}")
+        for statement in INDEXES:
+            conn.execute(statement)
+        fts_table = conn.execute(SQL_TABLE_DEFINITION, ("chunks_fts",)).fetchone()
+        if fts_table is not None and "user_id UNINDEXED" in fts_table["sql"]:
+            # Earlier index matched every user's chunks; rebuild it with user_id indexed
+            conn.execute("DROP TABLE chunks_fts")
+            fts_table = None
+        fts_existed = fts_table is not None
+        try:
+            conn.execute(FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            print(f"[WARNING] SQLite FTS5 not available, keyword search falls back to Python: {e}")
+            return
+        if not fts_existed:
+            # Documents stored before the index existed would otherwise never match a keyword search
+            indexed = self._backfill_fts(conn)
+            if indexed:
+                print(f"[OK] Indexed {indexed} existing chunks for keyword search")
+
+    @staticmethod
+    def _backfill_fts(conn: sqlite3.Connection) -> int:
+        indexed = 0
+        for row in conn.execute(SQL_FTS_BACKFILL_SOURCE):
+            chunk_spans = _json_or_none(row['chunk_spans'])
+            if chunk_spans is not None:
+                text = decompress_text(row['content'], row['content_codec'])
+                chunk_texts = [text[start:end] for start, end in chunk_spans]
+            else:
+                chunk_texts = _json_or_none(row['chunks']) or []
+            conn.executemany(SQL_INSERT_FTS, [
+                (chunk, row['id'], row['user_id'], i) for i, chunk in enumerate(chunk_texts)
+            ])
+            indexed += len(chunk_texts)
+        return indexed
+
+    async def close(self):
+        if self._pool is None:
+            return
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+        self._pool = None
+
+    # Users
+
+    async def create_user(self, user_data: Dict[str, Any]) -> bool:
+        """Create a new user"""
+        try:
+            if isinstance(user_data.get('created_at'), datetime):
+                user_data['created_at'] = user_data['created_at'].isoformat()
+
+            await self._run(lambda conn: conn.execute(SQL_INSERT_USER, (
+                user_data['user_id'], user_data['username'], user_data['password'],
+                user_data['api_key'], user_data['created_at']
+            )))
+            # The new key may have been cached as invalid
+            self.api_key_cache.invalidate(user_data['api_key'])
+            return True
+        except Exception as e:
+            print(f"Error creating user: {e}")
+            return False
+
+    async def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get user by username"""
+        try:
+            row = await self._run(lambda conn: conn.execute(SQL_USER_BY_USERNAME, (username,)).fetchone())
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error getting user by username: {e}")
+            return None
+
+    async def _fetch_user_by_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
+        row = await self._run(lambda conn: conn.execute(SQL_USER_BY_API_KEY, (api_key,)).fetchone())
+        return dict(row) if row else None
+
+    async def update_user_api_key(self, user_id: str, api_key: str) -> bool:
+        """Replace a user's API key and drop cached lookups for the old and new keys"""
+        try:
+            cursor = await self._run(lambda conn: conn.execute(SQL_UPDATE_API_KEY, (api_key, user_id)))
+        except Exception as e:
+            print(f"Error updating API key: {e}")
+            return False
+        finally:
+            self.api_key_cache.invalidate_user(user_id)
+            self.api_key_cache.invalidate(api_key)
+        return cursor.rowcount > 0
+
+    async def delete_user(self, user_id: str) -> bool:
+        """Delete a user and their documents"""
+        def delete(conn: sqlite3.Connection) -> int:
+            if self.fts_enabled:
+                conn.execute(SQL_DELETE_USER_FTS, (user_id,))
+            conn.execute(SQL_DELETE_USER_DOCUMENTS, (user_id,))
+            return conn.execute(SQL_DELETE_USER, (user_id,)).rowcount
+
+        try:
+            deleted = await self._run(delete)
+        except Exception as e:
+            print(f"Error deleting user: {e}")
+            return False
+        finally:
+            self.api_key_cache.invalidate_user(user_id)
+        return deleted > 0
+
+    # Documents
+
+    async def create_document(self, doc_data: Dict[str, Any]) -> bool:
+        """Create a new document and index its chunks for keyword search"""
+        try:
+            if isinstance(doc_data.get('upload_time'), datetime):
+                doc_data['upload_time'] = doc_data['upload_time'].isoformat()
+
+            text = doc_data.get('content', '')
+            chunk_spans = doc_data.get('chunk_spans')
+            if chunk_spans is not None:
+                chunk_texts = [text[start:end] for start, end in chunk_spans]
+            else:
+                chunk_texts = doc_data.get('chunks', [])
+
+            content, codec = compress_text(text)
+            embeddings, dim = pack_embeddings(doc_data.get('embeddings', []))
+            row = (
+                doc_data['id'], doc_data['user_id'], doc_data['filename'], content, codec,
+                doc_data.get('content_length', len(text)),
+                json.dumps(doc_data['page_spans']) if doc_data.get('page_spans') is not None else None,
+                json.dumps([] if chunk_spans is not None else chunk_texts),
+                json.dumps(chunk_spans) if chunk_spans is not None else None,
+                embeddings, dim, doc_data['upload_time'], doc_data.get('chunk_count', len(chunk_texts)),
+                doc_data.get('status', 'completed')
+            )
+
+            def insert(conn: sqlite3.Connection):
+                conn.execute(SQL_INSERT_DOCUMENT, row)
+                if self.fts_enabled:
+                    conn.executemany(SQL_INSERT_FTS, [
+                        (chunk, doc_data['id'], doc_data['user_id'], i) for i, chunk in enumerate(chunk_texts)
+                    ])
+
+            await self._run(insert)
+            return True
+        except Exception as e:
+            print(f"Error creating document: {e}")
+            return False
+
+    async def get_user_documents(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a user"""
+        try:
+            rows = await self._run(lambda conn: conn.execute(SQL_LIST_DOCUMENTS, (user_id,)).fetchall())
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting user documents: {e}")
+            return []
+
+    async def get_user_documents_page(self, user_id: str, limit: int, cursor: Optional[str] = None,
+                                      filename_prefix: Optional[str] = None, status: Optional[str] = None,
+                                      uploaded_after: Optional[datetime] = None,
+                                      uploaded_before: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get one page of a user's documents, newest first, using keyset pagination on (upload_time, id)"""
+        clauses = ["user_id = ?"]
+        params: List[Any] = [user_id]
+        if filename_prefix:
+            clauses.append("substr(filename, 1, ?) = ?")
+            params += [len(filename_prefix), filename_prefix]
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if uploaded_after:
+            clauses.append("upload_time >= ?")
+            params.append(iso_utc(uploaded_after))
+        if uploaded_before:
+            clauses.append("upload_time < ?")
+            params.append(iso_utc(uploaded_before))
+        if cursor:
+            upload_time, document_id = decode_cursor(cursor)
+            clauses.append("(upload_time < ? OR (upload_time = ? AND id < ?))")
+            params += [upload_time, upload_time, document_id]
+        params.append(limit + 1)
+
+        sql = (f"SELECT id, filename, upload_time, chunk_count, status FROM documents WHERE {' AND '.join(clauses)} "
+               f"ORDER BY upload_time DESC, id DESC LIMIT ?")
+        try:
+            rows = await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        except Exception as e:
+            print(f"Error getting user documents page: {e}")
+            return {"documents": [], "next_cursor": None}
+
+        documents = [dict(row) for row in rows]
+        next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return {"documents": documents[:limit], "next_cursor": next_cursor}
+
+    def _document_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        document = dict(row)
+        if 'embeddings' in document:
+            document['embeddings'] = unpack_embeddings(document['embeddings'], document.pop('embedding_dim', None))
+        for field in ('chunk_spans', 'page_spans'):
+            if field in document:
+                value = _json_or_none(document[field])
+                if value is None:
+                    document.pop(field)
+                else:
+                    document[field] = value
+        if 'chunks' in document:
+            chunks = _json_or_none(document['chunks'])
+            if document.get('chunk_spans') is not None or chunks is None:
+                document.pop('chunks')
+            else:
+                document['chunks'] = chunks
+        if document.get('content_length') is None:
+            document.pop('content_length', None)
+        return load_document(document)
+
+    async def get_user_documents_with_content(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a user with full content for querying"""
+        try:
+            rows = await self._run(lambda conn: conn.execute(SQL_DOCUMENTS_WITH_CONTENT, (user_id,)).fetchall())
+            return [self._document_from_row(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting user documents with content: {e}")
+            return []
+
+    async def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document by its ID"""
+        try:
+            row = await self._run(lambda conn: conn.execute(SQL_DOCUMENT_BY_ID, (document_id,)).fetchone())
+            return self._document_from_row(row) if row else None
+        except Exception as e:
+            print(f"Error getting document by ID: {e}")
+            return None
+
+    async def get_document_info(self, document_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get document metadata without content, chunks or embeddings, optionally scoped to an owner"""
+        sql, params = SQL_DOCUMENT_INFO, [document_id]
+        if user_id is not None:
+            sql, params = sql + " AND user_id = ?", params + [user_id]
+        try:
+            row = await self._run(lambda conn: conn.execute(sql, params).fetchone())
+        except Exception as e:
+            print(f"Error getting document info: {e}")
+            return None
+        if row is None:
+            return None
+
+        document = dict(row)
+        document['page_spans'] = _json_or_none(document['page_spans'])
+        return {key: value for key, value in document.items() if value is not None}
+
+    async def get_document_content_range(self, document_id: str, start: int = 0, end: Optional[int] = None,
+                                         user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a character range of a document's content; uncompressed content is sliced by SQLite"""
+        start = max(0, start)
+        # substr() takes a 32-bit length, so "to the end" is expressed as 2**30 characters
+        count = (1 << 30) if end is None else max(0, end - start)
+        sql, params = SQL_CONTENT_RANGE, [start + 1, count, document_id]
+        if user_id is not None:
+            sql, params = sql + " AND user_id = ?", params + [user_id]
+        try:
+            row = await self._run(lambda conn: conn.execute(sql, params).fetchone())
+            if row is None:
+                return None
+
+            content = row['content'] or ""
+            total_length = row['total_length']
+            if total_length is None:
+                # Compressed record: decompress and slice in the app
+                text = decompress_text(content, row['content_codec'])
+                total_length = len(text)
+                content = text[start:end]
+
+            return {
+                "content": content,
+                "start": min(start, total_length),
+                "end": min(start, total_length) + len(content),
+                "total_length": total_length
+            }
+        except Exception as e:
+            print(f"Error getting document content range: {e}")
+            return None
+
+    async def iter_document_content(self, document_id: str, window: int = 65536,
+                                    user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield a document's content in windows of `window` characters"""
+        sql, params = SQL_CONTENT_CODEC, [document_id]
+        if user_id is not None:
+            sql, params = sql + " AND user_id = ?", params + [user_id]
+        info = await self._run(lambda conn: conn.execute(sql, params).fetchone())
+        if info is None:
+            return
+
+        if (info['content_codec'] or CODEC_NONE) != CODEC_NONE:
+            # Compressed content is decompressed once and paged locally
+            part = await self.get_document_content_range(document_id, user_id=user_id)
+            text = part["content"] if part else ""
+            for offset in range(0, len(text), window):
+                yield text[offset:offset + window]
+            return
+
+        start = 0
+        while True:
+            part = await self.get_document_content_range(document_id, start, start + window, user_id)
+            if not part or not part["content"]:
+                return
+            yield part["content"]
+            start = part["end"]
+            if start >= part["total_length"]:
+                return
+
+    async def delete_user_document(self, document_id: str, user_id: str) -> Optional[bool]:
+        """Delete a document owned by the user, with its keyword index rows, in one transaction"""
+        def delete(conn: sqlite3.Connection) -> int:
+            deleted = conn.execute(SQL_DELETE_DOCUMENT + " AND user_id = ?", (document_id, user_id)).rowcount
+            if deleted and self.fts_enabled:
+                conn.execute(SQL_DELETE_DOCUMENT_FTS, (document_id,))
+            return deleted
+
+        try:
+            deleted = await self._run(delete)
+        except Exception as e:
+            print(f"Error deleting document: {e}")
+            return None
+
+        return deleted > 0
+
+    async def delete_document(self, document_id: str) -> bool:
+        """Delete a document by its ID"""
+        def delete(conn: sqlite3.Connection) -> int:
+            if self.fts_enabled:
+                conn.execute(SQL_DELETE_DOCUMENT_FTS, (document_id,))
+            return conn.execute(SQL_DELETE_DOCUMENT, (document_id,)).rowcount
+
+        try:
+            return await self._run(delete) > 0
+        except Exception as e:
+            print(f"Error deleting document: {e}")
+            return False
+
+    async def recompress_documents(self, codec: Optional[str] = None, batch_size: int = 50) -> int:
+        """Re-encode stored document content with the given codec; returns the number of records rewritten"""
+        codec = resolve_codec(codec)
+        updated = 0
+        try:
+            rows = await self._run(lambda conn: conn.execute(SQL_RECOMPRESS_CANDIDATES, (codec,)).fetchall())
+            for i in range(0, len(rows), batch_size):
+                updates = []
+                for row in rows[i:i + batch_size]:
+                    current = row['content_codec'] or CODEC_NONE
+                    payload, used = compress_text(decompress_text(row['content'], current), codec)
+                    if used != current:
+                        updates.append((payload, used, row['id']))
+                if updates:
+                    await self._run(lambda conn: conn.executemany(SQL_UPDATE_CONTENT, updates))
+                    updated += len(updates)
+
+            print(f"[OK] Recompressed {updated} documents with codec {codec}")
+        except Exception as e:
+            print(f"Error recompressing documents: {e}")
+        return updated
+
+    async def keyword_search(self, user_id: str, query: str, top_k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """BM25 keyword search over the user's chunks using the FTS5 index"""
+        if not self.fts_enabled:
+            return None
+
+        terms = _FTS_TERM_RE.findall(query.lower())
+        if not terms:
+            return []
+        # Only the user's rows are matched and ranked; the user_id comparison below guards exact equality
+        user_phrase = user_id.replace('"', '""')
+        match = f'user_id : "{user_phrase}" AND text : (' + " OR ".join(f'"{term}"' for term in terms) + ")"
+        try:
+            rows = await self._run(lambda conn: conn.execute(SQL_KEYWORD_SEARCH, (match, user_id, top_k)).fetchall())
+        except Exception as e:
+            print(f"Error in FTS keyword search: {e}")
+            return None
+
+        results = []
+        for row in rows:
+            # bm25() is lower-is-better and negative; map it onto (0, 1)
+            score = -row['rank']
+            results.append({
+                'document_id': row['document_id'],
+                'filename': row['filename'],
+                'chunk_index': int(row['chunk_index']),
+                'content': row['text'],
+                'relevance_score': score / (1.0 + score)
+            })
+        return results
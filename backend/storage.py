@@ -0,0 +1,195 @@
+import base64
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Sequence, AsyncIterator
+from datetime import datetime, timezone
+from compression import decompress_text
+from api_key_cache import ApiKeyCache, MISSING
+from metrics import trace_detail
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_LIST_FIELDS = {"id": 1, "filename": 1, "upload_time": 1, "chunk_count": 1, "status": 1, "_id": 0}
+
+
+def iso_utc(value: datetime) -> str:
+    """ISO string comparable with stored upload_time values (UTC, naive values assumed UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the (upload_time, id) position after `document`"""
+    payload = json.dumps([document["upload_time"], document["id"]]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> List[str]:
+    """Inverse of encode_cursor; raises ValueError for malformed tokens"""
+    try:
+        upload_time, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return [str(upload_time), str(document_id)]
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class ChunkSlices(Sequence):
+    """Chunk texts stored as (start, end) spans into the document content, sliced on access"""
+
+    def __init__(self, content: str, spans: List[List[int]]):
+        self.content = content
+        self.spans = spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.content[start:end] for start, end in self.spans[index]]
+        start, end = self.spans[index]
+        return self.content[start:end]
+
+    def span(self, index: int) -> List[int]:
+        return self.spans[index]
+
+
+def attach_chunks(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Expose `chunk_spans` as a lazy `chunks` sequence; legacy records keep their stored chunk text"""
+    spans = document.pop('chunk_spans', None)
+    if spans is not None:
+        document['chunks'] = ChunkSlices(document.get('content', ''), spans)
+    return document
+
+
+def load_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalise a stored document: drop _id, decompress content, attach lazy chunks"""
+    document.pop('_id', None)
+    if 'content' in document:
+        document['content'] = decompress_text(document['content'], document.pop('content_codec', None))
+    return attach_chunks(document)
+
+
+class StorageBackend(ABC):
+    """Interface for user and document storage.
+
+    Every backend returns plain dicts shaped like the MongoDB records, with
+    content decompressed and chunks exposed through `load_document`.
+    """
+
+    def __init__(self):
+        self.api_key_cache = ApiKeyCache()
+
+    @abstractmethod
+    async def init_db(self):
+        """Open connections and create indexes"""
+
+    async def close(self):
+        """Release connections"""
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Entry counts of in-process structures, for the metrics endpoint"""
+        stats = self.api_key_cache.stats()
+        return {"api_key_cache": stats["size"], "api_key_negative_cache": stats["negative_size"]}
+
+    # Users
+
+    @abstractmethod
+    async def create_user(self, user_data: Dict[str, Any]) -> bool:
+        """Create a new user"""
+
+    @abstractmethod
+    async def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get user by username"""
+
+    @abstractmethod
+    async def _fetch_user_by_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """Look up a user by API key in the store; raise on errors so they are not cached"""
+
+    async def get_user_by_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """Get user by API key, served from the API key cache when possible"""
+        cached = self.api_key_cache.get(api_key)
+        if cached is not MISSING:
+            trace_detail("api_key_cache", "hit" if cached else "negative_hit")
+            return cached
+        trace_detail("api_key_cache", "miss")
+
+        try:
+            user = await self._fetch_user_by_api_key(api_key)
+        except Exception as e:
+            # Lookup failures are not cached
+            logger.error("Error getting user by API key", extra={"error": str(e)})
+            return None
+
+        self.api_key_cache.put(api_key, user)
+        return user
+
+    @abstractmethod
+    async def update_user_api_key(self, user_id: str, api_key: str) -> bool:
+        """Replace a user's API key and drop cached lookups for the old and new keys"""
+
+    @abstractmethod
+    async def delete_user(self, user_id: str) -> bool:
+        """Delete a user and their documents"""
+
+    # Documents
+
+    @abstractmethod
+    async def create_document(self, doc_data: Dict[str, Any]) -> bool:
+        """Create a new document"""
+
+    @abstractmethod
+    async def get_user_documents(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a user (listing fields only)"""
+
+    @abstractmethod
+    async def get_user_documents_page(self, user_id: str, limit: int, cursor: Optional[str] = None,
+                                      filename_prefix: Optional[str] = None, status: Optional[str] = None,
+                                      uploaded_after: Optional[datetime] = None,
+                                      uploaded_before: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get one page of a user's documents, newest first, using keyset pagination on (upload_time, id).
+
+        Returns {"documents": [...], "next_cursor": str or None}. Raises ValueError for a bad cursor.
+        """
+
+    @abstractmethod
+    async def get_user_documents_with_content(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a user with content, chunks and embeddings for querying"""
+
+    @abstractmethod
+    async def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get a full document by its ID"""
+
+    @abstractmethod
+    async def get_document_info(self, document_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get document metadata without content, chunks or embeddings, optionally scoped to an owner"""
+
+    @abstractmethod
+    async def get_document_content_range(self, document_id: str, start: int = 0, end: Optional[int] = None,
+                                         user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a character range of a document's content as {content, start, end, total_length}"""
+
+    @abstractmethod
+    def iter_document_content(self, document_id: str, window: int = 65536,
+                              user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield a document's content in windows of `window` characters"""
+
+    @abstractmethod
+    async def delete_user_document(self, document_id: str, user_id: str) -> Optional[bool]:
+        """Delete a document owned by the user in one round trip.
+
+        Returns True if deleted, False if the user has no such document, None on error.
+        """
+
+    @abstractmethod
+    async def delete_document(self, document_id: str) -> bool:
+        """Delete a document by its ID"""
+
+    @abstractmethod
+    async def recompress_documents(self, codec: Optional[str] = None, batch_size: int = 50) -> int:
+        """Re-encode stored document content with the given codec; returns the number of records rewritten"""
+
+    async def keyword_search(self, user_id: str, query: str, top_k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Full-text search over a user's chunks; None when the backend has no text index"""
+        return None
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Chunking benchmark: legacy whitespace chunker vs. token-aware sentence chunker
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path for imports
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+sys.path.append(str(Path(__file__).parent))
+
+from chunking import TextChunker, legacy_chunk_text
+from corpus import make_text
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--overlap-tokens", type=int, default=16)
+    args = parser.parse_args()
+
+    chunker = TextChunker(args.max_tokens, args.overlap_tokens)
+    print(f"{'text':>13} {'size':>8} {'legacy s':>10} {'chunks':>8} {'sentence s':>11} {'stream s':>9} {'chunks':>8}")
+    for size_mb in args.sizes_mb:
+        prose = make_text(int(size_mb * 1024 * 1024))
+        # No sentence or paragraph boundary anywhere: streaming must still cut by word and stay linear
+        unpunctuated = re.sub(r'[.!?\s]+', ' ', prose)
+        for kind, text in (("prose", prose), ("unpunctuated", unpunctuated)):
+            pages = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+
+            legacy_time = timed(lambda: legacy_chunk_text(text), args.repeat)
+            sentence_time = timed(lambda: chunker.chunk(text), args.repeat)
+            stream_time = timed(lambda: list(chunker.iter_chunks(pages)), args.repeat)
+
+            print(f"{kind:>13} {size_mb:>6.1f}MB {legacy_time:>10.3f} {len(legacy_chunk_text(text)):>8} "
+                  f"{sentence_time:>11.3f} {stream_time:>9.3f} {len(chunker.chunk(text)):>8}")
+
+
+if __name__ == "__main__":
+    main()
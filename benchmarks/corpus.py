@@ -0,0 +1,151 @@
+"""
+Synthetic corpus generation for benchmarks: prose-like text, chunked documents and minimal PDFs
+"""
+
+import random
+from typing import Any, Callable, Dict, List, Optional
+
+WORDS = ("contract party agreement payment term notice clause liability service data customer provider "
+         "section shall may include period date amount within warranty delivery invoice renewal "
+         "termination confidential schedule fee breach remedy audit security privacy license").split()
+
+
+def make_sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 30))]
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+
+
+def make_text(size_chars: int, seed: int = 42) -> str:
+    """Prose with sentences and occasional paragraph breaks, about `size_chars` long"""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size_chars:
+        part = make_sentence(rng) + ("\n\n" if rng.random() < 0.08 else " ")
+        parts.append(part)
+        total += len(part)
+    return "".join(parts)
+
+
+def make_questions(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [f"What does the {rng.choice(WORDS)} {rng.choice(WORDS)} say about {rng.choice(WORDS)}?"
+            for _ in range(count)]
+
+
+def make_corpus(total_chunks: int, documents: int, embed: Optional[Callable[[List[str]], List]],
+                chunk_chars: int = 500, seed: int = 42) -> List[Dict]:
+    """Documents shaped like stored records, with chunk spans and, when `embed` is given, embeddings"""
+    documents = max(1, min(documents, total_chunks))
+    per_document = [total_chunks // documents + (1 if i < total_chunks % documents else 0)
+                    for i in range(documents)]
+    corpus = []
+    for i, chunk_count in enumerate(per_document):
+        rng = random.Random(seed + i)
+        chunks = []
+        for _ in range(chunk_count):
+            chunk = ""
+            while len(chunk) < chunk_chars:
+                chunk += make_sentence(rng) + " "
+            chunks.append(chunk.strip())
+
+        content = ""
+        spans = []
+        for chunk in chunks:
+            spans.append([len(content), len(content) + len(chunk)])
+            content += chunk + " "
+
+        corpus.append({
+            "id": f"bench-doc-{i}",
+            "filename": f"bench-{i}.pdf",
+            "content": content,
+            "chunk_spans": spans,
+            "chunks": chunks,
+            "embeddings": embed(chunks) if embed else [],
+            "chunk_count": len(chunks),
+            "status": "completed"
+        })
+    return corpus
+
+
+def make_pseudo_word(rng: random.Random) -> str:
+    syllables = "ka lo mi ne ru sa te vo zi qua dre fli gor plu shi tor"
+    return "".join(rng.choice(syllables.split()) for _ in range(rng.randint(3, 4)))
+
+
+def make_labelled_set(total_chunks: int, documents: int, questions: int, topic_words: int = 3,
+                      seed: int = 42) -> Dict[str, Any]:
+    """Retrieval evaluation set: chunks salted with rare topic words, and one question per target chunk.
+
+    Topic words come from a pool smaller than the number of slots, so other chunks share some of a
+    target's words and act as distractors; only the target has all of them.
+    """
+    rng = random.Random(seed)
+    corpus = make_corpus(total_chunks, documents, None, seed=seed)
+    pool = sorted({make_pseudo_word(rng) for _ in range(max(topic_words, total_chunks * topic_words // 2))})
+
+    topics = {}
+    for document in corpus:
+        for index, chunk in enumerate(document["chunks"]):
+            words = rng.sample(pool, topic_words)
+            topics[(document["id"], index)] = words
+            sentences = chunk.split(". ")
+            for word in words:
+                position = rng.randrange(len(sentences))
+                sentences[position] = f"{sentences[position]} {word}"
+            document["chunks"][index] = ". ".join(sentences)
+
+    targets = rng.sample(sorted(topics), min(questions, len(topics)))
+    labelled = []
+    for document_id, chunk_index in targets:
+        words = topics[(document_id, chunk_index)]
+        labelled.append({
+            "question": f"What does the {rng.choice(WORDS)} say about {', '.join(words[:-1])} and {words[-1]}?",
+            "relevant": [{"document_id": document_id, "chunk_index": chunk_index}]
+        })
+
+    return {
+        "documents": [{"id": d["id"], "filename": d["filename"], "chunks": d["chunks"]} for d in corpus],
+        "questions": labelled
+    }
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, chars_per_page: int = 3000, seed: int = 42) -> bytes:
+    """Minimal single-font PDF with `pages` pages of extractable text"""
+    rng = random.Random(seed)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for _ in range(pages):
+        text = ""
+        while len(text) < chars_per_page:
+            text += make_sentence(rng) + " "
+        lines = [text[i:i + 90] for i in range(0, len(text), 90)]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream_bytes = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream_bytes) + stream_bytes + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>".encode("ascii")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality versus latency across embedding backends.
+
+Runs a labelled question -> relevant chunk set through each retrieval backend and
+configuration (relevance threshold, top_k) and reports recall@k, MRR, per-query
+latency and memory. Retrieval mirrors the query endpoint: every document is searched
+on its own, then results are merged by score and cut to top_k.
+
+Backends:
+    gemini   Gemini embeddings served from a JSON fixture file (--gemini-fixtures);
+             --record fills missing entries from the live API (needs GEMINI_API_KEY)
+    fake     hashed bag-of-words stand-in used by the benchmarks
+    tfidf    LightweightEmbeddings TF-IDF vectors
+    keyword  the word-overlap fallback (_simple_keyword_search)
+    fts      SQLite FTS5 BM25 through SQLiteDatabase.keyword_search
+
+    python benchmarks/eval_retrieval.py --backends fake tfidf keyword fts --top-k 1 3 5 10
+    python benchmarks/eval_retrieval.py --dataset labelled.json --gemini-fixtures gemini.json --record
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add backend to path for imports
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+sys.path.append(str(Path(__file__).parent))
+
+from corpus import make_labelled_set
+from stats import latency_summary
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from fake_providers import FakeEmbeddings
+    from gemini_embeddings import GeminiEmbeddings
+    from lightweight_embeddings import LightweightEmbeddings
+    from sqlite_database import SQLiteDatabase
+
+Hit = Tuple[str, int, float]  # (document_id, chunk_index, score)
+
+
+class FixtureEmbeddings(GeminiEmbeddings):
+    """Gemini embeddings looked up in a JSON fixture keyed by task type and text hash"""
+
+    def __init__(self, path: Path, record: bool = False):
+        super().__init__()
+        self.path = path
+        self.record = record
+        self.fixtures: Dict[str, List[float]] = json.loads(path.read_text()) if path.exists() else {}
+        self.misses = 0
+        self.recorded = 0
+
+    def provider_available(self) -> bool:
+        return True
+
+    def _embed(self, text: str, task_type: str) -> List[float]:
+        key = f"{task_type}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+        if key not in self.fixtures:
+            if not self.record:
+                self.misses += 1
+                raise LookupError(f"No fixture for {key}")
+            self.fixtures[key] = super()._embed(text, task_type)
+            self.recorded += 1
+        return self.fixtures[key]
+
+    def save(self):
+        if self.recorded:
+            self.path.write_text(json.dumps(self.fixtures))
+            print(f"Recorded {self.recorded} Gemini embeddings to {self.path}")
+
+
+class Retriever:
+    """Searches each document separately and merges, like the query endpoint"""
+
+    name = "base"
+    has_threshold = False
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+
+    def index(self):
+        pass
+
+    def search_document(self, question: str, document: Dict[str, Any], top_k: int) -> List[dict]:
+        raise NotImplementedError
+
+    def search(self, question: str, top_k: int) -> List[Hit]:
+        hits = []
+        for document in self.documents:
+            for result in self.search_document(question, document, top_k):
+                hits.append((document["id"], result["chunk_index"], result["relevance_score"]))
+        hits.sort(key=lambda hit: hit[2], reverse=True)
+        return hits[:top_k]
+
+    def set_threshold(self, threshold: Optional[float]):
+        pass
+
+    def close(self):
+        pass
+
+
+class EmbeddingRetriever(Retriever):
+    has_threshold = True
+
+    def __init__(self, name: str, engine, documents: List[Dict[str, Any]]):
+        super().__init__(documents)
+        self.name = name
+        self.engine = engine
+        self.default_threshold = engine.relevance_threshold
+        self.embeddings: Dict[str, List[List[float]]] = {}
+
+    def embed_documents(self, chunks: List[str]) -> List[List[float]]:
+        return self.engine.get_embeddings(chunks)
+
+    def index(self):
+        for document in self.documents:
+            self.embeddings[document["id"]] = self.embed_documents(document["chunks"])
+
+    def set_threshold(self, threshold: Optional[float]):
+        self.engine.relevance_threshold = self.default_threshold if threshold is None else threshold
+
+    def search_document(self, question: str, document: Dict[str, Any], top_k: int) -> List[dict]:
+        return self.engine.find_relevant_chunks(question, document["chunks"], self.embeddings[document["id"]], top_k)
+
+
+class TfidfRetriever(EmbeddingRetriever):
+    def __init__(self, documents: List[Dict[str, Any]]):
+        super().__init__("tfidf", LightweightEmbeddings(), documents)
+
+    def index(self):
+        # Fit the vocabulary on the whole corpus first so every document shares one vector space
+        self.engine.get_embeddings_tfidf([chunk for document in self.documents for chunk in document["chunks"]])
+        for document in self.documents:
+            vectors = self.engine.tfidf_vectorizer.transform(document["chunks"])
+            self.embeddings[document["id"]] = vectors.toarray().tolist()
+
+
+class KeywordRetriever(Retriever):
+    name = "keyword"
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        super().__init__(documents)
+        self.engine = GeminiEmbeddings()
+
+    def search_document(self, question: str, document: Dict[str, Any], top_k: int) -> List[dict]:
+        return self.engine._simple_keyword_search(question, document["chunks"], top_k)
+
+
+class FtsRetriever(Retriever):
+    """One indexed query over all documents, as the storage backend runs it"""
+
+    name = "fts"
+    user_id = "eval-user"
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        super().__init__(documents)
+        self.loop = asyncio.new_event_loop()
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SQLiteDatabase(str(Path(self.directory.name) / "eval.db"))
+
+    def index(self):
+        async def load():
+            await self.store.init_db()
+            if not self.store.fts_enabled:
+                raise RuntimeError("SQLite build has no FTS5 support")
+            await self.store.create_user({"user_id": self.user_id, "username": self.user_id, "password": "-",
+                                          "api_key": "eval-key", "created_at": datetime.now(timezone.utc)})
+            for document in self.documents:
+                await self.store.create_document({
+                    "id": document["id"], "user_id": self.user_id, "filename": document["filename"],
+                    "content": document["content"], "chunk_spans": document["chunk_spans"], "embeddings": [],
+                    "upload_time": datetime.now(timezone.utc), "chunk_count": len(document["chunks"])
+                })
+        self.loop.run_until_complete(load())
+
+    def search(self, question: str, top_k: int) -> List[Hit]:
+        results = self.loop.run_until_complete(self.store.keyword_search(self.user_id, question, top_k)) or []
+        return [(result["document_id"], result["chunk_index"], result["relevance_score"]) for result in results]
+
+    def close(self):
+        self.loop.run_until_complete(self.store.close())
+        self.loop.close()
+        self.directory.cleanup()
+
+
+def load_dataset(args) -> Dict[str, Any]:
+    if args.dataset:
+        dataset = json.loads(Path(args.dataset).read_text())
+    else:
+        dataset = make_labelled_set(args.chunks, args.documents, args.questions, seed=args.seed)
+    # Rebuild content and spans from the chunks, the shape the storage backends expect
+    for document in dataset["documents"]:
+        document.setdefault("filename", f"{document['id']}.txt")
+        content, spans = "", []
+        for chunk in document["chunks"]:
+            spans.append([len(content), len(content) + len(chunk)])
+            content += chunk + "\n"
+        document["content"], document["chunk_spans"] = content, spans
+    return dataset
+
+
+def build_retriever(name: str, documents: List[Dict[str, Any]], args) -> Optional[Retriever]:
+    if name == "gemini":
+        path = Path(args.gemini_fixtures) if args.gemini_fixtures else None
+        if path is None or (not path.exists() and not args.record):
+            print("Skipping gemini: pass --gemini-fixtures, with --record to create them from the live API")
+            return None
+        return EmbeddingRetriever("gemini", FixtureEmbeddings(path, args.record), documents)
+    if name == "fake":
+        return EmbeddingRetriever("fake", FakeEmbeddings(latency_ms=0, error_rate=0, dimension=args.dim), documents)
+    if name == "tfidf":
+        return TfidfRetriever(documents)
+    if name == "keyword":
+        return KeywordRetriever(documents)
+    if name == "fts":
+        return FtsRetriever(documents)
+    raise SystemExit(f"Unknown backend: {name}")
+
+
+def evaluate(retriever: Retriever, questions: List[Dict[str, Any]], top_k: int) -> Dict[str, Any]:
+    """recall@k, hit rate, MRR and per-query latency for one configuration"""
+    recalls, reciprocal_ranks, hits, latencies = [], [], 0, []
+    for item in questions:
+        relevant = {(r["document_id"], r["chunk_index"]) for r in item["relevant"]}
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            results = retriever.search(item["question"], top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        ranked = [(document_id, chunk_index) for document_id, chunk_index, _ in results]
+        found = relevant.intersection(ranked)
+        recalls.append(len(found) / len(relevant) if relevant else 0.0)
+        hits += bool(found)
+        rank = next((position for position, key in enumerate(ranked, start=1) if key in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    # Query-time allocation peak, from one extra query outside the timed loop
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        retriever.search(questions[0]["question"], top_k)
+        _, query_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "top_k": top_k,
+        "recall@k": sum(recalls) / len(recalls),
+        "hit_rate": hits / len(questions),
+        "mrr": sum(reciprocal_ranks) / len(reciprocal_ranks),
+        "query_peak_bytes": query_peak,
+        **latency_summary(latencies)
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    dataset = load_dataset(args)
+    documents, questions = dataset["documents"], dataset["questions"]
+    total_chunks = sum(len(document["chunks"]) for document in documents)
+    print(f"{len(questions)} questions over {len(documents)} documents / {total_chunks} chunks\n")
+    print(f"{'backend':<8} {'threshold':>9} {'k':>3} {'recall@k':>9} {'hit':>6} {'mrr':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'query KiB':>10}")
+
+    report = {}
+    for name in args.backends:
+        retriever = build_retriever(name, documents, args)
+        if retriever is None:
+            continue
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            start = time.perf_counter()
+            retriever.index()
+            index_seconds = time.perf_counter() - start
+            retained, index_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        thresholds = args.thresholds if retriever.has_threshold else [None]
+        configurations = []
+        for threshold in thresholds:
+            retriever.set_threshold(threshold)
+            for top_k in args.top_k:
+                result = evaluate(retriever, questions, top_k)
+                default_threshold = getattr(retriever, "default_threshold", None)
+                result["threshold"] = default_threshold if threshold is None else threshold
+                configurations.append(result)
+                shown = "-" if result["threshold"] is None else f"{result['threshold']:.2f}"
+                print(f"{name:<8} {shown:>9} {top_k:>3} {result['recall@k']:>9.3f} {result['hit_rate']:>6.3f} "
+                      f"{result['mrr']:>6.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                      f"{result['query_peak_bytes'] / 1024:>10.0f}")
+
+        report[name] = {
+            "index_seconds": index_seconds,
+            "index_retained_bytes": retained,
+            "index_peak_bytes": index_peak,
+            "configurations": configurations
+        }
+        if isinstance(retriever, EmbeddingRetriever) and isinstance(retriever.engine, FixtureEmbeddings):
+            engine = retriever.engine
+            engine.save()
+            report[name]["fixture_misses"] = engine.misses
+            if engine.misses:
+                print(f"[WARNING] {engine.misses} Gemini fixture misses; those texts got zero vectors. "
+                      f"Re-run with --record to complete {engine.path}")
+        retriever.close()
+
+    return {"dataset": {"documents": len(documents), "chunks": total_chunks, "questions": len(questions)},
+            "backends": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocuBrain retrieval quality vs. latency evaluation")
+    parser.add_argument("--dataset", help="labelled set JSON: {documents: [{id, chunks}], "
+                                          "questions: [{question, relevant: [{document_id, chunk_index}]}]}")
+    parser.add_argument("--chunks", type=int, default=500, help="synthetic set size when no --dataset is given")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=["gemini", "fake", "tfidf", "keyword", "fts"])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[None],
+                        help="relevance thresholds for embedding backends (default: each engine's own)")
+    parser.add_argument("--dim", type=int, default=768, help="dimensionality of the fake embeddings")
+    parser.add_argument("--gemini-fixtures", help="JSON file of cached Gemini embeddings")
+    parser.add_argument("--record", action="store_true", help="call the live Gemini API for missing fixtures")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    if args.record and not os.environ.get('GEMINI_API_KEY'):
+        raise SystemExit("--record needs GEMINI_API_KEY")
+
+    report = run(args)
+    report["meta"] = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args)}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
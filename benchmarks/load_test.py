@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Async load generator for the full HTTP API.
+
+Starts a single uvicorn worker with in-memory storage and fake providers (or targets
+--base-url), then replays a weighted mix of register/login/upload/list/query/external
+query at increasing concurrency. Each step reports throughput, error rate and
+p50/p95/p99 per endpoint; the saturation point is the first step where adding
+clients stops adding throughput while tail latency keeps climbing.
+
+    python benchmarks/load_test.py --concurrency 1 4 16 64 --duration 20
+    python benchmarks/load_test.py --mix query=6 external_query=2 upload=1 list=1 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent))
+
+from corpus import make_pdf, make_questions, make_text
+from stats import latency_summary
+
+BACKEND_DIR = Path(__file__).parent.parent / 'backend'
+
+DEFAULT_MIX = {"register": 1, "login": 1, "upload": 1, "list": 2, "query": 6, "external_query": 2}
+
+
+class LoadClient:
+    """One simulated user: registers once, then issues requests and records their outcome"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: "Recorder", rng: random.Random,
+                 questions: List[str], pdf: bytes, text: str):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.questions = questions
+        self.pdf = pdf
+        self.text = text
+        self.username: Optional[str] = None
+        self.password = "load-test-password"
+        self.token: Optional[str] = None
+        self.api_key: Optional[str] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def _call(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(endpoint, (time.perf_counter() - start) * 1000, None, type(e).__name__)
+            return None
+        self.recorder.add(endpoint, (time.perf_counter() - start) * 1000, response.status_code)
+        return response
+
+    async def _register(self) -> Optional[Dict[str, Any]]:
+        username = f"load-{uuid.uuid4().hex[:12]}"
+        response = await self._call("register", "POST", "/api/auth/register",
+                                    json={"username": username, "password": self.password})
+        if response is None or response.status_code != 200:
+            return None
+        return {"username": username, **response.json()}
+
+    async def setup(self):
+        """Create the account this client logs in, uploads and queries as"""
+        account = await self._register()
+        if account:
+            self.username, self.token, self.api_key = account["username"], account["token"], account["api_key"]
+
+    async def register(self):
+        # Throwaway account, so the client keeps querying as the user that owns its documents
+        await self._register()
+
+    async def login(self):
+        response = await self._call("login", "POST", "/api/auth/login",
+                                    json={"username": self.username, "password": self.password})
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["token"]
+
+    async def upload(self):
+        files = {"file": (f"load-{self.rng.randrange(10 ** 6)}.pdf", self.pdf, "application/pdf")}
+        await self._call("upload", "POST", "/api/documents/upload", files=files, headers=self.headers)
+
+    async def add_text(self):
+        data = {"title": f"load-{self.rng.randrange(10 ** 6)}", "content": self.text}
+        await self._call("text", "POST", "/api/documents/text", data=data, headers=self.headers)
+
+    async def list(self):
+        await self._call("list", "GET", "/api/documents", headers=self.headers)
+
+    async def query(self):
+        await self._call("query", "POST", "/api/query", headers=self.headers,
+                         json={"question": self.rng.choice(self.questions)})
+
+    async def external_query(self):
+        await self._call("external_query", "POST", "/api/external/query",
+                         data={"api_key": self.api_key, "question": self.rng.choice(self.questions)})
+
+
+class Recorder:
+    """Per-endpoint latency samples and failures for one concurrency step"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # Requests completing before this perf_counter() value are warm-up and not recorded
+        self.measure_from = float("inf")
+
+    def add(self, endpoint: str, latency_ms: float, status: Optional[int], error: Optional[str] = None):
+        if time.perf_counter() < self.measure_from:
+            return
+        self.latencies[endpoint].append(latency_ms)
+        if status is None or status >= 400:
+            self.errors[endpoint][error or str(status)] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            failed = sum(self.errors[endpoint].values())
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "throughput_rps": len(samples) / elapsed,
+                "error_rate": failed / len(samples),
+                "errors": dict(self.errors[endpoint]),
+                **latency_summary(samples)
+            }
+        all_samples = [latency for samples in self.latencies.values() for latency in samples]
+        failed = sum(sum(errors.values()) for errors in self.errors.values())
+        total = {
+            "requests": len(all_samples),
+            "throughput_rps": len(all_samples) / elapsed,
+            "error_rate": failed / len(all_samples) if all_samples else 0.0,
+            **latency_summary(all_samples)
+        }
+        return {"elapsed_s": elapsed, "total": total, "endpoints": endpoints}
+
+
+def parse_mix(items: Optional[List[str]]) -> Dict[str, float]:
+    if not items:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if not hasattr(LoadClient, name) or name.startswith("_") or name in ("setup", "headers"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_step(base_url: str, concurrency: int, duration: float, warmup: float, mix: Dict[str, float],
+                   seed_documents: int, timeout: float, seed: int, questions: List[str], pdf: bytes,
+                   text: str) -> Dict[str, Any]:
+    """Drive `concurrency` clients in closed loop for `warmup` + `duration` seconds"""
+    recorder = Recorder()
+    operations, weights = zip(*mix.items())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        users = [LoadClient(client, recorder, random.Random(seed + i), questions, pdf, text)
+                 for i in range(concurrency)]
+
+        # Every client gets an account and something to query before measurement starts
+        await asyncio.gather(*(user.setup() for user in users))
+        users = [user for user in users if user.token]
+        if not users:
+            raise SystemExit(f"Could not register any users against {base_url}")
+        for _ in range(seed_documents):
+            await asyncio.gather(*(user.add_text() for user in users))
+
+        recorder.measure_from = time.perf_counter() + warmup
+        stop_at = recorder.measure_from + duration
+
+        async def worker(user: LoadClient):
+            while time.perf_counter() < stop_at:
+                operation = user.rng.choices(operations, weights)[0]
+                await getattr(user, operation)()
+
+        await asyncio.gather(*(worker(user) for user in users))
+
+    return recorder.report(duration)
+
+
+def find_saturation(steps: List[Dict[str, Any]], min_gain: float, max_p95_growth: float) -> Optional[int]:
+    """First concurrency whose throughput gain over the previous step is below `min_gain`
+    while p95 latency grew by more than `max_p95_growth`"""
+    for previous, current in zip(steps, steps[1:]):
+        before, after = previous["total"], current["total"]
+        if not before["throughput_rps"] or not before["p95_ms"]:
+            continue
+        gain = after["throughput_rps"] / before["throughput_rps"] - 1
+        growth = after["p95_ms"] / before["p95_ms"] - 1
+        if gain < min_gain and growth > max_p95_growth:
+            return current["concurrency"]
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_server(port: int, env_overrides: Dict[str, str], log_level: str):
+    """Run one uvicorn worker for the backend app with hermetic providers"""
+    env = dict(os.environ)
+    env.setdefault('STORAGE_BACKEND', 'memory')
+    env.setdefault('EMBEDDING_PROVIDER', 'fake')
+    env.setdefault('LLM_PROVIDER', 'fake')
+    # Quota buckets model Gemini's limits, not this server's capacity; concurrency caps stay on
+    env.setdefault('GATEWAY_EMBED_RATE', '0')
+    env.setdefault('GATEWAY_LLM_RATE', '0')
+    env.update(env_overrides)
+
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", "1", "--log-level", log_level, "--no-access-log"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise SystemExit(f"Server exited with code {process.returncode}")
+            try:
+                if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit("Server did not become ready within 30s")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def print_step(step: Dict[str, Any]):
+    total = step["total"]
+    print(f"\nconcurrency={step['concurrency']:<4} {total['throughput_rps']:>8.1f} req/s  "
+          f"errors={total['error_rate']:.1%}  p50={total['p50_ms']:.1f}ms  "
+          f"p95={total['p95_ms']:.1f}ms  p99={total['p99_ms']:.1f}ms")
+    for endpoint, stats in step["endpoints"].items():
+        print(f"  {endpoint:<16} {stats['requests']:>6} req {stats['throughput_rps']:>8.1f}/s "
+              f"err={stats['error_rate']:>6.1%} p50={stats['p50_ms']:>8.1f} p95={stats['p95_ms']:>8.1f} "
+              f"p99={stats['p99_ms']:>8.1f}ms")
+
+
+async def run_ramp(base_url: str, args, mix: Dict[str, float]) -> List[Dict[str, Any]]:
+    questions = make_questions(200, seed=args.seed)
+    pdf = make_pdf(args.pdf_pages, seed=args.seed)
+    text = make_text(args.text_chars, seed=args.seed)
+    steps = []
+    for concurrency in args.concurrency:
+        step = await run_step(base_url, concurrency, args.duration, args.warmup, mix, args.seed_documents,
+                              args.timeout, args.seed, questions, pdf, text)
+        step["concurrency"] = concurrency
+        steps.append(step)
+        print_step(step)
+        if step["total"]["error_rate"] > args.abort_error_rate:
+            print(f"Stopping ramp: error rate above {args.abort_error_rate:.0%}")
+            break
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocuBrain API load test")
+    parser.add_argument("--base-url", help="target a running server instead of starting one")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                        help="concurrent clients per ramp step")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds at the start of each step")
+    parser.add_argument("--mix", nargs="+", metavar="OP=WEIGHT",
+                        help="operation weights, from register login upload text list query external_query "
+                             f"(default: {' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})")
+    parser.add_argument("--seed-documents", type=int, default=2,
+                        help="text documents each client adds before measuring")
+    parser.add_argument("--text-chars", type=int, default=20000, help="size of seeded text documents")
+    parser.add_argument("--pdf-pages", type=int, default=5, help="pages in the uploaded PDF")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--abort-error-rate", type=float, default=0.5, help="stop ramping above this error rate")
+    parser.add_argument("--saturation-gain", type=float, default=0.1,
+                        help="throughput gain below which a step counts as saturated")
+    parser.add_argument("--saturation-p95-growth", type=float, default=0.5,
+                        help="p95 growth above which a step counts as saturated")
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the locally started server, e.g. FAKE_LLM_LATENCY_MS=200")
+    parser.add_argument("--log-level", default="warning", help="uvicorn log level for the local server")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+
+    if args.base_url:
+        steps = asyncio.run(run_ramp(args.base_url.rstrip("/"), args, mix))
+    else:
+        with local_server(free_port(), server_env, args.log_level) as base_url:
+            steps = asyncio.run(run_ramp(base_url, args, mix))
+
+    saturation = find_saturation(steps, args.saturation_gain, args.saturation_p95_growth)
+    peak = max(steps, key=lambda step: step["total"]["throughput_rps"])
+    print(f"\nPeak throughput {peak['total']['throughput_rps']:.1f} req/s at concurrency {peak['concurrency']}")
+    print(f"Saturation point: concurrency {saturation}" if saturation
+          else "No saturation point within the ramp")
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "base_url": args.base_url,
+                "mix": mix,
+                "server_env": server_env,
+                "args": vars(args)
+            },
+            "steps": steps,
+            "peak_concurrency": peak["concurrency"],
+            "saturation_concurrency": saturation
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Hot-path benchmark suite.
+
+Runs every benchmark in-process against the in-memory storage backend and the
+fake embedding/LLM providers, writes JSON with p50/p95/p99 latencies and
+tracemalloc peaks, and optionally compares against a stored baseline.
+
+    python benchmarks/run_benchmarks.py --chunks 10 1000 10000 --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Hermetic configuration must be in place before the backend modules are imported
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('EMBEDDING_PROVIDER', 'fake')
+os.environ.setdefault('LLM_PROVIDER', 'fake')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+# Provider quota buckets would throttle the fake providers being measured
+os.environ.setdefault('GATEWAY_EMBED_RATE', '0')
+os.environ.setdefault('GATEWAY_LLM_RATE', '0')
+
+# Add backend to path for imports
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+sys.path.append(str(Path(__file__).parent))
+
+from corpus import make_corpus, make_pdf, make_questions, make_text
+from stats import latency_summary
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import server
+    from lightweight_embeddings import LightweightEmbeddings
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None,
+            warmup: int = 1) -> Dict[str, Any]:
+    """Time `fn` `repeat` times (after `warmup` runs) and take one tracemalloc peak.
+
+    `setup`, when given, runs untimed before every call and its result is passed to `fn`.
+    Backend print output is discarded so it does not dominate the numbers.
+    """
+    def call():
+        return fn(setup()) if setup else fn()
+
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for _ in range(warmup):
+            call()
+        samples = []
+        for _ in range(repeat):
+            argument = setup() if setup else None
+            start = time.perf_counter()
+            fn(argument) if setup else fn()
+            samples.append((time.perf_counter() - start) * 1000)
+            sink.seek(0)
+            sink.truncate()
+
+        argument = setup() if setup else None
+        tracemalloc.start()
+        fn(argument) if setup else fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    result = {"runs": repeat, **latency_summary(samples)}
+    result["peak_memory_bytes"] = peak
+    return result
+
+
+def run_suite(args) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    loop = asyncio.new_event_loop()
+    engine = server.embeddings_engine
+    engine.embedding_dimension = args.dim
+    questions = make_questions(max(args.repeat, 1))
+
+    def record(name: str, result: Dict[str, Any], **params):
+        result["params"] = params
+        results[name] = result
+        print(f"{name:<48} p50={result['p50_ms']:>9.2f}ms p95={result['p95_ms']:>9.2f}ms "
+              f"p99={result['p99_ms']:>9.2f}ms peak={result['peak_memory_bytes'] / 1024:>9.0f}KiB")
+
+    # Ingestion
+    for size in args.text_sizes:
+        text = make_text(size)
+        record(f"chunk_text[{size}]", measure(lambda: server.chunk_text(text), args.repeat), chars=size)
+
+    for pages in args.pdf_pages:
+        pdf = make_pdf(pages)
+        record(f"extract_text_from_pdf[{pages}p]",
+               measure(lambda: server.extract_text_from_pdf(pdf), args.repeat), pages=pages)
+
+    # Retrieval
+    for total in args.chunks:
+        with contextlib.redirect_stdout(io.StringIO()):
+            corpus = make_corpus(total, args.documents, engine.get_embeddings)
+        chunks = [chunk for document in corpus for chunk in document["chunks"]]
+        embeddings = [embedding for document in corpus for embedding in document["embeddings"]]
+        question_iter = itertools.cycle(questions)
+        params = dict(chunks=total, documents=len(corpus), dim=args.dim)
+
+        record(f"gemini.find_relevant_chunks[{total}]",
+               measure(lambda: engine.find_relevant_chunks(next(question_iter), chunks, embeddings), args.repeat),
+               **params)
+        record(f"gemini._simple_keyword_search[{total}]",
+               measure(lambda: engine._simple_keyword_search(next(question_iter), chunks), args.repeat),
+               **params)
+
+        if total <= args.max_tfidf_chunks:
+            record(f"lightweight.get_embeddings_tfidf[{total}]",
+                   measure(lambda lightweight: lightweight.get_embeddings_tfidf(chunks), args.repeat,
+                           setup=LightweightEmbeddings),
+                   **params)
+
+            lightweight = LightweightEmbeddings()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tfidf_embeddings = lightweight.get_embeddings_tfidf(chunks)
+            record(f"lightweight.find_relevant_chunks[{total}]",
+                   measure(lambda: lightweight.find_relevant_chunks(next(question_iter), chunks, tfidf_embeddings),
+                           args.repeat),
+                   **params)
+
+        # End to end through the FastAPI handler, with in-memory storage and fake providers
+        store = server.db
+        store.reset()
+        user_id = "bench-user"
+        for document in corpus:
+            record_doc = {key: value for key, value in document.items() if key != "chunks"}
+            record_doc.update(user_id=user_id, upload_time=datetime.now(timezone.utc))
+            loop.run_until_complete(store.create_document(record_doc))
+
+        def query():
+            request = server.QueryRequest(question=next(question_iter))
+            return loop.run_until_complete(server.query_documents(request, user_id))
+
+        record(f"query_documents[{total}]", measure(query, args.repeat), **params)
+
+    loop.close()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float, metrics: List[str]) -> List[str]:
+    """Names and details of benchmarks slower than baseline by more than `tolerance`"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in metrics:
+            old, new = base.get(metric), result.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {old:.2f} -> {new:.2f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocuBrain hot-path benchmarks")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="total corpus sizes in chunks (10 to 100000)")
+    parser.add_argument("--documents", type=int, default=10, help="documents the chunks are spread over")
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimensionality")
+    parser.add_argument("--text-sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="chunk_text input sizes in characters")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--max-tfidf-chunks", type=int, default=20000,
+                        help="skip TF-IDF benchmarks above this corpus size")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging, e.g. 0.2")
+    parser.add_argument("--metrics", nargs="+", default=["p50_ms", "p95_ms"])
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args)
+        },
+        "results": results
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance, args.metrics)
+        if regressions:
+            print(f"REGRESSIONS (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
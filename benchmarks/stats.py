@@ -0,0 +1,28 @@
+"""
+Latency statistics shared by the benchmark and load-test scripts
+"""
+
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """Mean, min, max and p50/p95/p99 of millisecond samples"""
+    samples = sorted(samples)
+    if not samples:
+        return {"mean_ms": 0.0, "min_ms": 0.0, "max_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "mean_ms": sum(samples) / len(samples),
+        "min_ms": samples[0],
+        "max_ms": samples[-1],
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99)
+    }
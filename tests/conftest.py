@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Backend modules are imported flat, as server.py does
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Hermetic providers and storage; set before any backend module reads its settings
+os.environ.setdefault("EMBEDDING_PROVIDER", "fake")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+STORAGE_KINDS = ["memory", "sqlite", "mongo"]
+
+
+@pytest.fixture(params=STORAGE_KINDS)
+def run_storage(request, tmp_path, monkeypatch):
+    """Run `scenario(db)` against a fresh storage backend on its own event loop.
+
+    MongoDB needs a server: set TEST_MONGO_URL to include it, otherwise it is skipped.
+    """
+    kind = request.param
+    if kind == "mongo":
+        mongo_url = os.environ.get("TEST_MONGO_URL")
+        if not mongo_url:
+            pytest.skip("TEST_MONGO_URL not set")
+        import database
+        monkeypatch.setattr(database, "MONGO_URL", mongo_url)
+        monkeypatch.setattr(database, "DATABASE_NAME", f"docubrain_test_{uuid.uuid4().hex[:8]}")
+
+    def make():
+        if kind == "memory":
+            from memory_database import MemoryDatabase
+            return MemoryDatabase()
+        if kind == "sqlite":
+            from sqlite_database import SQLiteDatabase
+            return SQLiteDatabase(str(tmp_path / "test.db"), pool_size=2)
+        from database import Database
+        return Database()
+
+    def run(scenario):
+        async def main():
+            db = make()
+            await db.init_db()
+            try:
+                return await scenario(db)
+            finally:
+                if kind == "mongo":
+                    await db.client.drop_database(db.db.name)
+                await db.close()
+        return asyncio.run(main())
+
+    run.kind = kind
+    return run
+
+
+@pytest.fixture
+def api_client():
+    """TestClient for the app on the in-memory backend, emptied afterwards"""
+    from fastapi.testclient import TestClient
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
+    server.db.reset()
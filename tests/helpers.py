@@ -0,0 +1,8 @@
+"""Shared helpers for tests that drive the API"""
+
+
+def register(client, username: str = "test-user") -> dict:
+    """Register a user; returns the registration response with a ready `headers` entry"""
+    registered = client.post("/api/auth/register", json={"username": username, "password": "secret"}).json()
+    registered["headers"] = {"Authorization": f"Bearer {registered['token']}"}
+    return registered
@@ -0,0 +1,88 @@
+import time
+
+from api_key_cache import MISSING, ApiKeyCache
+from tests.helpers import register
+
+USER = {"user_id": "user-1", "username": "alice", "password": "secret", "api_key": "key-old",
+        "created_at": "2025-01-01T00:00:00+00:00"}
+
+
+def test_cache_returns_copies_and_negative_entries():
+    cache = ApiKeyCache()
+    assert cache.get("key-old") is MISSING
+    cache.put("key-old", USER)
+    cached = cache.get("key-old")
+    assert cached == USER
+    cached["user_id"] = "tampered"
+    assert cache.get("key-old")["user_id"] == "user-1"
+
+    cache.put("key-unknown", None)
+    assert cache.get("key-unknown") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (2, 1, 1)
+
+
+def test_invalidate_user_drops_every_key_of_that_user():
+    cache = ApiKeyCache()
+    cache.put("key-a", USER)
+    cache.put("key-b", USER)
+    cache.put("key-c", {**USER, "user_id": "user-2"})
+    cache.invalidate_user("user-1")
+    assert cache.get("key-a") is MISSING
+    assert cache.get("key-b") is MISSING
+    assert cache.get("key-c")["user_id"] == "user-2"
+
+
+def test_entries_expire():
+    cache = ApiKeyCache(ttl=0.05, negative_ttl=0.05)
+    cache.put("key-old", USER)
+    cache.put("key-unknown", None)
+    time.sleep(0.1)
+    assert cache.get("key-old") is MISSING
+    assert cache.get("key-unknown") is MISSING
+
+
+def test_rotation_invalidates_positive_and_negative_entries(run_storage):
+    async def scenario(db):
+        assert await db.create_user(dict(USER))
+        assert (await db.get_user_by_api_key("key-old"))["user_id"] == "user-1"
+        # The future key is looked up before it exists and cached as invalid
+        assert await db.get_user_by_api_key("key-new") is None
+        assert db.api_key_cache.get("key-old") is not MISSING
+        assert db.api_key_cache.get("key-new") is None
+
+        assert await db.update_user_api_key("user-1", "key-new")
+        assert await db.get_user_by_api_key("key-old") is None
+        assert (await db.get_user_by_api_key("key-new"))["user_id"] == "user-1"
+
+    run_storage(scenario)
+
+
+def test_user_deletion_invalidates_cached_key(run_storage):
+    async def scenario(db):
+        assert await db.create_user(dict(USER))
+        assert await db.get_user_by_api_key("key-old") is not None
+        assert await db.delete_user("user-1")
+        assert await db.get_user_by_api_key("key-old") is None
+
+    run_storage(scenario)
+
+
+def test_new_user_key_replaces_negative_entry(run_storage):
+    async def scenario(db):
+        assert await db.get_user_by_api_key("key-old") is None
+        assert await db.create_user(dict(USER))
+        assert (await db.get_user_by_api_key("key-old"))["user_id"] == "user-1"
+
+    run_storage(scenario)
+
+
+def test_rotated_key_is_rejected_by_external_api(api_client):
+    user = register(api_client)
+    form = {"api_key": user["api_key"], "question": "anything"}
+    # Caches the old key as valid; 400 because the user has no documents yet
+    assert api_client.post("/api/external/search", data=form).status_code == 400
+
+    rotated = api_client.post("/api/auth/rotate-key", headers=user["headers"]).json()
+    assert api_client.post("/api/external/search", data=form).status_code == 401
+    assert api_client.post("/api/external/search", data={**form, "api_key": rotated["api_key"]}).status_code == 400
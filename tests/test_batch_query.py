@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import gemini_embeddings  # noqa: F401 - imported before fake_providers, as the app does
+from fake_providers import FakeEmbeddings
+from tests.helpers import register
+
+DOCUMENTS = [
+    ["Refunds are issued within thirty days of delivery.", "Shipping to Canada takes about a week.",
+     "Warranty claims need the original receipt."],
+    ["Gift cards never expire.", "Refunds for gift cards are not possible.", "Stores open at nine."],
+]
+QUESTIONS = ["how long do refunds take", "shipping to canada", "when do stores open", "zzz"]
+
+
+def test_matrix_scoring_matches_per_document_scoring():
+    engine = FakeEmbeddings()
+    documents = [(chunks, engine.get_embeddings(chunks)) for chunks in DOCUMENTS]
+    # A document whose embeddings do not fit is keyword-searched in both paths
+    documents.append((["Refunds by bank transfer."], [[1.0, 0.0]]))
+
+    batch = engine.find_relevant_chunks_batch(QUESTIONS, documents, top_k=2)
+    assert len(batch) == len(QUESTIONS)
+    for question, pairs in zip(QUESTIONS, batch):
+        query_embedding = engine.get_query_embedding(question)
+        expected = [(doc_index, result) for doc_index, (chunks, embeddings) in enumerate(documents)
+                    for result in engine.find_relevant_chunks(question, chunks, embeddings, 2, query_embedding)]
+        assert [(doc_index, r["chunk_index"], r["content"]) for doc_index, r in pairs] == \
+            [(doc_index, r["chunk_index"], r["content"]) for doc_index, r in expected]
+        assert [r["relevance_score"] for _, r in pairs] == \
+            pytest.approx([r["relevance_score"] for _, r in expected])
+
+
+def upload_all(client, user):
+    for index, chunks in enumerate(DOCUMENTS):
+        response = client.post("/api/documents/text", headers=user["headers"],
+                               data={"title": f"doc-{index}", "content": "\n\n".join(chunks)})
+        assert response.status_code == 200
+
+
+def test_batch_answers_match_single_queries(api_client):
+    user = register(api_client)
+    upload_all(api_client, user)
+
+    response = api_client.post("/api/query/batch", headers=user["headers"], json={"questions": QUESTIONS})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    singles = [api_client.post("/api/query", headers=user["headers"], json={"question": question}).json()
+               for question in QUESTIONS]
+    assert [r["answer"] for r in results] == [s["answer"] for s in singles]
+    assert [[source["chunk_index"] for source in r["sources"]] for r in results] == \
+        [[source["chunk_index"] for source in s["sources"]] for s in singles]
+
+    streamed = api_client.post("/api/query/batch", headers=user["headers"],
+                               json={"questions": QUESTIONS, "stream": True})
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted((json.loads(line) for line in streamed.text.splitlines()), key=lambda line: line["index"])
+    assert [line["index"] for line in lines] == list(range(len(QUESTIONS)))
+    assert [line["answer"] for line in lines] == [r["answer"] for r in results]
+
+
+def test_batch_size_is_limited(api_client):
+    import server
+
+    user = register(api_client)
+    assert api_client.post("/api/query/batch", headers=user["headers"], json={"questions": []}).status_code == 422
+    too_many = ["refunds?"] * (server.QUERY_BATCH_MAX_QUESTIONS + 1)
+    assert api_client.post("/api/query/batch", headers=user["headers"], json={"questions": too_many}).status_code == 422
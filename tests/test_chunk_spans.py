@@ -0,0 +1,53 @@
+from storage import ChunkSlices, load_document
+from tests.helpers import register
+
+USER = "user-spans"
+SENTENCES = ["Refunds are issued within thirty days.", "Shipping to Canada takes a week.",
+             "Warranty claims need the original receipt."]
+CONTENT = " ".join(SENTENCES)
+SPANS = [[CONTENT.index(sentence), CONTENT.index(sentence) + len(sentence)] for sentence in SENTENCES]
+
+
+def test_chunk_slices_read_from_content():
+    chunks = ChunkSlices(CONTENT, SPANS)
+    assert len(chunks) == 3
+    assert list(chunks) == SENTENCES
+    assert chunks[1:] == SENTENCES[1:]
+    assert chunks.span(2) == SPANS[2]
+
+
+def test_legacy_records_keep_their_chunk_text():
+    document = load_document({"_id": "x", "content": CONTENT, "chunks": SENTENCES[:2]})
+    assert document["chunks"] == SENTENCES[:2]
+    assert "_id" not in document
+
+
+def test_stored_spans_come_back_as_chunks(run_storage):
+    async def scenario(db):
+        await db.create_document({
+            "id": "doc-1", "user_id": USER, "filename": "policy.txt", "content": CONTENT,
+            "content_length": len(CONTENT), "chunk_spans": SPANS, "embeddings": [[0.1, 0.2]] * 3,
+            "upload_time": "2025-01-01T00:00:00+00:00", "chunk_count": 3, "status": "completed"
+        })
+        [document] = await db.get_user_documents_with_content(USER)
+        assert document["content"] == CONTENT
+        assert list(document["chunks"]) == SENTENCES
+        assert [document["chunks"].span(i) for i in range(3)] == SPANS
+
+    run_storage(scenario)
+
+
+def test_search_offsets_point_into_the_uploaded_text(api_client):
+    user = register(api_client)
+    content = "\n\n".join(SENTENCES * 20)
+    response = api_client.post("/api/documents/text", headers=user["headers"],
+                               data={"title": "policy", "content": content})
+    assert response.status_code == 200
+
+    response = api_client.post("/api/search", headers=user["headers"],
+                               json={"question": "shipping to canada", "top_k": 3, "include_offsets": True})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results
+    for result in results:
+        assert content[result["start"]:result["end"]] == result["content"]
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from chunking import TextChunker
+
+PARAGRAPH = (
+    "The refund policy allows returns within thirty days of delivery. Items must be unused and in their "
+    "original packaging! Shipping costs are not refunded unless the item arrived damaged. Does the policy "
+    "cover gift cards? It does not.\n\n"
+)
+TEXT = "".join(
+    PARAGRAPH.replace("thirty", str(n)) + ("A single long sentence without any stop " * (n % 4)).strip() + ".\n\n"
+    for n in range(12)
+)
+
+
+@pytest.fixture
+def chunker():
+    chunker = TextChunker(max_tokens=40, overlap_tokens=8)
+    # Approximate token counts: deterministic and no encoding download
+    chunker._encoding_loaded = True
+    return chunker
+
+
+def test_offsets_map_back_to_source(chunker):
+    chunks = chunker.chunk(TEXT)
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert TEXT[chunk.start:chunk.end] == chunk.text
+        assert chunk.text == chunk.text.strip()
+
+
+def test_chunks_cover_the_text_in_order(chunker):
+    chunks = chunker.chunk(TEXT)
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(TEXT.rstrip())
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.start < chunk.start
+        # No text between consecutive chunks is lost
+        assert TEXT[previous.end:chunk.start].strip() == "" or chunk.start < previous.end
+
+
+def test_chunks_respect_token_budget(chunker):
+    for chunk in chunker.chunk(TEXT):
+        assert chunker.count_tokens([chunk.text])[0] <= 40
+
+
+def test_overlap_is_honoured(chunker):
+    chunks = chunker.chunk(TEXT)
+    overlaps = 0
+    for previous, chunk in zip(chunks, chunks[1:]):
+        if chunk.start < previous.end:
+            overlaps += 1
+            shared = TEXT[chunk.start:previous.end]
+            assert chunker.count_tokens([shared])[0] <= 8
+    assert overlaps > 0
+
+
+def test_no_overlap_when_disabled(chunker):
+    chunks = chunker.chunk(TEXT, overlap_tokens=0)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start >= previous.end
+
+
+def test_oversized_sentence_is_split_by_word(chunker):
+    text = " ".join(f"word{i}" for i in range(200)) + "."
+    chunks = chunker.chunk(text)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunker.count_tokens([chunk.text])[0] <= 40
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_streamed_pieces_match_whole_text(chunker, seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(TEXT)), 25))
+    pieces = [TEXT[start:end] for start, end in zip([0, *cuts], [*cuts, len(TEXT)])]
+    assert list(chunker.iter_chunks(pieces)) == chunker.chunk(TEXT)
+
+
+def test_streaming_one_character_at_a_time(chunker):
+    assert list(chunker.iter_chunks(iter(TEXT))) == chunker.chunk(TEXT)
+
+
+def test_empty_input_yields_nothing(chunker):
+    assert chunker.chunk("") == []
+    assert list(chunker.iter_chunks(["", "  \n\n "])) == []
+
+
+UNPUNCTUATED = " ".join(f"word{i % 97} filler" for i in range(3000))
+
+
+@pytest.mark.parametrize("piece_size", [1, 7, 300, 3000])
+def test_unpunctuated_stream_matches_whole_text(chunker, piece_size):
+    pieces = [UNPUNCTUATED[i:i + piece_size] for i in range(0, len(UNPUNCTUATED), piece_size)]
+    assert list(chunker.iter_chunks(pieces)) == chunker.chunk(UNPUNCTUATED)
+
+
+def test_unpunctuated_stream_emits_chunks_as_it_reads(chunker):
+    consumed = 0
+
+    def pieces():
+        nonlocal consumed
+        for i in range(0, len(UNPUNCTUATED), 300):
+            consumed += 1
+            yield UNPUNCTUATED[i:i + 300]
+
+    total = -(-len(UNPUNCTUATED) // 300)
+    chunks = chunker.iter_chunks(pieces())
+    next(chunks)
+    # Without a boundary in sight the text is still cut by word, so the buffer never holds the whole input
+    assert consumed <= 3 < total
+    for chunk in chunks:
+        assert chunker.count_tokens([chunk.text])[0] <= 40
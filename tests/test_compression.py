@@ -0,0 +1,68 @@
+import zlib
+
+import pytest
+
+import compression
+from compression import (CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD, MIN_COMPRESS_BYTES, ZSTD_AVAILABLE, compress_text,
+                         decompress_text, resolve_codec)
+
+USER = "user-codec"
+TEXT = "Refunds are issued within thirty days of delivery. Ünïcödé survives too. " * 40
+
+
+@pytest.mark.parametrize("codec", [
+    CODEC_NONE, CODEC_ZLIB,
+    pytest.param(CODEC_ZSTD, marks=pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard not installed"))])
+def test_round_trip(codec):
+    payload, used = compress_text(TEXT, codec)
+    assert used == codec
+    if codec != CODEC_NONE:
+        assert isinstance(payload, bytes) and len(payload) < len(TEXT.encode('utf-8'))
+    assert decompress_text(payload, used) == TEXT
+
+
+def test_short_text_is_stored_uncompressed():
+    text = "x" * (MIN_COMPRESS_BYTES - 1)
+    assert compress_text(text, CODEC_ZLIB) == (text, CODEC_NONE)
+
+
+def test_codec_fallbacks(monkeypatch):
+    monkeypatch.setattr(compression, "ZSTD_AVAILABLE", False)
+    assert resolve_codec(CODEC_ZSTD) == CODEC_ZLIB
+    assert compress_text(TEXT, CODEC_ZSTD)[1] == CODEC_ZLIB
+    assert resolve_codec("brotli") == CODEC_NONE
+    assert resolve_codec("ZLIB") == CODEC_ZLIB
+
+
+def test_untagged_and_unreadable_payloads(monkeypatch):
+    # Records written before compression carry no codec tag
+    assert decompress_text(TEXT, None) == TEXT
+    assert decompress_text(None, None) == ""
+    with pytest.raises(ValueError):
+        decompress_text(zlib.compress(b"x"), "brotli")
+    monkeypatch.setattr(compression, "ZSTD_AVAILABLE", False)
+    with pytest.raises(RuntimeError):
+        decompress_text(b"\x28\xb5\x2f\xfd", CODEC_ZSTD)
+
+
+def test_recompressed_documents_read_back_unchanged(run_storage):
+    async def scenario(db):
+        await db.create_document({
+            "id": "doc-1", "user_id": USER, "filename": "policy.txt", "content": TEXT,
+            "content_length": len(TEXT), "chunk_spans": [[0, 50], [50, 120]], "embeddings": [[0.1], [0.2]],
+            "upload_time": "2025-01-01T00:00:00+00:00", "chunk_count": 2, "status": "completed"
+        })
+        assert await db.recompress_documents(CODEC_ZLIB) == 1
+        # Already in the target codec: nothing to rewrite
+        assert await db.recompress_documents(CODEC_ZLIB) == 0
+
+        [document] = await db.get_user_documents_with_content(USER)
+        assert document["content"] == TEXT
+        assert list(document["chunks"]) == [TEXT[0:50], TEXT[50:120]]
+        part = await db.get_document_content_range("doc-1", 10, 40, user_id=USER)
+        assert part["content"] == TEXT[10:40]
+
+        assert await db.recompress_documents(CODEC_NONE) == 1
+        assert (await db.get_document_by_id("doc-1"))["content"] == TEXT
+
+    run_storage(scenario)
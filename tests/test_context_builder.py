@@ -0,0 +1,57 @@
+from chunking import text_chunker
+from context_builder import ContextBuilder
+
+CONTENT = ("Refunds are issued within thirty days of delivery. Shipping to Canada takes about a week. "
+           "Warranty claims need the original receipt. Gift cards never expire and cannot be refunded.")
+
+
+def chunk(text: str, index: int, score: float, document_id: str = "doc-1", span=None) -> dict:
+    result = {"content": text, "chunk_index": index, "relevance_score": score, "document_id": document_id}
+    if span is not None:
+        result["span"] = span
+    return result
+
+
+def filler(topic: str, words: int = 60) -> str:
+    return " ".join(f"{topic}{n}" for n in range(words))
+
+
+def test_context_stays_within_the_token_budget():
+    chunks = [chunk(filler(topic), index * 5, score)
+              for index, (topic, score) in enumerate([("alpha", 0.9), ("beta", 0.8), ("gamma", 0.7), ("delta", 0.6)])]
+    per_chunk = text_chunker.count_tokens([chunks[0]["content"]])[0]
+    builder = ContextBuilder(max_tokens=per_chunk * 2 + 1, max_chunks=10)
+
+    context, used = builder.build(chunks)
+    assert [c["relevance_score"] for c in used] == [0.9, 0.8]
+    assert text_chunker.count_tokens([context])[0] <= builder.max_tokens
+    # The best chunk is kept even when it alone is over budget
+    assert builder.select([chunk(filler("huge", 2000), 0, 0.5)]) != []
+
+
+def test_near_duplicates_are_dropped():
+    text = "Refunds are issued within thirty days of delivery"
+    chunks = [chunk(text, 0, 0.9), chunk(text + ".", 7, 0.8, "doc-2"), chunk("Shipping takes a week", 3, 0.5)]
+    selected = ContextBuilder(dedup_similarity=0.9).select(chunks)
+    assert [c["chunk_index"] for c in selected] == [0, 3]
+
+
+def test_adjacent_chunks_merge_into_one_passage():
+    builder = ContextBuilder()
+    spans = [[0, 51], [40, 90], [90, 133]]
+    chunks = [chunk(CONTENT[start:end], index, score, span=[start, end])
+              for index, ((start, end), score) in enumerate(zip(spans, [0.4, 0.9, 0.3]))]
+    chunks.append(chunk("Unrelated passage from another file.", 0, 0.5, "doc-2"))
+
+    [merged, other] = builder.merge(chunks, {"doc-1": CONTENT})
+    # Spans are re-sliced from the content, so the overlap between chunks 0 and 1 appears once
+    assert merged.text == CONTENT[0:133]
+    assert merged.relevance_score == 0.9
+    assert other.text == "Unrelated passage from another file."
+
+    # Without stored spans the repeated overlap is found in the chunk texts
+    [passage] = builder.merge([chunk(CONTENT[0:51], 0, 0.4), chunk(CONTENT[40:90], 1, 0.9)])
+    assert passage.text == CONTENT[0:90]
+
+    [first, second] = builder.merge([chunk("First.", 0, 0.4), chunk("Third.", 2, 0.9)])
+    assert (first.text, second.text) == ("Third.", "First.")
@@ -0,0 +1,52 @@
+import contextvars
+
+import pytest
+
+import deadlines
+from deadlines import Deadline, apply_user_deadline, current_deadline, deadline_for_route
+from tests.helpers import register
+
+
+@pytest.fixture
+def user_budgets(monkeypatch):
+    budgets = {}
+    monkeypatch.setattr(deadlines, "USER_DEADLINES_MS", budgets)
+    return budgets
+
+
+def test_queries_have_no_deadline_by_default():
+    assert deadline_for_route("/api/query") is None
+    assert deadline_for_route("/api/query/batch") is None
+
+
+def test_user_budget_replaces_the_route_budget(user_budgets):
+    user_budgets.update({"tight-user": 1500, "unbounded-user": 0})
+
+    def budget_after(user_id, route_budget_ms):
+        current_deadline.set(Deadline(route_budget_ms) if route_budget_ms else None)
+        apply_user_deadline(user_id)
+        deadline = current_deadline.get()
+        return None if deadline is None else deadline.budget
+
+    assert contextvars.copy_context().run(budget_after, "tight-user", 10000) == 1.5
+    assert contextvars.copy_context().run(budget_after, "tight-user", 0) == 1.5
+    assert contextvars.copy_context().run(budget_after, "unbounded-user", 10000) is None
+    assert contextvars.copy_context().run(budget_after, "other-user", 10000) == 10
+
+
+def test_user_budget_applies_to_api_and_external_queries_across_key_rotation(api_client, user_budgets):
+    user = register(api_client)
+    response = api_client.post("/api/documents/text", headers=user["headers"], data={
+        "title": "refunds", "content": "Refunds are issued within thirty days of delivery."})
+    assert response.status_code == 200
+    # Less than DEADLINE_MIN_LLM_MS, so answers are extractive rather than generated
+    user_budgets[user["user_id"]] = 500
+
+    response = api_client.post("/api/query", headers=user["headers"], json={"question": "When are refunds issued?"})
+    assert response.status_code == 200
+    assert response.json()["answer_mode"] == "extractive"
+
+    api_key = api_client.post("/api/auth/rotate-key", headers=user["headers"]).json()["api_key"]
+    response = api_client.post("/api/external/query", data={"api_key": api_key, "question": "When are refunds issued?"})
+    assert response.status_code == 200
+    assert response.json()["answer_mode"] == "extractive"
@@ -0,0 +1,60 @@
+from tests.helpers import register
+
+OWNER = "user-owner"
+CONTENT = "Refunds are issued within thirty days of delivery."
+
+
+def make_document(document_id: str = "doc-1", user_id: str = OWNER) -> dict:
+    return {
+        "id": document_id, "user_id": user_id, "filename": f"{document_id}.txt", "content": CONTENT,
+        "content_length": len(CONTENT), "chunk_spans": [[0, len(CONTENT)]], "embeddings": [[0.1, 0.2]],
+        "upload_time": "2025-01-01T00:00:00+00:00", "chunk_count": 1, "status": "completed"
+    }
+
+
+def test_reads_and_deletes_are_scoped_to_the_owner(run_storage):
+    async def scenario(db):
+        await db.create_document(make_document())
+
+        info = await db.get_document_info("doc-1", OWNER)
+        assert info["filename"] == "doc-1.txt"
+        # Metadata reads leave the heavy fields behind
+        assert not {"content", "chunks", "chunk_spans", "embeddings"} & info.keys()
+        assert await db.get_document_info("doc-1", "someone-else") is None
+        assert await db.get_document_content_range("doc-1", user_id="someone-else") is None
+
+        assert await db.delete_user_document("doc-1", "someone-else") is False
+        assert await db.get_document_info("doc-1", OWNER) is not None
+        assert await db.delete_user_document("doc-1", OWNER) is True
+        assert await db.delete_user_document("doc-1", OWNER) is False
+        assert await db.get_document_info("doc-1") is None
+
+    run_storage(scenario)
+
+
+def test_other_users_documents_are_not_found(api_client, monkeypatch):
+    import server
+
+    owner, other = register(api_client, "owner"), register(api_client, "other")
+    response = api_client.post("/api/documents/text", headers=owner["headers"],
+                               data={"title": "policy", "content": CONTENT})
+    document_id = response.json()["document_id"]
+    url = f"/api/documents/{document_id}"
+
+    assert api_client.get(url, headers=other["headers"]).status_code == 404
+    assert api_client.get(f"{url}/content", headers=other["headers"]).status_code == 404
+    assert api_client.delete(url, headers=other["headers"]).status_code == 404
+    assert api_client.get(url, headers=owner["headers"]).status_code == 200
+
+    round_trips = []
+    round_trip = server.db._round_trip
+
+    async def counted():
+        round_trips.append(1)
+        await round_trip()
+
+    monkeypatch.setattr(server.db, "_round_trip", counted)
+    assert api_client.delete(url, headers=owner["headers"]).status_code == 200
+    # Ownership check and delete in one storage call
+    assert len(round_trips) == 1
+    assert api_client.get(url, headers=owner["headers"]).status_code == 404
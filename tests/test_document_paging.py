@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from storage import decode_cursor, encode_cursor
+from tests.helpers import register
+
+USER = "user-paging"
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_document(index: int, upload_time: datetime, filename: str = None, status: str = "completed",
+                  user_id: str = USER) -> dict:
+    content = f"Document {index} content."
+    return {
+        "id": f"doc-{index:03d}",
+        "user_id": user_id,
+        "filename": filename or f"file-{index:03d}.txt",
+        "content": content,
+        "content_length": len(content),
+        "chunk_spans": [[0, len(content)]],
+        "embeddings": [[0.1, 0.2]],
+        "upload_time": upload_time,
+        "chunk_count": 1,
+        "status": status
+    }
+
+
+async def all_pages(db, limit: int, **filters) -> list:
+    documents, cursor = [], None
+    while True:
+        page = await db.get_user_documents_page(USER, limit, cursor=cursor, **filters)
+        documents.extend(page["documents"])
+        assert len(page["documents"]) <= limit
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return documents
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"upload_time": "2025-01-01T00:00:00+00:00", "id": "doc-001"})
+    assert decode_cursor(cursor) == ["2025-01-01T00:00:00+00:00", "doc-001"]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "e30=", "WzFd", "!!!"])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_paging_across_equal_upload_times(run_storage):
+    async def scenario(db):
+        # Seven documents share one upload_time, so only the id orders them
+        for index in range(7):
+            assert await db.create_document(make_document(index, BASE_TIME))
+        for index in range(7, 12):
+            assert await db.create_document(make_document(index, BASE_TIME + timedelta(minutes=index)))
+        await db.create_document(make_document(99, BASE_TIME, user_id="someone-else"))
+
+        documents = await all_pages(db, limit=3)
+        ids = [document["id"] for document in documents]
+        assert len(ids) == len(set(ids)) == 12
+        expected = sorted(documents, key=lambda d: (d["upload_time"], d["id"]), reverse=True)
+        assert documents == expected
+        assert ids[-7:] == [f"doc-{index:03d}" for index in range(6, -1, -1)]
+
+    run_storage(scenario)
+
+
+def test_last_full_page_has_no_next_cursor(run_storage):
+    async def scenario(db):
+        for index in range(4):
+            await db.create_document(make_document(index, BASE_TIME))
+        page = await db.get_user_documents_page(USER, 4)
+        assert len(page["documents"]) == 4
+        assert page["next_cursor"] is None
+
+    run_storage(scenario)
+
+
+def test_filters(run_storage):
+    async def scenario(db):
+        await db.create_document(make_document(1, BASE_TIME, "report-q1.pdf"))
+        await db.create_document(make_document(2, BASE_TIME + timedelta(days=1), "report-q2.pdf", status="processing"))
+        await db.create_document(make_document(3, BASE_TIME + timedelta(days=2), "notes.txt"))
+        await db.create_document(make_document(4, BASE_TIME + timedelta(days=3), "report-q3.pdf"))
+
+        async def ids(**filters):
+            return [document["id"] for document in await all_pages(db, limit=1, **filters)]
+
+        assert await ids(filename_prefix="report-") == ["doc-004", "doc-002", "doc-001"]
+        assert await ids(status="processing") == ["doc-002"]
+        assert await ids(uploaded_after=BASE_TIME + timedelta(days=1)) == ["doc-004", "doc-003", "doc-002"]
+        assert await ids(uploaded_before=BASE_TIME + timedelta(days=2)) == ["doc-002", "doc-001"]
+        # Naive datetimes are taken as UTC
+        assert await ids(uploaded_before=(BASE_TIME + timedelta(days=1)).replace(tzinfo=None)) == ["doc-001"]
+        assert await ids(filename_prefix="report-", status="completed",
+                         uploaded_after=BASE_TIME + timedelta(hours=1)) == ["doc-004"]
+
+    run_storage(scenario)
+
+
+def test_malformed_cursor_is_rejected_by_backend(run_storage):
+    async def scenario(db):
+        await db.create_document(make_document(1, BASE_TIME))
+        with pytest.raises(ValueError):
+            await db.get_user_documents_page(USER, 10, cursor="garbage")
+
+    run_storage(scenario)
+
+
+def test_documents_endpoint_returns_400_for_malformed_cursor(api_client):
+    user = register(api_client)
+    response = api_client.get("/api/documents", params={"cursor": "garbage"}, headers=user["headers"])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_documents_endpoint_pages_only_when_asked(api_client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "DOCUMENTS_PAGE_SIZE", 2)
+    monkeypatch.setattr(server, "DOCUMENTS_MAX_PAGE_SIZE", 2)
+    user = register(api_client)
+    for n in range(5):
+        response = api_client.post("/api/documents/text", headers=user["headers"],
+                                   data={"title": f"note-{n}", "content": f"Note number {n}."})
+        assert response.status_code == 200
+
+    # Clients that never read X-Next-Cursor still get every document
+    response = api_client.get("/api/documents", headers=user["headers"])
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = api_client.get("/api/documents", params=params, headers=user["headers"])
+        pages.append([document["id"] for document in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [document["id"] for document in api_client.get("/api/documents", headers=user["headers"]).json()] == \
+        [document_id for page in pages for document_id in page]
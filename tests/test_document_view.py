@@ -0,0 +1,65 @@
+import asyncio
+
+from tests.helpers import register
+
+CONTENT = "".join(f"Line {n:03d} of the handbook.\n" for n in range(10))
+
+
+def upload(client, user, content: str = CONTENT) -> str:
+    response = client.post("/api/documents/text", headers=user["headers"],
+                           data={"title": "handbook", "content": content})
+    assert response.status_code == 200
+    return response.json()["document_id"]
+
+
+def test_text_documents_are_paged_in_character_windows(api_client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "DOCUMENT_PAGE_CHARS", 100)
+    user = register(api_client)
+    document_id = upload(api_client, user)
+    url = f"/api/documents/{document_id}"
+
+    full = api_client.get(url, headers=user["headers"]).json()
+    assert full["content"] == CONTENT
+    assert full["total_length"] == len(CONTENT)
+
+    pages = [api_client.get(url, params={"page": page}, headers=user["headers"]).json() for page in (1, 2, 3)]
+    assert [page["page_count"] for page in pages] == [3, 3, 3]
+    assert "".join(page["content"] for page in pages) == CONTENT
+    assert (pages[1]["start"], pages[1]["end"]) == (100, 200)
+    assert api_client.get(url, params={"page": 4}, headers=user["headers"]).status_code == 404
+
+
+def test_character_ranges(api_client):
+    user = register(api_client)
+    document_id = upload(api_client, user)
+    url = f"/api/documents/{document_id}"
+
+    part = api_client.get(url, params={"start": 27, "end": 81}, headers=user["headers"]).json()
+    assert part["content"] == CONTENT[27:81]
+    assert (part["start"], part["end"], part["total_length"]) == (27, 81, len(CONTENT))
+    # Ranges past the end are clipped
+    assert api_client.get(url, params={"start": 250}, headers=user["headers"]).json()["content"] == CONTENT[250:]
+    assert api_client.get(url, params={"start": 50, "end": 10}, headers=user["headers"]).status_code == 400
+
+    streamed = api_client.get(f"{url}/content", headers=user["headers"])
+    assert streamed.status_code == 200
+    assert streamed.text == CONTENT
+
+
+def test_pdf_pages_follow_stored_page_spans(api_client):
+    import server
+
+    user = register(api_client)
+    page_spans = [[0, 30], [30, 150], [150, len(CONTENT)]]
+    asyncio.run(server.db.create_document({
+        "id": "pdf-1", "user_id": user["user_id"], "filename": "handbook.pdf", "content": CONTENT,
+        "content_length": len(CONTENT), "page_spans": page_spans, "chunk_spans": [[0, len(CONTENT)]],
+        "embeddings": [[0.1]], "upload_time": "2025-01-01T00:00:00+00:00", "chunk_count": 1, "status": "completed"
+    }))
+
+    page = api_client.get("/api/documents/pdf-1", params={"page": 2}, headers=user["headers"]).json()
+    assert page["content"] == CONTENT[30:150]
+    assert (page["page"], page["page_count"]) == (2, 3)
+    assert api_client.get("/api/documents/pdf-1", params={"page": 4}, headers=user["headers"]).status_code == 404
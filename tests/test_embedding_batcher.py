@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+import gemini_embeddings
+from embedding_batcher import EmbeddingBatcher
+from fake_providers import FakeEmbeddings
+from provider_gateway import GATEWAY_EMBED_BURST, GATEWAY_EMBED_CONCURRENCY, GATEWAY_EMBED_RATE, ProviderGateway
+
+UPLOAD_CHUNKS = 1500
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    """A batcher over the fake provider, behind a fresh gateway with the default embedding quotas"""
+    gateway = ProviderGateway("embedding-test", GATEWAY_EMBED_RATE, GATEWAY_EMBED_BURST, GATEWAY_EMBED_CONCURRENCY)
+    monkeypatch.setattr(gemini_embeddings, "embedding_gateway", gateway)
+    return EmbeddingBatcher(FakeEmbeddings(latency_ms=0, error_rate=0))
+
+
+def test_query_embedding_is_not_delayed_by_an_upload(batcher):
+    async def scenario():
+        texts = [f"chunk {i} of a large upload" for i in range(UPLOAD_CHUNKS)]
+        upload = asyncio.ensure_future(batcher.embed_documents(texts))
+        # Let the upload fill the document lane and drain the gateway's background quota
+        await asyncio.sleep(0.05)
+        try:
+            started = time.perf_counter()
+            vector = await batcher.embed_query("what does the upload say?")
+            elapsed = time.perf_counter() - started
+            return vector, elapsed, upload.done(), batcher.stats()["lanes"]["retrieval_document"]
+        finally:
+            upload.cancel()
+            await asyncio.gather(upload, return_exceptions=True)
+
+    vector, elapsed, upload_done, document_lane = asyncio.run(scenario())
+    assert len(vector) == batcher.engine.embedding_dimension
+    # At the default 100 texts/s quota the upload takes ~13 s; the query must not wait for it
+    assert not upload_done
+    assert elapsed < 1.0
+    # Only as many document batches as workers are handed out; the rest of the upload waits in the lane queue
+    assert document_lane["in_flight"] <= batcher.workers
+    assert document_lane["queued"] > 0
+
+
+def test_batched_embeddings_match_direct_ones(batcher):
+    texts = [f"document sentence number {i}" for i in range(30)]
+
+    async def scenario():
+        return await asyncio.gather(batcher.embed_documents(texts),
+                                    *(batcher.embed_query(f"question {i}") for i in range(5)))
+
+    documents, *queries = asyncio.run(scenario())
+    assert documents == [batcher.engine._vector(text) for text in texts]
+    assert queries == [batcher.engine._vector(f"question {i}") for i in range(5)]
@@ -0,0 +1,81 @@
+from circuit_breaker import OPEN
+from extractive_answer import ExtractiveAnswerer, split_sentences
+from tests.helpers import register
+
+CONTENT = ("Our returns policy is simple.\n\n"
+           "Refunds are issued within thirty days of delivery. Shipping to Canada takes about a week. "
+           "Warranty claims need the original receipt.")
+
+
+def test_sentences_quote_the_best_matches_with_document_offsets():
+    start = CONTENT.index("Refunds")
+    chunk = {"content": CONTENT[start:], "document_id": "doc-1", "filename": "policy.txt", "chunk_index": 1,
+             "span": [start, len(CONTENT)], "relevance_score": 0.8}
+
+    answer, [sentence] = ExtractiveAnswerer(max_sentences=2).answer("how long until refunds are issued?", [chunk])
+    assert answer == "Refunds are issued within thirty days of delivery."
+    # Sentences sharing no term with the question are not padded in
+    assert CONTENT[sentence["start"]:sentence["end"]] == answer
+    assert (sentence["document_id"], sentence["chunk_index"]) == ("doc-1", 1)
+
+
+def test_overlapping_chunks_quote_a_sentence_once():
+    chunks = [{"content": CONTENT, "chunk_index": 0}, {"content": CONTENT[30:], "chunk_index": 1}]
+    ranked = ExtractiveAnswerer().rank("warranty receipt", chunks)
+    assert len(ranked) == len(split_sentences(chunks[0]))
+    assert ranked[0][0].text == "Warranty claims need the original receipt."
+    assert ExtractiveAnswerer().answer("anything", []) == (None, [])
+
+
+def upload(client, user):
+    response = client.post("/api/documents/text", headers=user["headers"], data={"title": "policy", "content": CONTENT})
+    assert response.status_code == 200
+
+
+def test_extractive_mode_answers_without_the_llm(api_client):
+    import server
+
+    user = register(api_client)
+    upload(api_client, user)
+    llm_calls = server.fake_llm.faults.calls
+
+    answer = api_client.post("/api/query", headers=user["headers"],
+                             json={"question": "warranty receipt", "answer_mode": "extractive"}).json()
+    assert answer["answer_mode"] == "extractive"
+    assert "Warranty claims need the original receipt." in answer["answer"]
+    assert all(CONTENT[s["start"]:s["end"]] == s["text"] for s in answer["sentences"])
+    assert server.fake_llm.faults.calls == llm_calls
+
+
+def test_open_llm_circuit_falls_back_to_extractive(api_client, monkeypatch):
+    import server
+
+    user = register(api_client)
+    upload(api_client, user)
+    generative = api_client.post("/api/query", headers=user["headers"], json={"question": "warranty receipt"}).json()
+    assert generative["answer_mode"] == "generative"
+    assert generative["answer"].startswith("[fake]")
+
+    monkeypatch.setattr(server.llm_gateway.breaker, "enabled", True)
+    monkeypatch.setattr(server.llm_gateway.breaker, "state", OPEN)
+    llm_calls = server.fake_llm.faults.calls
+    response = api_client.post("/api/query", headers=user["headers"], json={"question": "warranty receipt"})
+    assert response.status_code == 200
+    answer = response.json()
+    assert answer["answer_mode"] == "extractive"
+    assert "Warranty claims need the original receipt." in answer["answer"]
+    assert answer["sources"] == generative["sources"]
+    assert server.fake_llm.faults.calls == llm_calls
+
+
+def test_llm_errors_fall_back_to_extractive(api_client, monkeypatch):
+    import server
+
+    user = register(api_client)
+    upload(api_client, user)
+    monkeypatch.setattr(server.llm_gateway.breaker, "enabled", False)
+    monkeypatch.setattr(server.fake_llm.faults, "error_rate", 1.0)
+
+    answer = api_client.post("/api/query", headers=user["headers"], json={"question": "shipping to canada"}).json()
+    assert answer["answer_mode"] == "extractive"
+    assert "Shipping to Canada takes about a week." in answer["answer"]
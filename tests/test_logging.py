@@ -0,0 +1,43 @@
+import ast
+import logging
+from pathlib import Path
+
+from tests.helpers import register
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+# Attributes every LogRecord already has; passing one in extra= makes logging raise KeyError
+RESERVED = set(vars(logging.LogRecord("name", logging.INFO, "path", 1, "msg", (), None))) | {
+    "message", "asctime", "taskName"}
+
+
+def test_log_extra_keys_do_not_collide_with_log_record_attributes():
+    collisions = []
+    for path in sorted(BACKEND_DIR.glob("*.py")):
+        for node in ast.walk(ast.parse(path.read_text(), str(path))):
+            if isinstance(node, ast.keyword) and node.arg == "extra" and isinstance(node.value, ast.Dict):
+                collisions += [f"{path.name}:{key.lineno} {key.value}" for key in node.value.keys
+                               if isinstance(key, ast.Constant) and key.value in RESERVED]
+    assert collisions == []
+
+
+def test_failing_document_is_skipped_not_a_500(api_client, monkeypatch):
+    import server
+
+    user = register(api_client)
+    for title in ("good", "bad"):
+        response = api_client.post("/api/documents/text", headers=user["headers"], data={
+            "title": title, "content": "Refunds are issued within thirty days of delivery."})
+        assert response.status_code == 200
+
+    annotate_chunk = server.annotate_chunk
+
+    def failing_for_bad(chunk, doc):
+        if doc["filename"] == "bad.txt":
+            raise RuntimeError("corrupt document")
+        return annotate_chunk(chunk, doc)
+
+    monkeypatch.setattr(server, "annotate_chunk", failing_for_bad)
+
+    response = api_client.post("/api/search", headers=user["headers"], json={"question": "refunds"})
+    assert response.status_code == 200
+    assert {result["filename"] for result in response.json()["results"]} == {"good.txt"}
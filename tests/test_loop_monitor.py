@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import time
+
+from loop_monitor import LoopMonitor
+
+
+def blocked_loop(monitor: LoopMonitor, block_seconds: float = 0.2) -> dict:
+    """Run the monitor, block the loop with a synchronous sleep, and return its stats afterwards"""
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(block_seconds)
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+        return monitor.stats()
+    return asyncio.run(main())
+
+
+def test_blocking_call_is_counted_and_logged(caplog):
+    monitor = LoopMonitor(interval_ms=10, threshold_ms=50, debug=False)
+    with caplog.at_level(logging.WARNING, logger="loop_monitor"):
+        stats = blocked_loop(monitor)
+
+    assert stats["blocks"] == 1
+    assert stats["max_lag_ms"] >= 150
+    assert not stats["running"]
+    [record] = [record for record in caplog.records if record.name == "loop_monitor"]
+    assert record.lag_ms >= 150
+    assert monitor.recent_blocks() == []
+
+
+def test_debug_mode_captures_the_blocking_stack():
+    monitor = LoopMonitor(interval_ms=10, threshold_ms=50, debug=True)
+    blocked_loop(monitor)
+
+    [report] = monitor.recent_blocks()
+    assert report["blocked_ms_when_captured"] > 50
+    # The stack points at the code holding the loop
+    assert any("time.sleep(block_seconds)" in line for line in report["stack"])
+
+
+def test_short_pauses_are_not_blocks():
+    stats = blocked_loop(LoopMonitor(interval_ms=10, threshold_ms=500), block_seconds=0.05)
+    assert stats["blocks"] == 0
+    assert stats["max_lag_ms"] < 500
+
+
+def test_loop_endpoint_needs_the_admin_token(api_client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    assert api_client.get("/api/admin/loop").status_code == 404
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "admin-secret")
+    assert api_client.get("/api/admin/loop", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    stats = api_client.get("/api/admin/loop", headers={"X-Admin-Token": "admin-secret"}).json()
+    assert {"last_lag_ms", "max_lag_ms", "blocks", "recent_blocks"} <= stats.keys()
@@ -0,0 +1,70 @@
+import marshal
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from profiling import MemoryProfiler, ProfilingMiddleware, RequestProfiler
+
+TOKEN = "admin-secret"
+ADMIN = {"X-Admin-Token": TOKEN}
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """Fresh profilers, with admin endpoints enabled under TOKEN"""
+    monkeypatch.setattr(server, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(server, "request_profiler", RequestProfiler())
+    monkeypatch.setattr(server, "memory_profiler", MemoryProfiler(frames=1))
+    yield
+    server.memory_profiler.stop()
+
+
+@pytest.mark.parametrize("method,path", [
+    ("post", "/api/admin/profile/cpu"), ("get", "/api/admin/profile/cpu"), ("delete", "/api/admin/profile/cpu"),
+    ("post", "/api/admin/memory/baseline"), ("get", "/api/admin/memory/diff"),
+    ("get", "/api/admin/memory/structures")])
+def test_admin_endpoints_need_the_token(api_client, monkeypatch, method, path):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    # Without a configured token the endpoints do not exist
+    assert getattr(api_client, method)(path, headers=ADMIN).status_code == 404
+
+    monkeypatch.setattr(server, "ADMIN_TOKEN", TOKEN)
+    assert getattr(api_client, method)(path).status_code == 403
+    assert getattr(api_client, method)(path, headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_cpu_profile_covers_the_next_requests(admin):
+    client = TestClient(ProfilingMiddleware(server.app, server.request_profiler))
+
+    status = client.post("/api/admin/profile/cpu", params={"requests": 2}, headers=ADMIN).json()
+    assert (status["armed"], status["remaining"]) == (True, 2)
+    assert client.post("/api/admin/profile/cpu", headers=ADMIN).status_code == 409
+
+    for _ in range(3):
+        assert client.get("/").status_code == 200
+    profile = client.get("/api/admin/profile/cpu", params={"limit": 1000}, headers=ADMIN).json()
+    # Admin calls are never profiled, and the window closes after two requests
+    assert (profile["armed"], profile["ready"], profile["requests"]) == (False, True, 2)
+    assert "(root)" in profile["report"]
+
+    raw = client.get("/api/admin/profile/cpu", params={"format": "pstats"}, headers=ADMIN)
+    assert any(name == "root" for _, _, name in marshal.loads(raw.content))
+    assert client.get("/api/admin/profile/cpu", params={"sort": "bogus"}, headers=ADMIN).status_code == 400
+
+
+def test_memory_diff_against_a_baseline(api_client, admin):
+    assert api_client.get("/api/admin/memory/diff", headers=ADMIN).status_code == 404
+
+    assert api_client.post("/api/admin/memory/baseline", headers=ADMIN).json()["tracing"] is True
+    retained = [bytearray(1024) for _ in range(256)]
+    diff = api_client.get("/api/admin/memory/diff", params={"limit": 5}, headers=ADMIN).json()
+    assert len(diff["top"]) <= 5
+    assert diff["total_diff_bytes"] >= 256 * 1024
+    del retained
+
+    structures = api_client.get("/api/admin/memory/structures", headers=ADMIN).json()
+    assert {"storage", "api_key_cache", "llm_gateway"} <= structures["structures"].keys()
+
+    status = api_client.delete("/api/admin/memory/baseline", headers=ADMIN).json()
+    assert status == {"tracing": False, "has_baseline": False}
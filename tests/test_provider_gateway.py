@@ -0,0 +1,199 @@
+import threading
+import time
+
+import pytest
+
+import gemini_embeddings  # noqa: F401 - imported before fake_providers, as the app does
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker
+from fake_providers import FakeEmbeddings
+from provider_gateway import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, CircuitOpen, ProviderBusy, ProviderGateway
+
+
+class FakeClock:
+    """Time that only moves when a test advances it"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def sleep(self, seconds: float):
+        # The breaker's background prober parks here; tests run probe rounds with probe_once()
+        threading.Event().wait()
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_breaker(clock, **overrides):
+    settings = dict(slow_ms=1000, window=4, min_calls=4, error_rate=0.5, slow_rate=0.5, probe_interval=15,
+                    enabled=True, clock=clock, sleep=clock.sleep)
+    settings.update(overrides)
+    return CircuitBreaker("test", **settings)
+
+
+def make_gateway(clock, **overrides):
+    settings = dict(rate=10, burst=10, max_concurrency=5, max_waiting=8, wait_timeout=1, interactive_reserve=0.2,
+                    clock=clock)
+    settings.update(overrides)
+    return ProviderGateway("test", **settings)
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_breaker_trips_on_error_rate_and_refuses_calls(clock):
+    breaker = make_breaker(clock)
+    gateway = make_gateway(clock, breaker=breaker)
+    engine = FakeEmbeddings(error_rate=0)
+    for _ in range(2):
+        gateway.call(PRIORITY_INTERACTIVE, engine._provider_embed, "ok", "retrieval_query")
+
+    engine.faults.error_rate = 1.0
+    with pytest.raises(RuntimeError):
+        gateway.call(PRIORITY_INTERACTIVE, engine._provider_embed, "fails", "retrieval_query")
+    # Fewer than min_calls outcomes decide nothing
+    assert breaker.state == CLOSED
+    with pytest.raises(RuntimeError):
+        gateway.call(PRIORITY_INTERACTIVE, engine._provider_embed, "fails", "retrieval_query")
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+
+    calls = engine.faults.calls
+    clock.advance(5)
+    with pytest.raises(CircuitOpen) as refused:
+        gateway.call(PRIORITY_INTERACTIVE, engine._provider_embed, "refused", "retrieval_query")
+    assert refused.value.status_code == 503
+    assert refused.value.retry_after == pytest.approx(10)
+    assert engine.faults.calls == calls
+
+
+def test_breaker_trips_on_slow_calls(clock):
+    breaker = make_breaker(clock)
+    gateway = make_gateway(clock, breaker=breaker)
+
+    def slow_call():
+        clock.advance(2)
+
+    for _ in range(3):
+        gateway.call(PRIORITY_INTERACTIVE, slow_call)
+        assert breaker.state == CLOSED
+    gateway.call(PRIORITY_INTERACTIVE, slow_call)
+    assert breaker.state == OPEN
+
+
+def test_rate_limits_do_not_trip_the_breaker(clock):
+    breaker = make_breaker(clock)
+    gateway = make_gateway(clock, breaker=breaker)
+
+    def rate_limited():
+        raise RateLimited()
+
+    for _ in range(6):
+        with pytest.raises(ProviderBusy) as busy:
+            gateway.call(PRIORITY_INTERACTIVE, rate_limited)
+        assert busy.value.status_code == 429
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_failures"] == 0
+
+
+def test_probe_keeps_the_circuit_open_until_the_provider_recovers(clock):
+    breaker = make_breaker(clock)
+    gateway = make_gateway(clock, breaker=breaker)
+    engine = FakeEmbeddings(error_rate=1.0)
+    breaker.probe = lambda: engine._provider_embed("health check", "retrieval_query")
+    for _ in range(4):
+        with pytest.raises(RuntimeError):
+            gateway.call(PRIORITY_INTERACTIVE, engine._provider_embed, "fails", "retrieval_query")
+    assert breaker.state == OPEN
+
+    # Still failing
+    assert not breaker.probe_once()
+    assert breaker.state == OPEN
+
+    # Answering, but slower than the slow-call threshold
+    engine.faults.error_rate = 0
+    breaker.probe = lambda: clock.advance(2)
+    assert not breaker.probe_once()
+    assert breaker.state == OPEN
+
+    breaker.probe = lambda: engine._provider_embed("health check", "retrieval_query")
+    assert breaker.probe_once()
+    assert breaker.state == CLOSED
+    assert breaker.opened_at is None
+    assert breaker.stats()["window_calls"] == 0
+    assert gateway.call(PRIORITY_INTERACTIVE, engine._provider_embed, "ok", "retrieval_query")
+
+
+def test_breaker_without_probe_closes_on_first_round(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(0.1, failed=True)
+    assert breaker.state == OPEN
+    assert breaker.probe_once()
+    assert breaker.allow()
+
+
+def test_background_work_cannot_use_the_interactive_token_reserve(clock):
+    gateway = make_gateway(clock)
+    gateway.acquire(PRIORITY_BACKGROUND, cost=8)
+    gateway.release()
+
+    # Two tokens are left, all of them reserved
+    with pytest.raises(ProviderBusy) as busy:
+        gateway.acquire(PRIORITY_BACKGROUND, cost=1, timeout=0)
+    assert busy.value.status_code == 503
+    gateway.acquire(PRIORITY_INTERACTIVE, cost=1)
+    gateway.release()
+    assert gateway.bucket.tokens == pytest.approx(1)
+
+
+def test_background_work_cannot_use_the_interactive_call_slots(clock):
+    gateway = make_gateway(clock)
+    assert gateway.reserved_slots == 1
+    for _ in range(4):
+        gateway.acquire(PRIORITY_BACKGROUND)
+    with pytest.raises(ProviderBusy):
+        gateway.acquire(PRIORITY_BACKGROUND, timeout=0)
+
+    gateway.acquire(PRIORITY_INTERACTIVE)
+    assert gateway.in_flight == 5
+    for _ in range(5):
+        gateway.release()
+
+
+def test_waiting_interactive_calls_go_before_background_calls(clock):
+    gateway = make_gateway(clock, rate=0, max_concurrency=1, interactive_reserve=0)
+    gateway.acquire(PRIORITY_INTERACTIVE)
+    admitted = []
+
+    def caller(priority: int, label: str):
+        gateway.acquire(priority)
+        admitted.append(label)
+        gateway.release()
+
+    background = threading.Thread(target=caller, args=(PRIORITY_BACKGROUND, "background"))
+    background.start()
+    wait_until(lambda: len(gateway._waiting) == 1)
+    interactive = threading.Thread(target=caller, args=(PRIORITY_INTERACTIVE, "interactive"))
+    interactive.start()
+    wait_until(lambda: len(gateway._waiting) == 2)
+
+    gateway.release()
+    for thread in (background, interactive):
+        thread.join(5)
+    assert admitted == ["interactive", "background"]
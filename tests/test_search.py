@@ -0,0 +1,47 @@
+from tests.helpers import register
+
+SENTENCES = ["Refunds are issued within thirty days of delivery.", "Shipping to Canada takes about a week.",
+             "Warranty claims need the original receipt.", "Gift cards never expire."]
+CONTENT = "\n\n".join(SENTENCES * 10)
+
+
+def upload(client, user):
+    response = client.post("/api/documents/text", headers=user["headers"],
+                           data={"title": "policy", "content": CONTENT})
+    assert response.status_code == 200
+
+
+def test_search_ranks_passages_without_generating(api_client):
+    import server
+
+    user = register(api_client)
+    upload(api_client, user)
+    llm_calls = server.fake_llm.faults.calls
+
+    response = api_client.post("/api/search", headers=user["headers"],
+                               json={"question": "how long does shipping to canada take", "top_k": 2})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) <= 2
+    assert "Shipping to Canada" in results[0]["content"]
+    assert [r["relevance_score"] for r in results] == sorted((r["relevance_score"] for r in results), reverse=True)
+    assert {"document_id", "filename", "chunk_index", "relevance_score", "content"} == results[0].keys()
+    # Retrieval only: the LLM is never called
+    assert server.fake_llm.faults.calls == llm_calls
+
+
+def test_search_response_shape_options(api_client):
+    user = register(api_client)
+    upload(api_client, user)
+
+    [result] = api_client.post("/api/search", headers=user["headers"],
+                               json={"question": "gift cards", "top_k": 1, "include_content": False}).json()["results"]
+    assert "content" not in result and "start" not in result
+    assert api_client.post("/api/search", headers=user["headers"],
+                           json={"question": "gift cards", "top_k": 0}).status_code == 422
+
+    # The external variant authenticates with the API key
+    form = {"api_key": user["api_key"], "question": "warranty receipt", "top_k": "1", "include_offsets": "true"}
+    [result] = api_client.post("/api/external/search", data=form).json()["results"]
+    assert CONTENT[result["start"]:result["end"]] == result["content"]
+    assert api_client.post("/api/external/search", data={**form, "api_key": "wrong"}).status_code == 401
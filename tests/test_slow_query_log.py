@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+
+from metrics import RequestTrace
+from slow_query_log import SlowQueryLog
+from tests.helpers import register
+
+
+def slow_trace(seconds: float = 0.5) -> RequestTrace:
+    trace = RequestTrace()
+    trace.start -= seconds
+    trace.add_stage("embedding", 0.2)
+    trace.add_stage("llm", 0.25)
+    trace.details["documents"] = 3
+    return trace
+
+
+def test_fast_queries_are_not_logged():
+    log = SlowQueryLog(threshold_ms=1000)
+    assert log.entry("/api/query", slow_trace(0.1), 200) is None
+    assert SlowQueryLog(threshold_ms=0).entry("/api/query", slow_trace(5), 200) is None
+
+
+def test_slow_queries_go_to_the_application_log_by_default(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    log = SlowQueryLog(threshold_ms=100)
+    assert log.path is None
+
+    with caplog.at_level(logging.WARNING, logger="slow_query_log"):
+        asyncio.run(log.record("/api/query", slow_trace(), 200, "user-1", "secret question"))
+    [record] = [record for record in caplog.records if record.name == "slow_query_log"]
+    assert record.getMessage() == "Slow query"
+    assert record.route == "/api/query"
+    assert record.user_id == "user-1"
+    assert record.stages_ms == {"embedding": 200.0, "llm": 250.0}
+    assert not hasattr(record, "question")
+    # Nothing is written next to the code or the working directory
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_slow_query_file_records_and_rotation(tmp_path):
+    path = tmp_path / "slow.jsonl"
+    log = SlowQueryLog(str(path), threshold_ms=100, max_bytes=600, include_questions=True)
+
+    asyncio.run(log.record("/api/search", slow_trace(), 504, "user-1", "what is the refund policy?"))
+    [entry] = [json.loads(line) for line in path.read_text().splitlines()]
+    assert entry["route"] == "/api/search"
+    assert entry["status"] == 504
+    assert entry["user_id"] == "user-1"
+    assert entry["total_ms"] >= 500
+    assert entry["stages_ms"] == {"embedding": 200.0, "llm": 250.0}
+    assert entry["documents"] == 3
+    assert entry["question"] == "what is the refund policy?"
+    assert {"timestamp", "request_id"} <= entry.keys()
+
+    for _ in range(3):
+        asyncio.run(log.record("/api/search", slow_trace(), 200))
+    # Past max_bytes the file is rotated once, so the log never holds more than two files
+    assert path.stat().st_size <= 600
+    assert path.with_name("slow.jsonl.1").exists()
+
+
+def test_queries_report_server_timing_and_reach_the_slow_log(api_client, monkeypatch, tmp_path):
+    import server
+
+    path = tmp_path / "slow.jsonl"
+    monkeypatch.setattr(server, "slow_query_log", SlowQueryLog(str(path), threshold_ms=0.001))
+    user = register(api_client)
+    api_client.post("/api/documents/text", headers=user["headers"],
+                    data={"title": "policy", "content": "Refunds are issued within thirty days of delivery."})
+
+    response = api_client.post("/api/query", headers=user["headers"], json={"question": "refund window?"})
+    assert response.status_code == 200
+    timings = dict(entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+    assert {"db_fetch", "total"} <= timings.keys()
+    assert all(float(value) >= 0 for value in timings.values())
+
+    [entry] = [json.loads(line) for line in path.read_text().splitlines()]
+    assert (entry["route"], entry["status"], entry["user_id"]) == ("/api/query", 200, user["user_id"])
+    assert "db_fetch" in entry["stages_ms"]
+    assert entry["documents"] == 1
+    assert "question" not in entry
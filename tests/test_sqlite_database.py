@@ -0,0 +1,207 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from sqlite_database import SCHEMA, SQLiteDatabase, pack_embeddings, unpack_embeddings
+
+SENTENCES = ["Refunds are issued within thirty days.", "Shipping to Canada takes a week.",
+             "Warranty claims need the original receipt."]
+CONTENT = " ".join(SENTENCES)
+SPANS = [[CONTENT.index(sentence), CONTENT.index(sentence) + len(sentence)] for sentence in SENTENCES]
+
+
+def make_document(document_id: str, user_id: str = "user-1", content: str = CONTENT, spans=None) -> dict:
+    spans = SPANS if spans is None else spans
+    return {
+        "id": document_id,
+        "user_id": user_id,
+        "filename": f"{document_id}.txt",
+        "content": content,
+        "content_length": len(content),
+        "chunk_spans": spans,
+        "embeddings": [[0.5, -0.25, 1.0] for _ in spans],
+        "upload_time": "2025-01-01T00:00:00+00:00",
+        "chunk_count": len(spans),
+        "status": "completed"
+    }
+
+
+def run(path, scenario):
+    async def main():
+        db = SQLiteDatabase(str(path), pool_size=2)
+        await db.init_db()
+        try:
+            if not db.fts_enabled:
+                pytest.skip("SQLite build without FTS5")
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def fts_rows(path) -> list:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT document_id, chunk_index, text FROM chunks_fts ORDER BY document_id, chunk_index"
+                            ).fetchall()
+
+
+def test_embeddings_pack_round_trip():
+    embeddings = [[0.5, -0.25, 1.0], [2.0, 0.0, -1.5]]
+    packed, dim = pack_embeddings(embeddings)
+    assert dim == 3
+    assert unpack_embeddings(packed, dim) == embeddings
+    # Ragged input is kept as JSON text
+    ragged, dim = pack_embeddings([[1.0], [1.0, 2.0]])
+    assert dim is None
+    assert unpack_embeddings(ragged, dim) == [[1.0], [1.0, 2.0]]
+
+
+def test_legacy_database_is_migrated_and_indexed(tmp_path):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT INTO users VALUES ('user-1', 'alice', 'secret', 'key-1', '2025-01-01T00:00:00')")
+        conn.execute("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+            "legacy", "user-1", "legacy.txt", CONTENT,
+            json.dumps(SENTENCES[:2]),
+            json.dumps([[0.1, 0.2], [0.3, 0.4]]), "2024-06-01T00:00:00", 2, "completed"
+        ))
+
+    async def scenario(db):
+        documents = await db.get_user_documents_with_content("user-1")
+        assert len(documents) == 1
+        assert list(documents[0]["chunks"]) == SENTENCES[:2]
+        assert documents[0]["embeddings"] == [[0.1, 0.2], [0.3, 0.4]]
+
+        results = await db.keyword_search("user-1", "canada shipping")
+        assert [(r["document_id"], r["chunk_index"]) for r in results] == [("legacy", 1)]
+
+    run(path, scenario)
+    with sqlite3.connect(path) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    assert {"content_codec", "content_length", "chunk_spans", "embedding_dim"} <= columns
+
+
+def test_documents_stored_before_the_index_are_backfilled_once(tmp_path):
+    path = tmp_path / "spans.db"
+
+    async def store(db):
+        assert await db.create_document(make_document("doc-1"))
+
+    run(path, store)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE chunks_fts")
+
+    async def search(db):
+        results = await db.keyword_search("user-1", "warranty receipt")
+        assert [(r["document_id"], r["chunk_index"], r["content"]) for r in results] == [
+            ("doc-1", 2, SENTENCES[2])]
+
+    run(path, search)
+    # Reopening an indexed database does not index again
+    run(path, search)
+    assert fts_rows(path) == [("doc-1", i, CONTENT[start:end]) for i, (start, end) in enumerate(SPANS)]
+
+
+def test_keyword_search_is_scoped_to_the_user(tmp_path):
+    async def scenario(db):
+        await db.create_document(make_document("doc-1"))
+        await db.create_document(make_document("doc-2", user_id="user-2"))
+
+        results = await db.keyword_search("user-1", "refunds thirty", top_k=5)
+        assert {r["document_id"] for r in results} == {"doc-1"}
+        assert results[0]["chunk_index"] == 0
+        assert 0 < results[0]["relevance_score"] < 1
+        # Query syntax characters are not passed through to FTS5
+        assert await db.keyword_search("user-1", 'refunds" OR (NEAR*') != []
+        assert await db.keyword_search("user-1", "?!") == []
+        assert await db.keyword_search("user-1", "nonexistentterm") == []
+
+    run(tmp_path / "search.db", scenario)
+
+
+def test_index_without_user_column_is_rebuilt(tmp_path):
+    path = tmp_path / "unindexed.db"
+
+    async def store(db):
+        await db.create_document(make_document("doc-1"))
+        await db.create_document(make_document("doc-2", user_id="user-2"))
+
+    run(path, store)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE chunks_fts")
+        conn.execute("CREATE VIRTUAL TABLE chunks_fts USING fts5("
+                     "text, document_id UNINDEXED, user_id UNINDEXED, chunk_index UNINDEXED)")
+
+    async def search(db):
+        assert [r["document_id"] for r in await db.keyword_search("user-2", "warranty")] == ["doc-2"]
+
+    run(path, search)
+    with sqlite3.connect(path) as conn:
+        definition = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()[0]
+    assert "user_id UNINDEXED" not in definition
+    assert {row[0] for row in fts_rows(path)} == {"doc-1", "doc-2"}
+
+
+def test_keyword_fallback_results_carry_chunk_offsets(tmp_path, monkeypatch):
+    import server
+
+    async def scenario(db):
+        monkeypatch.setattr(server, "db", db)
+        await db.create_document(make_document("doc-1"))
+        documents = await db.get_user_documents_with_content("user-1")
+        results = await server.keyword_fallback("canada shipping", "user-1", documents, 5)
+        assert [(r["document_id"], r["chunk_index"]) for r in results] == [("doc-1", 1)]
+        assert list(results[0]["span"]) == SPANS[1]
+        assert server.search_results(results, 5, False, True)[0]["start"] == SPANS[1][0]
+
+    run(tmp_path / "offsets.db", scenario)
+
+
+def test_document_delete_removes_its_index_rows(tmp_path):
+    path = tmp_path / "delete.db"
+
+    async def scenario(db):
+        await db.create_document(make_document("doc-1"))
+        await db.create_document(make_document("doc-2"))
+        # Another user's delete neither succeeds nor touches the index
+        assert await db.delete_user_document("doc-1", "user-2") is False
+        assert await db.delete_user_document("doc-1", "user-1") is True
+        assert await db.get_document_by_id("doc-1") is None
+        assert {r["document_id"] for r in await db.keyword_search("user-1", "refunds")} == {"doc-2"}
+
+    run(path, scenario)
+    assert {row[0] for row in fts_rows(path)} == {"doc-2"}
+
+
+def test_user_delete_cascades_to_documents_and_index(tmp_path):
+    path = tmp_path / "cascade.db"
+
+    async def scenario(db):
+        assert await db.create_user({"user_id": "user-1", "username": "alice", "password": "secret",
+                                     "api_key": "key-1", "created_at": "2025-01-01T00:00:00"})
+        await db.create_document(make_document("doc-1"))
+        await db.create_document(make_document("doc-2", user_id="user-2"))
+        assert await db.delete_user("user-1")
+        assert await db.get_user_documents("user-1") == []
+        assert await db.keyword_search("user-1", "refunds") == []
+        assert await db.get_document_by_id("doc-2") is not None
+
+    run(path, scenario)
+    assert {row[0] for row in fts_rows(path)} == {"doc-2"}
+
+
+def test_compressed_content_is_served_in_ranges(tmp_path):
+    async def scenario(db):
+        await db.create_document(make_document("doc-1"))
+        await db.recompress_documents("zlib")
+        start, end = SPANS[1]
+        part = await db.get_document_content_range("doc-1", start, end, user_id="user-1")
+        assert part == {"content": SENTENCES[1], "start": start, "end": end, "total_length": len(CONTENT)}
+        assert "".join([piece async for piece in db.iter_document_content("doc-1", window=10)]) == CONTENT
+        assert await db.get_document_content_range("doc-1", user_id="user-2") is None
+
+    run(tmp_path / "ranges.db", scenario)